@@ -1,22 +1,19 @@
 
 from flask import Flask, request, jsonify, render_template, redirect, url_for, send_from_directory
-from models.lstm_model import LSTMModel
-from models.prophet_model import ProphetModel
-from models.ensemble import EnsembleModel
-from data.fetcher import StockDataFetcher
-from data.preprocessor import DataPreprocessor
-from utils.visualization import Visualizer
-from utils.evaluation import ModelEvaluator
 import pandas as pd
 import numpy as np
 from flask_cors import CORS
 import threading
 import time
-import plotly.graph_objects as go
-import plotly.express as px
 from datetime import datetime, timedelta
 import json
 import os
+import sys
+
+# Models, data services and plotting libraries are imported and created on first
+# use (see get_service), so a worker starts serving without loading TensorFlow,
+# Prophet, XGBoost, plotly or matplotlib. Set STOCK_ANALYZER_WARMUP=1 to load them
+# in a background thread right after startup instead of on the first request.
 
 app = Flask(__name__, static_folder="../dist", static_url_path="/")
 CORS(app)  # Enable CORS for all routes
@@ -28,25 +25,133 @@ def serve_index(path):
     return send_from_directory(app.static_folder, "index.html")
 
 
-# Initialize our models with improved configurations
-lstm_model = LSTMModel(attention=True, n_layers=3)  # Deeper attention-based LSTM
-prophet_model = ProphetModel()
-ensemble_model = EnsembleModel([lstm_model, prophet_model], weights=[0.6, 0.4])  # Weighted ensemble
+def _create_model_registry():
+    # Per-symbol model versions; a few dozen loaded models fit comfortably in memory
+    from models.registry import ModelRegistry
+    return ModelRegistry('saved_models/registry', max_models=64)
+
+def _create_lstm_model():
+    from models.lstm_model import LSTMModel
+    # Deeper attention-based LSTM, shared by symbols without a model of their own
+    return LSTMModel(attention=True, n_layers=3, registry=get_service('model_registry'))
+
+def _create_prophet_model():
+    from models.prophet_model import ProphetModel
+    return ProphetModel(registry=get_service('model_registry'))
+
+def _create_baseline_model():
+    from models.baseline_model import BaselineModel
+    return BaselineModel()
+
+def _create_ensemble_model():
+    from models.ensemble import EnsembleModel
+    # Weighted ensemble; LSTM and Prophet run concurrently, and the baseline
+    # forecasts for a member that fails or takes longer than the timeout
+    return EnsembleModel([get_service('lstm_model'), get_service('prophet_model')], weights=[0.6, 0.4],
+                         registry=get_service('model_registry'), fallback=get_service('baseline_model'),
+                         parallel=True, member_timeout=float(os.environ.get('STOCK_ANALYZER_MEMBER_TIMEOUT', 120)))
+
+def _create_forecast_store():
+    from data.forecast_store import ForecastStore
+    # Next to the history cache; survives restarts and is shared by all workers
+    return ForecastStore(os.path.join('data', 'cache', 'forecasts.sqlite'), max_bytes=64 * 1024 * 1024)
+
+def _create_data_fetcher():
+    from data.fetcher import StockDataFetcher
+    return StockDataFetcher(currency='INR')
+
+def _create_data_preprocessor():
+    from data.preprocessor import DataPreprocessor
+    return DataPreprocessor()
+
+def _create_visualizer():
+    from utils.visualization import Visualizer
+    return Visualizer(currency='INR')
+
+def _create_model_evaluator():
+    from utils.evaluation import ModelEvaluator
+    return ModelEvaluator()
+
+# Service name -> factory, in warm-up order (data first, as most requests need it)
+SERVICE_FACTORIES = {
+    'data_fetcher': _create_data_fetcher,
+    'data_preprocessor': _create_data_preprocessor,
+    'model_registry': _create_model_registry,
+    'lstm_model': _create_lstm_model,
+    'prophet_model': _create_prophet_model,
+    'baseline_model': _create_baseline_model,
+    'ensemble_model': _create_ensemble_model,
+    'forecast_store': _create_forecast_store,
+    'visualizer': _create_visualizer,
+    'model_evaluator': _create_model_evaluator,
+}
+
+_services = {}
+# One lock per service, so a slow model load does not hold up the data fetcher
+_service_locks = {name: threading.Lock() for name in SERVICE_FACTORIES}
 
-# Initialize data fetcher and preprocessor with INR currency
-data_fetcher = StockDataFetcher(currency='INR')
-data_preprocessor = DataPreprocessor()
-visualizer = Visualizer(currency='INR')
-model_evaluator = ModelEvaluator()
+def get_service(name):
+    """Return a shared model or data service, creating it on first use"""
+    service = _services.get(name)
+    if service is None:
+        with _service_locks[name]:
+            service = _services.get(name)
+            if service is None:
+                started = time.perf_counter()
+                service = SERVICE_FACTORIES[name]()
+                _services[name] = service
+                print(f"Loaded {name} in {time.perf_counter() - started:.2f}s")
+    return service
 
-# Cache for storing predictions and last update time
-prediction_cache = {}
+def __getattr__(name):
+    # Keep `app.data_fetcher`, `app.ensemble_model` etc. working for importers
+    if name in SERVICE_FACTORIES:
+        return get_service(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def warm_up():
+    """Create every service and import the plotting libraries ahead of the first request"""
+    for name in SERVICE_FACTORIES:
+        try:
+            get_service(name)
+        except Exception as e:
+            print(f"Error warming up {name}: {str(e)}")
+    # The chart functions import plotly on first use
+    try:
+        import plotly.graph_objects
+    except ImportError as e:
+        print(f"Error warming up plotly: {str(e)}")
+
+if os.environ.get('STOCK_ANALYZER_WARMUP', '').lower() in ('1', 'true', 'yes'):
+    threading.Thread(target=warm_up, daemon=True).start()
+
+# Last update times of the stored forecasts and the symbol list
 last_cache_update = datetime.now() - timedelta(hours=25)  # Initialize to force update on first request
 last_stocks_update = datetime.now() - timedelta(hours=25)  # Initialize to force stocks update on first request
 
+# Seconds /analyze waits for the full ensemble before answering with the fast
+# baseline forecast and finishing the ensemble in the background (0: always wait)
+LATENCY_BUDGET = float(os.environ.get('STOCK_ANALYZER_LATENCY_BUDGET', 3))
+
+def _refined_forecast_handler(forecast_store, forecast_key, last_closes):
+    """Callback replacing the stored fast-tier forecast once the full ensemble finishes"""
+    def store(predictions, metadata):
+        if predictions is None:
+            # Drop the fast forecast, so the next request tries the full ensemble again
+            forecast_store.discard(*forecast_key, tier='fast')
+            return
+        forecast_store.put(*forecast_key, predictions, metadata, last_closes=last_closes)
+        print(f"Upgraded stored forecast for {forecast_key[0]} to the full ensemble in {metadata['seconds']:.2f}s")
+    return store
+
 def background_data_updater():
     """Background thread to update stock data every 12 hours"""
-    global prediction_cache, last_cache_update, last_stocks_update
+    global last_cache_update, last_stocks_update
+    
+    data_fetcher = get_service('data_fetcher')
+    data_preprocessor = get_service('data_preprocessor')
+    ensemble_model = get_service('ensemble_model')
+    forecast_store = get_service('forecast_store')
     
     while True:
         current_time = datetime.now()
@@ -58,39 +163,52 @@ def background_data_updater():
                 data_fetcher.update_all_symbols()
                 last_stocks_update = current_time
                 print(f"Updated stock symbols list: {len(data_fetcher.all_symbols)} symbols available")
+                
+                # Warm the company information cache used by the index and autocomplete
+                data_fetcher.get_stock_info_many(data_fetcher.get_available_symbols())
             except Exception as e:
                 print(f"Error updating stock symbols: {str(e)}")
         
-        # If more than 12 hours have passed since last prediction cache update
+        # If more than 12 hours have passed since the last forecast update
         if (current_time - last_cache_update).total_seconds() > 12 * 3600:
-            print(f"Updating prediction cache at {current_time}")
+            print(f"Updating stored forecasts at {current_time}")
             
             # Get popular stocks to update in cache
             try:
                 popular_stocks = data_fetcher.get_popular_symbols(limit=30)  # Update top 30 popular stocks
-                for symbol in popular_stocks:
+                
+                # Fetch histories concurrently (rate limited by the fetcher)
+                historical = {}
+                processed = {}
+                for fetched in data_fetcher.iter_fetch_stocks(popular_stocks, years=5):
+                    symbol = fetched.symbol
+                    if fetched.error is not None:
+                        print(f"Error updating {symbol}: {str(fetched.error)}")
+                        continue
                     try:
-                        # Fetch and process data
-                        historical_data = data_fetcher.fetch_stock_data(symbol, years=5)
-                        processed_data = data_preprocessor.preprocess(historical_data)
-                        
-                        # Make predictions
-                        predictions = ensemble_model.predict(processed_data, 30)
-                        
-                        # Store in cache
-                        stock_info = data_fetcher.get_stock_info(symbol)
-                        prediction_cache[symbol] = {
-                            "symbol": symbol,
-                            "stock_info": stock_info,
-                            "predictions": predictions,
-                            "historical": historical_data.to_dict(orient='records'),
-                            "last_updated": datetime.now().isoformat()
-                        }
-                        print(f"Updated cache for {symbol}")
-                        time.sleep(2)  # Avoid API rate limits
+                        # Process data
+                        historical[symbol] = fetched.data
+                        processed[symbol] = data_preprocessor.preprocess(fetched.data)
                     except Exception as e:
                         print(f"Error updating {symbol}: {str(e)}")
                 
+                # Forecast all symbols in one batch instead of one model call per symbol and day
+                all_predictions, batch_metadata = ensemble_model.predict_many(processed, 30, return_metadata=True)
+                # Warm the company information cache the analyze page reads
+                data_fetcher.get_stock_info_many(list(all_predictions))
+                
+                for symbol in processed:
+                    if symbol not in all_predictions:
+                        print(f"Error updating {symbol}: no predictions")
+                        continue
+                    
+                    # Store under the key a 30-day /analyze request for the same history looks up,
+                    # with the batch's member timings for the analyze page
+                    forecast_store.put(symbol, historical[symbol].index[-1], 30, ensemble_model.version(symbol),
+                                       all_predictions[symbol], dict(batch_metadata, tier='full', batch=len(processed)),
+                                       last_closes=historical[symbol]['Close'].iloc[-2:].tolist())
+                    print(f"Updated stored forecast for {symbol}")
+                
                 last_cache_update = current_time
                 print(f"Cache update completed at {last_cache_update}")
             except Exception as e:
@@ -101,6 +219,8 @@ def background_data_updater():
 
 def create_historical_chart(historical_data):
     """Create an interactive plotly chart for historical data"""
+    import plotly.graph_objects as go
+    
     # ... keep existing code (chart creation function)
     df = pd.DataFrame(historical_data)
     df['Date'] = pd.to_datetime(df['Date'])
@@ -140,6 +260,8 @@ def create_historical_chart(historical_data):
 
 def create_prediction_chart(historical_data, predictions):
     """Create an interactive plotly chart for predictions"""
+    import plotly.graph_objects as go
+    
     # ... keep existing code (prediction chart creation function)
     df_hist = pd.DataFrame(historical_data)
     df_hist['Date'] = pd.to_datetime(df_hist['Date'])
@@ -200,20 +322,25 @@ def create_prediction_chart(historical_data, predictions):
 @app.route('/')
 def index():
     """Main page with stock search and popular stocks"""
+    data_fetcher = get_service('data_fetcher')
     popular_stocks = data_fetcher.get_popular_symbols(limit=20)
     # Get stock data for popular stocks
     stocks_with_info = []
     
+    # One batch lookup: cached information is served locally, misses are fetched concurrently
+    infos = data_fetcher.get_stock_info_many(popular_stocks)
+    # Closes saved with the stored forecasts; no history is read or refreshed here
+    quotes = get_service('forecast_store').quotes(popular_stocks)
+    
     for symbol in popular_stocks:
         try:
-            info = data_fetcher.get_stock_info(symbol)
-            # Check if in cache and add last price
-            if symbol in prediction_cache:
-                cached_data = prediction_cache[symbol]
-                historical = pd.DataFrame(cached_data['historical'])
-                info['lastPrice'] = historical['Close'].iloc[-1] if not historical.empty else 'N/A'
-                info['change'] = historical['Close'].iloc[-1] - historical['Close'].iloc[-2] if len(historical) > 1 else 0
-                info['changePercent'] = (info['change'] / historical['Close'].iloc[-2] * 100) if len(historical) > 1 else 0
+            info = infos[symbol]
+            # Add the last price for symbols with a stored forecast
+            if symbol in quotes:
+                last_close, previous_close = quotes[symbol]
+                info['lastPrice'] = last_close
+                info['change'] = last_close - previous_close if previous_close else 0
+                info['changePercent'] = (info['change'] / previous_close * 100) if previous_close else 0
             stocks_with_info.append({
                 'symbol': symbol,
                 'info': info
@@ -238,59 +365,59 @@ def analyze_stock():
     days = request.args.get('days', '30')
     prediction_days = int(days)
     
+    # Rank frequently analyzed symbols higher in search results (symbols not in the index are ignored)
+    data_fetcher = get_service('data_fetcher')
+    data_fetcher.symbol_index.record_access(symbol)
+    
     try:
-        # Check if we have fresh cached predictions
-        if symbol in prediction_cache:
-            cache_date = datetime.fromisoformat(prediction_cache[symbol]['last_updated'])
-            cache_age = (datetime.now() - cache_date).total_seconds() / 3600
-            
-            if cache_age < 24:  # If cache is less than 24 hours old
-                print(f"Using cached prediction for {symbol}, {cache_age:.2f} hours old")
-                cached_data = prediction_cache[symbol]
-                
-                historical_data = pd.DataFrame(cached_data['historical'])
-                historical_chart = create_historical_chart(cached_data['historical'])
-                
-                prediction_df = pd.DataFrame(cached_data['predictions'])
-                future_chart = create_prediction_chart(cached_data['historical'], cached_data['predictions'])
-                
-                metrics = {
-                    "MAPE": 1.8,  # Mean Absolute Percentage Error
-                    "R2": 0.96,   # R-squared value
-                    "Accuracy": 94.2  # Direction prediction accuracy percentage
-                }
-                
-                stock_info = cached_data['stock_info']
-                
-                return render_template(
-                    'analyze.html', 
-                    symbol=symbol, 
-                    historical_chart=historical_chart,
-                    prediction_chart=future_chart,
-                    metrics=metrics,
-                    stock_info=stock_info,
-                    days=prediction_days
-                )
-        
-        # If we don't have cached data, generate new predictions
-        print(f"Generating new prediction for {symbol}")
+        # Histories come from the fetcher's cache; a new bar changes the forecast key
         historical_data = data_fetcher.fetch_stock_data(symbol, years=5)
+        historical_records = historical_data.reset_index().to_dict('records')
         
-        # Preprocess data for modeling
-        processed_data = data_preprocessor.preprocess(historical_data)
+        # Reuse a stored forecast made from the same last bar, horizon and models
+        ensemble_model = get_service('ensemble_model')
+        forecast_store = get_service('forecast_store')
+        forecast_key = (symbol, historical_data.index[-1], prediction_days, ensemble_model.version(symbol))
+        last_closes = historical_data['Close'].iloc[-2:].tolist()
+        stored = forecast_store.get(*forecast_key)
+        if stored is not None and stored[1].get('tier') == 'fast' and \
+                not ensemble_model.is_refining(symbol, prediction_days, historical_data.index[-1]):
+            # The refinement that would replace it is gone (restart or lost): forecast again
+            stored = None
         
-        # Make predictions using ensemble model
-        predictions = ensemble_model.predict(processed_data, prediction_days)
+        if stored is not None:
+            predictions, prediction_metadata = stored
+            print(f"Using stored {prediction_metadata.get('tier', 'full')} forecast for {symbol}, {prediction_days} days")
+        else:
+            print(f"Generating new prediction for {symbol}")
+            
+            # Preprocess data for modeling
+            processed_data = get_service('data_preprocessor').preprocess(historical_data)
+            
+            # Make predictions using ensemble model, within the latency budget if there is one
+            if LATENCY_BUDGET > 0:
+                # A fast forecast is stored before the refinement can replace (or discard) it
+                predictions, prediction_metadata = ensemble_model.predict_within(
+                    processed_data, LATENCY_BUDGET, prediction_days, symbol=symbol,
+                    on_refined=_refined_forecast_handler(forecast_store, forecast_key, last_closes),
+                    on_fast=lambda fast_predictions, metadata: forecast_store.put(
+                        *forecast_key, fast_predictions, metadata, last_closes=last_closes))
+            else:
+                predictions, prediction_metadata = ensemble_model.predict(
+                    processed_data, prediction_days, symbol=symbol, return_metadata=True)
+            print(f"Ensemble members for {symbol} ({prediction_metadata.get('tier', 'full')} tier): " + ", ".join(
+                f"{member['model']} {member['status']} in {member['seconds']:.2f}s" for member in prediction_metadata['members']))
+            
+            # A fast forecast without a refinement (the full one failed) is not kept
+            if prediction_metadata.get('tier', 'full') == 'full':
+                forecast_store.put(*forecast_key, predictions, prediction_metadata, last_closes=last_closes)
         
         # Get stock information
         stock_info = data_fetcher.get_stock_info(symbol)
         
         # Generate charts
-        historical_chart = create_historical_chart(historical_data.reset_index().to_dict('records'))
-        future_chart = create_prediction_chart(
-            historical_data.reset_index().to_dict('records'),
-            predictions
-        )
+        historical_chart = create_historical_chart(historical_records)
+        future_chart = create_prediction_chart(historical_records, predictions)
         
         # Calculate metrics
         metrics = {
@@ -299,15 +426,6 @@ def analyze_stock():
             "Accuracy": 94.2  # Direction prediction accuracy percentage
         }
         
-        # Cache the results
-        prediction_cache[symbol] = {
-            "symbol": symbol,
-            "stock_info": stock_info,
-            "predictions": predictions,
-            "historical": historical_data.reset_index().to_dict('records'),
-            "last_updated": datetime.now().isoformat()
-        }
-        
         return render_template(
             'analyze.html', 
             symbol=symbol,
@@ -315,7 +433,8 @@ def analyze_stock():
             prediction_chart=future_chart,
             metrics=metrics,
             stock_info=stock_info,
-            days=prediction_days
+            days=prediction_days,
+            prediction_metadata=prediction_metadata
         )
     
     except Exception as e:
@@ -326,39 +445,32 @@ def analyze_stock():
 def available_stocks():
     """Get available stocks for search autocomplete"""
     try:
-        stocks = data_fetcher.get_available_symbols()
-        stocks_with_info = []
-        
+        data_fetcher = get_service('data_fetcher')
         # Use limit and offset for pagination if provided
         limit = int(request.args.get('limit', 1000))  # Default to 1000 stocks per page
         offset = int(request.args.get('offset', 0))
-        query = request.args.get('query', '').lower()
+        query = request.args.get('query', '')
         
-        # Filter by query if provided
         if query:
-            filtered_stocks = [s for s in stocks if query in s.lower()]
+            # Ranked prefix and fuzzy matches from the prebuilt search index
+            stocks_with_info, total = data_fetcher.search_symbols(query, limit=limit, offset=offset)
         else:
-            filtered_stocks = stocks
+            stocks = data_fetcher.get_available_symbols()
+            total = len(stocks)
             
-        # Apply pagination
-        paginated_stocks = filtered_stocks[offset:offset+limit]
-        
-        for symbol in paginated_stocks:
-            try:
-                info = data_fetcher.get_stock_info(symbol)
-                stocks_with_info.append({
-                    'symbol': symbol,
-                    'name': info.get('shortName', symbol)
-                })
-            except:
-                stocks_with_info.append({
-                    'symbol': symbol,
-                    'name': symbol
-                })
+            # Apply pagination
+            paginated_stocks = stocks[offset:offset+limit]
+            
+            # Names come from the info cache only; the background updater keeps it warm
+            infos = data_fetcher.get_stock_info_many(paginated_stocks, fetch_missing=False)
+            stocks_with_info = [
+                {'symbol': symbol, 'name': infos[symbol].get('shortName') or symbol}
+                for symbol in paginated_stocks
+            ]
         
         return jsonify({
             "stocks": stocks_with_info,
-            "total": len(filtered_stocks),
+            "total": total,
             "limit": limit,
             "offset": offset
         })
@@ -370,7 +482,7 @@ def stock_count():
     """Get count of available stocks"""
     try:
         return jsonify({
-            "count": len(data_fetcher.get_available_symbols()),
+            "count": len(get_service('data_fetcher').get_available_symbols()),
             "last_updated": last_stocks_update.isoformat()
         })
     except Exception as e:
@@ -381,9 +493,15 @@ def about():
     """About page with information about the app"""
     return render_template('about.html')
 
+def _fit_cache_stats():
+    # Fits happen in processes that loaded the models; reading the counters must not load them
+    registry_module = sys.modules.get('models.registry')
+    return registry_module.fit_cache.stats() if registry_module is not None else {}
+
 @app.route('/health')
 def health_check():
     """Health check endpoint"""
+    data_fetcher = get_service('data_fetcher')
     return jsonify({
         "status": "healthy", 
         "version": "3.0.0", 
@@ -394,7 +512,12 @@ def health_check():
         },
         "last_cache_update": last_cache_update.isoformat(),
         "last_stocks_update": last_stocks_update.isoformat(),
-        "cached_symbols": list(prediction_cache.keys()),
+        "cached_symbols": get_service('forecast_store').symbols(),
+        "forecast_store": get_service('forecast_store').stats(),
+        "loaded_services": [name for name in SERVICE_FACTORIES if name in _services],
+        "model_registry": _services['model_registry'].stats() if 'model_registry' in _services else None,
+        "fit_cache": _fit_cache_stats(),
+        "history_cache": data_fetcher.get_cache_stats(),
         "total_available_symbols": len(data_fetcher.get_available_symbols())
     })
 
@@ -0,0 +1,67 @@
+"""
+Benchmark BaselineModel fit and forecast latency over the cached universe
+
+Times one batched fit and forecast of every cached symbol, and a single-symbol
+forecast with a warm and a cold fit, in milliseconds per symbol.
+
+Run from the backend directory:
+    python -m benchmarks.bench_baseline --cache-dir ../data/cache --days 30
+"""
+import argparse
+import os
+import timeit
+
+from data.cache_backend import CSVCacheBackend
+from models.baseline_model import BaselineModel
+
+
+def cached_closes(cache_dir, period, currency):
+    """Symbol -> cached history for every readable CSV entry"""
+    backend = CSVCacheBackend(cache_dir)
+    suffix = f"_{period}_{currency}.csv"
+    frames = {}
+    if not os.path.isdir(cache_dir):
+        return frames
+    for name in sorted(os.listdir(cache_dir)):
+        if not name.endswith(suffix):
+            continue
+        symbol = name[:-len(suffix)]
+        try:
+            frames[symbol] = backend.load(symbol, period, currency)
+        except Exception as e:
+            print(f"Skipping {symbol}: {str(e)}")
+    return frames
+
+
+def report(name, seconds, count):
+    print(f"  {name:<34} {seconds * 1000 / count:8.2f} ms/symbol")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cache-dir', default='../data/cache')
+    parser.add_argument('--period', default='5y')
+    parser.add_argument('--currency', default='INR')
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    frames = cached_closes(args.cache_dir, args.period, args.currency)
+    if not frames:
+        parser.exit(1, f"No readable *_{args.period}_{args.currency}.csv histories in {os.path.abspath(args.cache_dir)}; "
+                       f"pass --cache-dir\n")
+    symbol, data = next(iter(frames.items()))
+    print(f"{len(frames)} symbols, {args.days}-day forecasts")
+
+    def best(run):
+        return min(timeit.repeat(run, number=1, repeat=args.repeat))
+
+    model = BaselineModel()
+    report('batched fit', best(lambda: model.train_many(frames)), len(frames))
+    report('batched forecast (fitted)', best(lambda: model.predict_many(frames, args.days)), len(frames))
+    report(f'{symbol} forecast (fitted)', best(lambda: model.predict(data, args.days, symbol=symbol)), 1)
+    report(f'{symbol} forecast (cold)', best(lambda: BaselineModel().predict(data, args.days, symbol=symbol)), 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark cache-hit loads of a 5y history: legacy CSV vs the columnar backend
+
+Run from the backend directory:
+    python -m benchmarks.bench_cache --cache-dir ../data/cache --symbol AAPL
+"""
+import argparse
+import shutil
+import tempfile
+import timeit
+
+import pandas as pd
+
+from data.cache_backend import CSVCacheBackend, NumpyCacheBackend
+
+
+def legacy_csv_load(path):
+    """The cache-hit path StockDataFetcher used before the columnar backend"""
+    df = pd.read_csv(path, parse_dates=['Date'])
+    df.set_index('Date', inplace=True)
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cache-dir', default='data/cache')
+    parser.add_argument('--symbol', default='AAPL')
+    parser.add_argument('--period', default='5y')
+    parser.add_argument('--currency', default='INR')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    key = (args.symbol, args.period, args.currency)
+    csv_backend = CSVCacheBackend(args.cache_dir)
+    data = csv_backend.load(*key)
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        npy_backend = NumpyCacheBackend(work_dir)
+        mmap_backend = NumpyCacheBackend(work_dir, mmap=True)
+        npy_backend.save(*key, data)
+
+        cases = {
+            'csv (legacy read_csv)': lambda: legacy_csv_load(csv_backend.path(*key)),
+            'csv backend': lambda: csv_backend.load(*key),
+            'npy backend': lambda: npy_backend.load(*key),
+            'npy backend (mmap)': lambda: mmap_backend.load(*key),
+        }
+
+        print(f"{args.symbol}: {len(data)} bars x {len(data.columns)} columns, {args.repeat} loads each")
+        baseline = None
+        for name, load in cases.items():
+            seconds = min(timeit.repeat(load, number=1, repeat=args.repeat))
+            baseline = baseline or seconds
+            print(f"  {name:<24} {seconds * 1000:8.3f} ms  ({baseline / seconds:5.1f}x)")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark EnsembleModel.predict with members run one after another vs concurrently
+
+Members are the LSTM, Prophet and baseline models that can run here: a member
+whose library is missing or that has no trained model is left out. Reports the
+wall-clock forecast time and each member's time from the prediction metadata.
+
+Run from the backend directory:
+    python -m benchmarks.bench_ensemble --cache-dir ../data/cache --symbol AAPL --days 30
+"""
+import argparse
+import timeit
+
+from data.cache_backend import CSVCacheBackend
+from data.preprocessor import DataPreprocessor
+from models.baseline_model import BaselineModel
+from models.ensemble import EnsembleModel
+
+
+def available_members(data, days):
+    """Instances of the member models that can predict the data here"""
+    factories = {'baseline': BaselineModel}
+    try:
+        from models.prophet_model import ProphetModel
+        import prophet  # noqa: F401
+        factories['prophet'] = lambda: ProphetModel(interval_mode='sampled')
+    except ImportError:
+        print("Prophet is not installed; leaving it out")
+    try:
+        from models.lstm_model import LSTMModel
+        import tensorflow  # noqa: F401
+        factories['lstm'] = lambda: LSTMModel(attention=True, n_layers=3)
+    except ImportError:
+        print("TensorFlow is not installed; leaving the LSTM out")
+
+    members = []
+    for name, factory in factories.items():
+        model = factory()
+        try:
+            # Also loads or fits the model, so only prediction is timed below
+            model.predict(data, days)
+            members.append(model)
+        except Exception as e:
+            print(f"Leaving {name} out: {str(e)}")
+    return members
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cache-dir', default='data/cache')
+    parser.add_argument('--symbol', default='AAPL')
+    parser.add_argument('--period', default='5y')
+    parser.add_argument('--currency', default='INR')
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    data = DataPreprocessor().preprocess(CSVCacheBackend(args.cache_dir).load(args.symbol, args.period, args.currency))
+    members = available_members(data, args.days)
+    print(f"{args.symbol}: {args.days}-day ensemble forecast with {', '.join(type(m).__name__ for m in members)}")
+
+    baseline = None
+    for name, parallel in (('sequential', False), ('parallel', True)):
+        ensemble = EnsembleModel(members, parallel=parallel)
+        runs = []
+        seconds = min(timeit.repeat(lambda: runs.append(ensemble.predict(data, args.days, return_metadata=True)[1]),
+                                    number=1, repeat=args.repeat))
+        baseline = baseline or seconds
+        timings = ', '.join(f"{m['model']} {m['seconds'] * 1000:.1f} ms" for m in runs[-1]['members'])
+        print(f"  {name:<12} {seconds * 1000:10.1f} ms  ({baseline / seconds:4.1f}x)  [{timings}]")
+
+
+if __name__ == '__main__':
+    main()
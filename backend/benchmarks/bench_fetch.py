@@ -0,0 +1,84 @@
+"""
+Benchmark concurrent multi-symbol fetching against a latency-injecting fake source
+
+Shows fetch throughput scaling with the number of workers until it reaches
+the configured request rate. Over any one second the number of requests may not
+exceed the rate plus the token bucket's burst capacity.
+
+Run from the backend directory:
+    python -m benchmarks.bench_fetch --symbols 60 --latency 0.25 --rate 20
+"""
+import argparse
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from data.fetcher import StockDataFetcher
+from data.providers import MarketDataProvider
+
+
+class FakeLatencyProvider(MarketDataProvider):
+    """Provider that sleeps instead of calling the network and records request times"""
+
+    name = 'fake-latency'
+
+    def __init__(self, latency, bars=1250):
+        self.latency = latency
+        self.bars = bars
+        self.request_times = []
+        self._times_lock = threading.Lock()
+
+    def history(self, symbol, period=None, start=None):
+        with self._times_lock:
+            self.request_times.append(time.monotonic())
+        time.sleep(self.latency)
+
+        dates = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=self.bars, name='Date')
+        close = 100 * np.exp(np.cumsum(np.random.normal(0, 0.01, self.bars)))
+        return pd.DataFrame({
+            'Open': close, 'High': close * 1.01, 'Low': close * 0.99,
+            'Close': close, 'Volume': np.full(self.bars, 1_000_000)
+        }, index=dates)
+
+
+def peak_rate(request_times, window=1.0):
+    """Largest number of requests started within any `window` seconds"""
+    times = np.sort(np.asarray(request_times))
+    if len(times) == 0:
+        return 0
+    ends = np.searchsorted(times, times + window, side='left')
+    return int(np.max(ends - np.arange(len(times))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--symbols', type=int, default=60)
+    parser.add_argument('--latency', type=float, default=0.25, help='Seconds per fake request')
+    parser.add_argument('--rate', type=float, default=20.0, help='Rate limit in requests per second')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    symbols = [f"SYM{i:04d}" for i in range(args.symbols)]
+    cache_dir = tempfile.mkdtemp()
+    try:
+        print(f"{args.symbols} symbols, {args.latency * 1000:.0f} ms latency, limit {args.rate:.0f} req/s")
+        for workers in args.workers:
+            provider = FakeLatencyProvider(args.latency)
+            fetcher = StockDataFetcher(cache_dir=cache_dir, provider=provider,
+                                       max_requests_per_second=args.rate, max_workers=workers)
+            start = time.perf_counter()
+            results = fetcher.fetch_multiple_stocks(symbols, use_cache=False)
+            elapsed = time.perf_counter() - start
+            print(f"  workers={workers:<3} {elapsed:6.2f} s  {len(results) / elapsed:6.1f} symbols/s  "
+                  f"peak {peak_rate(provider.request_times)} req in any 1 s "
+                  f"(limit {args.rate:.0f}/s + burst {fetcher.rate_limiter.capacity:.0f})")
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark technical-indicator computation: the previous per-module pandas code vs the shared engine,
+and a full recompute vs a streaming update when one bar arrives
+
+Run from the backend directory:
+    python -m benchmarks.bench_indicators --cache-dir ../data/cache --symbol AAPL --panel 500
+"""
+import argparse
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from data.cache_backend import CSVCacheBackend
+from data.indicators import FETCHER_INDICATORS, PREPROCESSOR_INDICATORS, IndicatorState, add_indicators, compute_indicators
+
+
+def legacy_fetcher_indicators(data):
+    """The pandas code StockDataFetcher used before the shared engine"""
+    df = data.copy()
+    df['MA20'] = df['Close'].rolling(window=20).mean()
+    df['MA50'] = df['Close'].rolling(window=50).mean()
+    df['MA200'] = df['Close'].rolling(window=200).mean()
+    df['EMA12'] = df['Close'].ewm(span=12, adjust=False).mean()
+    df['EMA26'] = df['Close'].ewm(span=26, adjust=False).mean()
+    df['MACD'] = df['EMA12'] - df['EMA26']
+    df['Signal_Line'] = df['MACD'].ewm(span=9, adjust=False).mean()
+    delta = df['Close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    df['RSI'] = 100 - (100 / (1 + gain / loss))
+    return df
+
+
+def legacy_preprocessor_indicators(data):
+    """The pandas code DataPreprocessor used before the shared engine"""
+    df = data.copy()
+    df['MA5'] = df['Close'].rolling(window=5).mean()
+    df['MA20'] = df['Close'].rolling(window=20).mean()
+    df['MA50'] = df['Close'].rolling(window=50).mean()
+    delta = df['Close'].diff()
+    gain = delta.where(delta > 0, 0).rolling(window=14).mean()
+    loss = -delta.where(delta < 0, 0).rolling(window=14).mean()
+    df['RSI'] = 100 - (100 / (1 + gain / loss))
+    ema12 = df['Close'].ewm(span=12, adjust=False).mean()
+    ema26 = df['Close'].ewm(span=26, adjust=False).mean()
+    df['MACD'] = ema12 - ema26
+    df['MACD_signal'] = df['MACD'].ewm(span=9, adjust=False).mean()
+    df['MA20_std'] = df['Close'].rolling(window=20).std()
+    df['upper_band'] = df['MA20'] + (df['MA20_std'] * 2)
+    df['lower_band'] = df['MA20'] - (df['MA20_std'] * 2)
+    df['Volume_1d_change'] = df['Volume'].pct_change()
+    df['Price_1d_change'] = df['Close'].pct_change()
+    df['Price_5d_change'] = df['Close'].pct_change(periods=5)
+    return df
+
+
+def report(label, cases, repeat):
+    print(label)
+    baseline = None
+    for name, run in cases.items():
+        seconds = min(timeit.repeat(run, number=1, repeat=repeat))
+        baseline = baseline or seconds
+        print(f"  {name:<36} {seconds * 1000:9.3f} ms  ({baseline / seconds:5.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cache-dir', default='data/cache')
+    parser.add_argument('--symbol', default='AAPL')
+    parser.add_argument('--period', default='5y')
+    parser.add_argument('--currency', default='INR')
+    parser.add_argument('--panel', type=int, default=500, help='Number of symbols in the panel benchmark')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    data = CSVCacheBackend(args.cache_dir).load(args.symbol, args.period, args.currency)
+    data = data[['Open', 'High', 'Low', 'Close', 'Volume']]
+    close, volume = data['Close'].to_numpy(), data['Volume'].to_numpy(dtype=np.float64)
+    names = list(dict.fromkeys(FETCHER_INDICATORS + PREPROCESSOR_INDICATORS))
+
+    report(f"{args.symbol}: {len(data)} bars, fetcher + preprocessor indicators", {
+        'pandas (fetcher + preprocessor)': lambda: (legacy_fetcher_indicators(data),
+                                                    legacy_preprocessor_indicators(data)),
+        'engine (shared intermediates)': lambda: compute_indicators({'Close': close, 'Volume': volume}, names),
+    }, args.repeat)
+
+    # One new bar: recompute the whole history vs advance the streaming state
+    history = add_indicators(data.copy(), FETCHER_INDICATORS, overwrite=True)
+    state = IndicatorState.from_history(history)
+    last_close = float(close[-1])
+    report("one new bar, fetcher indicators", {
+        'pandas (full recompute)': lambda: legacy_fetcher_indicators(data),
+        'engine (full recompute)': lambda: compute_indicators({'Close': close}, FETCHER_INDICATORS),
+        'IndicatorState.update': lambda: state.update(last_close),
+    }, args.repeat)
+
+    # Synthetic panel: randomly rescaled copies of the real series, one row per symbol
+    rng = np.random.default_rng(0)
+    scales = np.exp(rng.normal(0, 0.5, size=(args.panel, 1)))
+    panel_close = close[np.newaxis, :] * scales
+    panel_volume = np.repeat(volume[np.newaxis, :], args.panel, axis=0)
+    frames = [pd.DataFrame({'Close': row, 'Volume': volume}, index=data.index) for row in panel_close]
+
+    report(f"panel: {args.panel} symbols x {len(data)} bars", {
+        'pandas (per-symbol loop)': lambda: [(legacy_fetcher_indicators(f), legacy_preprocessor_indicators(f))
+                                             for f in frames],
+        'engine (2-D panel)': lambda: compute_indicators({'Close': panel_close, 'Volume': panel_volume}, names),
+    }, max(3, args.repeat // 10))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Compare recursive and direct multi-horizon LSTM forecasts: latency and accuracy
+
+Both variants are trained briefly on the same history (all but the last
+--test-days bars) and then forecast --days ahead from several origins in the
+held-out part. Accuracy is the mean absolute percentage error per forecast
+day. Requires TensorFlow. Run from the backend directory:
+    python -m benchmarks.bench_lstm_direct --cache-dir ../data/cache --symbol AAPL --epochs 10
+"""
+import argparse
+import os
+import tempfile
+import timeit
+
+# Benchmark on CPU regardless of available accelerators
+os.environ.setdefault('CUDA_VISIBLE_DEVICES', '-1')
+
+import numpy as np
+import pandas as pd
+
+from data.cache_backend import CSVCacheBackend
+from models.lstm_model import LSTMModel
+
+
+def fresh_model(mode, days, epochs, work_dir):
+    """An untrained model that saves into work_dir instead of saved_models/"""
+    lstm = LSTMModel(attention=True, epochs=epochs, mode=mode, horizon=days)
+    lstm.model_path = os.path.join(work_dir, f'lstm_{mode}_model')
+    lstm.scaler_path = os.path.join(work_dir, f'lstm_{mode}_scaler.pkl')
+    lstm.model = lstm._build_model()
+    return lstm
+
+
+def forecast_errors(lstm, data, origins, days):
+    """Absolute percentage error per forecast day, averaged over the origins"""
+    frames = {origin: data.iloc[:origin] for origin in origins}
+    predictions = lstm.predict_many(frames, days)
+    errors = []
+    for origin, records in predictions.items():
+        predicted = pd.DataFrame(records)['Price'].to_numpy()
+        actual = data['Close'].to_numpy()[origin:origin + days]
+        errors.append(np.abs(predicted - actual) / actual * 100)
+    return np.mean(errors, axis=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cache-dir', default='data/cache')
+    parser.add_argument('--symbol', default='AAPL')
+    parser.add_argument('--period', default='5y')
+    parser.add_argument('--currency', default='INR')
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--test-days', type=int, default=120)
+    parser.add_argument('--origins', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    data = CSVCacheBackend(args.cache_dir).load(args.symbol, args.period, args.currency).dropna()
+    train_data = data.iloc[:-args.test_days]
+    last_origin = len(data) - args.days
+    origins = np.linspace(len(train_data), last_origin, args.origins).astype(int)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        models = {mode: fresh_model(mode, args.days, args.epochs, work_dir) for mode in LSTMModel.MODES}
+
+        print(f"{args.symbol}: {args.days}-day forecasts, trained {args.epochs} epochs on {len(train_data)} bars")
+        for mode, lstm in models.items():
+            lstm.train(train_data)
+
+        print("latency (one forecast)")
+        baseline = None
+        for mode, lstm in models.items():
+            lstm.predict(train_data, args.days)  # trace the tf.function
+            seconds = min(timeit.repeat(lambda: lstm.predict(train_data, args.days), number=1, repeat=args.repeat))
+            baseline = baseline or seconds
+            print(f"  {mode:<10} {seconds * 1000:9.1f} ms  ({baseline / seconds:5.1f}x)")
+
+        print(f"MAPE over {len(origins)} held-out origins")
+        checkpoints = sorted({0, args.days // 4, args.days // 2, args.days - 1})
+        print("  " + " " * 10 + "".join(f"  day {day + 1:>3}" for day in checkpoints) + "     mean")
+        for mode, lstm in models.items():
+            errors = forecast_errors(lstm, data, origins, args.days)
+            print(f"  {mode:<10}" + "".join(f"  {errors[day]:6.2f}%" for day in checkpoints) + f"  {errors.mean():6.2f}%")
+
+
+if __name__ == '__main__':
+    main()
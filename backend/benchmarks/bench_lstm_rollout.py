@@ -0,0 +1,103 @@
+"""
+Benchmark a 30-day LSTM forecast on CPU: per-day Model.predict vs the compiled rollout
+vs the exported model in the NumPy runtime, and forecasting many symbols one at a time
+vs in one batch
+
+Requires TensorFlow. Run from the backend directory:
+    python -m benchmarks.bench_lstm_rollout --cache-dir ../data/cache --symbol AAPL --symbols 30
+"""
+import argparse
+import copy
+import os
+import tempfile
+import timeit
+
+# Benchmark on CPU regardless of available accelerators
+os.environ.setdefault('CUDA_VISIBLE_DEVICES', '-1')
+
+import numpy as np
+
+from data.cache_backend import CSVCacheBackend
+from models.lstm_model import LSTMModel
+from models.numpy_runtime import NumpyModel
+
+
+def legacy_rollout(model, features, window_size, prediction_days):
+    """The loop LSTMModel.predict used before the compiled rollout"""
+    input_data = features[-window_size:]
+    predictions = []
+    current_batch = input_data.reshape(1, window_size, features.shape[1])
+    for _ in range(prediction_days):
+        next_pred = model.predict(current_batch, verbose=0)[0, 0]
+        predictions.append(next_pred)
+        next_features = np.zeros((1, features.shape[1]))
+        next_features[0, 0] = next_pred
+        for j in range(1, features.shape[1]):
+            next_features[0, j] = current_batch[0, -1, j]
+        current_batch = np.append(current_batch[:, 1:, :], next_features.reshape(1, 1, features.shape[1]), axis=1)
+    return np.array(predictions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cache-dir', default='data/cache')
+    parser.add_argument('--symbol', default='AAPL')
+    parser.add_argument('--period', default='5y')
+    parser.add_argument('--currency', default='INR')
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--symbols', type=int, default=30, help='Number of symbols in the batch benchmark')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    data = CSVCacheBackend(args.cache_dir).load(args.symbol, args.period, args.currency)
+    lstm = LSTMModel(attention=True, runtime='keras')
+    features = lstm._prepare_features(data)
+    window = features[-lstm.window_size:]
+
+    legacy = legacy_rollout(lstm.model, features, lstm.window_size, args.days)
+    compiled = lstm._rollout(window, args.days)  # also traces the tf.function
+    print(f"max |legacy - compiled| = {np.max(np.abs(legacy - compiled)):.2e}")
+
+    # The same model exported and served by the NumPy runtime
+    numpy_lstm = copy.copy(lstm)
+    with tempfile.TemporaryDirectory() as tmp:
+        lstm.export(os.path.join(tmp, 'lstm_model.npz'))
+        numpy_lstm.numpy_model = NumpyModel.load(os.path.join(tmp, 'lstm_model.npz'))
+    exported = numpy_lstm._rollout(window, args.days)
+    print(f"max |compiled - numpy runtime| = {np.max(np.abs(compiled - exported)):.2e}")
+
+    # One raw forward pass, the floor for each forecast day
+    step = window[np.newaxis].astype(np.float32)
+    forward = lstm._forward_fn()
+
+    cases = {
+        'Model.predict per day': lambda: legacy_rollout(lstm.model, features, lstm.window_size, args.days),
+        'compiled rollout': lambda: lstm._rollout(window, args.days),
+        f'{args.days} raw forward passes': lambda: [forward(step) for _ in range(args.days)],
+        'NumPy runtime rollout': lambda: numpy_lstm._rollout(window, args.days),
+    }
+
+    report(f"{args.symbol}: {args.days}-day forecast, window {lstm.window_size}, {features.shape[1]} features",
+           cases, args.repeat)
+
+    # The same history under different names stands in for a universe of symbols
+    frames = {f"{args.symbol}-{i}": data for i in range(args.symbols)}
+    lstm.predict_many(frames, args.days)  # trace the batch shape
+    report(f"{args.symbols} symbols", {
+        'predict per symbol': lambda: [lstm.predict(frame, args.days) for frame in frames.values()],
+        'predict_many': lambda: lstm.predict_many(frames, args.days),
+        'predict_many (NumPy runtime)': lambda: numpy_lstm.predict_many(frames, args.days),
+    }, max(1, args.repeat // 2))
+
+
+def report(label, cases, repeat):
+    print(label)
+    baseline = None
+    for name, run in cases.items():
+        seconds = min(timeit.repeat(run, number=1, repeat=repeat))
+        baseline = baseline or seconds
+        print(f"  {name:<30} {seconds * 1000:9.1f} ms  ({baseline / seconds:5.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
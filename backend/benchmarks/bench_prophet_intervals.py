@@ -0,0 +1,88 @@
+"""
+Benchmark per-symbol Prophet fit and predict latency over the cached universe
+
+Fits every cached symbol serially and with ProphetModel.train_many across worker
+processes, then times predict in each interval mode: Prophet's sampled intervals
+(1000 trajectories), reduced sampling and the analytic bounds. Needs Prophet.
+
+Run from the backend directory:
+    python -m benchmarks.bench_prophet_intervals --cache-dir ../data/cache --limit 20 --workers 4
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from data.cache_backend import CSVCacheBackend
+from data.preprocessor import DataPreprocessor
+from models.prophet_model import ProphetModel
+from models.registry import ModelRegistry
+
+
+def cached_histories(cache_dir, period, currency, limit):
+    """(symbol, preprocessed data) for the cached CSV histories"""
+    backend = CSVCacheBackend(cache_dir)
+    preprocessor = DataPreprocessor()
+    suffix = f"_{period}_{currency}.csv"
+    symbols = sorted(name[:-len(suffix)] for name in os.listdir(cache_dir) if name.endswith(suffix))
+    return [(symbol, preprocessor.preprocess(backend.load(symbol, period, currency)))
+            for symbol in symbols[:limit]]
+
+
+def report(label, seconds, count, baseline=None):
+    per_symbol = seconds / count * 1000
+    speedup = f"  ({baseline / seconds:5.1f}x)" if baseline else ''
+    print(f"  {label:<32} {per_symbol:10.1f} ms/symbol{speedup}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cache-dir', default='data/cache')
+    parser.add_argument('--period', default='5y')
+    parser.add_argument('--currency', default='INR')
+    parser.add_argument('--limit', type=int, default=20, help='Number of cached symbols to use')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--days', type=int, default=30)
+    args = parser.parse_args()
+
+    histories = cached_histories(args.cache_dir, args.period, args.currency, args.limit)
+    print(f"{len(histories)} symbols, {args.days}-day forecasts")
+    root = tempfile.mkdtemp(prefix='bench-prophet-')
+    try:
+        print("Fit")
+        model = ProphetModel(registry=ModelRegistry(os.path.join(root, 'serial')))
+        started = time.perf_counter()
+        for symbol, data in histories:
+            model.train(data, symbol=symbol)
+        serial = time.perf_counter() - started
+        report('serial', serial, len(histories))
+
+        parallel_model = ProphetModel(registry=ModelRegistry(os.path.join(root, 'parallel')))
+        started = time.perf_counter()
+        parallel_model.train_many(histories, workers=args.workers)
+        report('train_many', time.perf_counter() - started, len(histories), serial)
+
+        print("Predict")
+        baseline = None
+        for mode in ProphetModel.INTERVAL_MODES:
+            model = ProphetModel(registry=ModelRegistry(os.path.join(root, 'serial')), seed=0, interval_mode=mode)
+            # Load every model first, so only predict is timed
+            for symbol, data in histories:
+                model.predict(data, args.days, symbol=symbol)
+            widths = []
+            started = time.perf_counter()
+            for symbol, data in histories:
+                forecast = model.predict(data, args.days, symbol=symbol)
+                widths.append(np.mean([row['Upper'] - row['Lower'] for row in forecast]))
+            seconds = time.perf_counter() - started
+            baseline = baseline or seconds
+            report(f"{mode} (mean width {np.mean(widths):.1f})", seconds, len(histories), baseline)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark a Prophet forecast: the previous predict (future frame over the whole history,
+regressor paths built with np.append loops) vs the future-only, lfilter-based predict
+
+The regressor path comparison needs only NumPy and SciPy; the full forecast
+comparison fits a Prophet model on one cached history first and needs Prophet.
+
+Run from the backend directory:
+    python -m benchmarks.bench_prophet_predict --cache-dir ../data/cache --symbol AAPL --days 30
+"""
+import argparse
+import timeit
+
+import numpy as np
+
+from data.cache_backend import CSVCacheBackend
+from data.preprocessor import DataPreprocessor
+from models.prophet_model import ProphetModel
+
+
+def legacy_regressors(scaler_data, length):
+    """The regressor loops ProphetModel.predict ran over history plus forecast rows"""
+    regressors = {'volume': scaler_data['last_volume'] * (1 + np.arange(length) * 0.0005)}
+    rsi_values = np.array([scaler_data['last_rsi']])
+    for i in range(1, length):
+        next_rsi = rsi_values[-1] + (50 - rsi_values[-1]) * 0.05 + np.random.normal(0, 3)
+        next_rsi = max(0, min(100, next_rsi))
+        rsi_values = np.append(rsi_values, next_rsi)
+    regressors['rsi'] = rsi_values
+    macd_values = np.array([scaler_data['last_macd']])
+    for i in range(1, length):
+        next_macd = macd_values[-1] * 0.9 + np.sin(i/20) * 0.5 + np.random.normal(0, 0.5)
+        macd_values = np.append(macd_values, next_macd)
+    regressors['macd'] = macd_values
+    return regressors
+
+
+def legacy_predict(model, scaler_data, data, prediction_days):
+    """The previous ProphetModel.predict, up to the forecast frame"""
+    future = model.make_future_dataframe(periods=prediction_days, freq='D')
+    for name, values in legacy_regressors(scaler_data, len(future)).items():
+        future[name] = values
+    forecast = model.predict(future)
+    return forecast[forecast['ds'] > data.index[-1]]
+
+
+def report(label, cases, repeat):
+    print(label)
+    baseline = None
+    for name, run in cases.items():
+        seconds = min(timeit.repeat(run, number=1, repeat=repeat))
+        baseline = baseline or seconds
+        print(f"  {name:<30} {seconds * 1000:10.2f} ms  ({baseline / seconds:7.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cache-dir', default='data/cache')
+    parser.add_argument('--symbol', default='AAPL')
+    parser.add_argument('--period', default='5y')
+    parser.add_argument('--currency', default='INR')
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    data = CSVCacheBackend(args.cache_dir).load(args.symbol, args.period, args.currency)
+    scaler_data = {'last_volume': float(data['Volume'].iloc[-1]), 'last_rsi': 55.0, 'last_macd': 0.4}
+    # The previous predict projected regressors over every calendar day of the history plus the forecast
+    history_days = (data.index[-1] - data.index[0]).days + 1
+
+    rng = np.random.default_rng(0)
+    report(f"{args.symbol}: regressor paths, {history_days} history days + {args.days} forecast days", {
+        'np.append loops, all rows': lambda: legacy_regressors(scaler_data, history_days + args.days),
+        'lfilter, forecast rows': lambda: ProphetModel.project_regressors(scaler_data, args.days, rng),
+    }, args.repeat)
+
+    try:
+        import prophet  # noqa: F401
+    except ImportError:
+        print("Prophet is not installed; skipping the full forecast comparison")
+        return
+
+    processed = DataPreprocessor().preprocess(data)
+    prophet_model = ProphetModel(seed=0)
+    model, fitted_scaler_data = prophet_model._fit(processed)
+    prophet_model.model, prophet_model.scaler_data = model, fitted_scaler_data
+
+    report(f"{args.symbol}: {args.days}-day Prophet forecast", {
+        'history + forecast rows': lambda: legacy_predict(model, fitted_scaler_data, processed, args.days),
+        'forecast rows only': lambda: prophet_model.predict(processed, args.days),
+    }, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
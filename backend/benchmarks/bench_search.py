@@ -0,0 +1,92 @@
+"""
+Benchmark symbol autocomplete lookups on a synthetic universe of 10k+ symbols
+
+Compares the prebuilt SymbolIndex with a linear substring scan over symbols
+and company names (the filter /stocks/available used before only scanned
+symbols), and times building and incrementally updating the index.
+
+Run from the backend directory:
+    python -m benchmarks.bench_search --symbols 12000
+"""
+import argparse
+import random
+import string
+import time
+
+import numpy as np
+
+from data.symbol_index import SymbolIndex
+
+WORDS = ['global', 'capital', 'energy', 'pharma', 'motors', 'bank', 'steel', 'power', 'tech',
+         'systems', 'foods', 'chemicals', 'infra', 'health', 'retail', 'finance', 'metals', 'media']
+
+
+def synthetic_universe(n, seed=0):
+    """Random symbols ('.NS' for roughly half) with two or three word company names"""
+    rng = random.Random(seed)
+    entries = {}
+    while len(entries) < n:
+        symbol = ''.join(rng.choices(string.ascii_uppercase, k=rng.randint(2, 8)))
+        if rng.random() < 0.5:
+            symbol += '.NS'
+        name = ' '.join(w.title() for w in rng.sample(WORDS, rng.randint(2, 3))) + ' Ltd'
+        entries[symbol] = name
+    return entries
+
+
+def linear_scan(entries, query):
+    """Substring filter over pre-lowercased (symbol, symbol, name) entries, as the index matches names too"""
+    return [s for s, symbol, name in entries if query in symbol or query in name]
+
+
+def percentiles(fn, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        timings.append(time.perf_counter() - start)
+    return np.percentile(timings, 50) * 1e6, np.percentile(timings, 99) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--symbols', type=int, default=12000)
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    entries = synthetic_universe(args.symbols)
+    symbols = list(entries)
+    rng = random.Random(1)
+
+    index = SymbolIndex()
+    start = time.perf_counter()
+    index.update(entries)
+    print(f"Build: {len(index)} symbols in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    # Incremental refresh: 1% of the universe renamed, 1% added, 1% removed
+    changed = dict(entries)
+    for symbol in rng.sample(symbols, args.symbols // 100):
+        changed[symbol] = entries[symbol] + ' Holdings'
+    for symbol in rng.sample(symbols, args.symbols // 100):
+        changed.pop(symbol, None)
+    changed.update(synthetic_universe(args.symbols // 100, seed=2))
+    start = time.perf_counter()
+    changes = index.update(changed)
+    print(f"Incremental update: {changes} changes in {(time.perf_counter() - start) * 1000:.1f} ms")
+    symbols = list(changed)
+    lowered = [(s, s.lower(), name.lower()) for s, name in changed.items()]
+    index.set_popularity({s: rng.random() for s in rng.sample(symbols, 500)})
+
+    prefixes = [s[:rng.randint(1, 3)].lower() for s in rng.choices(symbols, k=args.queries)]
+    fuzzy = [rng.choice(WORDS)[:rng.randint(3, 6)] for _ in range(args.queries)]
+
+    print(f"{args.queries} queries each, latency p50 / p99 in microseconds")
+    for label, queries in (('prefix', prefixes), ('name/fuzzy', fuzzy)):
+        p50, p99 = percentiles(lambda q: index.search(q, limit=20), queries)
+        print(f"  index  {label:<11} {p50:9.1f} / {p99:9.1f}")
+        p50, p99 = percentiles(lambda q: linear_scan(lowered, q)[:20], queries)
+        print(f"  linear {label:<11} {p50:9.1f} / {p99:9.1f}")
+
+
+if __name__ == '__main__':
+    main()
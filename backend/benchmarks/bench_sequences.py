@@ -0,0 +1,92 @@
+"""
+Benchmark building training sequences: the previous iloc loop vs sliding-window views,
+and materializing a universe of windows vs streaming an epoch of batches from
+memory-mapped feature arrays
+
+Run from the backend directory:
+    python -m benchmarks.bench_sequences --cache-dir ../data/cache --symbol AAPL --symbols 100
+"""
+import argparse
+import tempfile
+import timeit
+import tracemalloc
+
+import numpy as np
+
+from data.cache_backend import CSVCacheBackend
+from data.preprocessor import DataPreprocessor
+from data.window_dataset import WindowDataset
+
+
+def legacy_create_sequences(data, target_col='Close', sequence_length=60):
+    """The loop DataPreprocessor.create_sequences used before sliding-window views"""
+    sequences = []
+    targets = []
+    for i in range(len(data) - sequence_length):
+        seq = data.iloc[i:i+sequence_length]
+        target = data.iloc[i+sequence_length][target_col]
+        sequences.append(seq.values)
+        targets.append(target)
+    return np.array(sequences), np.array(targets)
+
+
+def peak_memory(fn):
+    """Peak bytes allocated while running fn"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def report(label, cases, repeat):
+    print(label)
+    baseline = None
+    for name, run in cases.items():
+        seconds = min(timeit.repeat(run, number=1, repeat=repeat))
+        baseline = baseline or seconds
+        print(f"  {name:<30} {seconds * 1000:10.3f} ms  ({baseline / seconds:8.1f}x)"
+              f"  peak {peak_memory(run) / 2**20:8.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cache-dir', default='data/cache')
+    parser.add_argument('--symbol', default='AAPL')
+    parser.add_argument('--period', default='5y')
+    parser.add_argument('--currency', default='INR')
+    parser.add_argument('--window', type=int, default=60)
+    parser.add_argument('--symbols', type=int, default=100, help='Number of symbols in the multi-symbol benchmark')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    data = CSVCacheBackend(args.cache_dir).load(args.symbol, args.period, args.currency).ffill().dropna()
+    preprocessor = DataPreprocessor()
+
+    report(f"{args.symbol}: {len(data)} bars x {len(data.columns)} columns, window {args.window}", {
+        'iloc loop': lambda: legacy_create_sequences(data, sequence_length=args.window),
+        'views': lambda: preprocessor.create_sequences(data, sequence_length=args.window),
+        'views, float32 copy': lambda: preprocessor.create_sequences(data, sequence_length=args.window,
+                                                                     dtype=np.float32),
+    }, args.repeat)
+
+    # The same history repeated stands in for a universe of symbols
+    universe = [data] * args.symbols
+    with tempfile.TemporaryDirectory() as feature_dir:
+        features = data.select_dtypes('number').to_numpy()
+        for i in range(args.symbols):
+            WindowDataset.save_features(feature_dir, f"{args.symbol}-{i}", features)
+        dataset = WindowDataset.from_directory(feature_dir, window=args.window, validation_split=0.0, seed=0)
+
+        report(f"{args.symbols} symbols", {
+            'iloc loop per symbol': lambda: [legacy_create_sequences(frame, sequence_length=args.window)
+                                             for frame in universe],
+            'stacked, float32': lambda: preprocessor.create_sequences(universe, sequence_length=args.window,
+                                                                      dtype=np.float32),
+            'memory-mapped epoch, shuffled': lambda: sum(len(y) for _, y in dataset.batches()),
+        }, 1)
+
+
+if __name__ == '__main__':
+    main()
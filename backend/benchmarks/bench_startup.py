@@ -0,0 +1,89 @@
+"""
+Benchmark worker cold start: importing the app (lazy services) vs importing it and
+creating every service up front, as the app did before it loaded them on first use
+
+Each case runs in a fresh interpreter. The import breakdown comes from
+`python -X importtime`, listing the slowest imports made directly by the app in the lazy start.
+
+Run from the backend directory:
+    python -m benchmarks.bench_startup --repeat 3 --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ['tensorflow', 'prophet', 'xgboost', 'plotly', 'matplotlib', 'seaborn', 'sklearn']
+
+LAZY_START = "import app"
+
+CASES = {
+    'import app + warm_up()': f"{LAZY_START}; app.warm_up()",
+    'import app (lazy)': LAZY_START,
+}
+
+REPORT_MODULES = (
+    "import sys; "
+    f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+)
+
+
+def run(code, extra_args=()):
+    """Run code in a fresh interpreter, returning (seconds, completed process)"""
+    env = dict(os.environ, STOCK_ANALYZER_WARMUP='0')
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, *extra_args, '-c', code], env=env,
+                            capture_output=True, text=True)
+    seconds = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"'{code}' failed:\n{result.stderr[-2000:]}")
+    return seconds, result
+
+
+def import_breakdown(code, top):
+    """Slowest imports at most one level deep, as (cumulative microseconds, module), from -X importtime"""
+    _, result = run(code, ['-X', 'importtime'])
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        # Nested imports are indented two spaces per level under the module that imported them
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 1:
+            rows.append((int(cumulative), name.rstrip()[1:]))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15, help='Number of slowest imports to list')
+    args = parser.parse_args()
+
+    print("Cold start in a fresh interpreter")
+    baseline = None
+    for name, code in CASES.items():
+        try:
+            seconds = min(run(code)[0] for _ in range(args.repeat))
+            _, result = run(f"{code}; {REPORT_MODULES}")
+        except RuntimeError as e:
+            print(f"  {name:<24} skipped: {str(e).splitlines()[-1]}")
+            continue
+        baseline = baseline or seconds
+        loaded = result.stdout.strip().splitlines()[-1] if result.stdout.strip() else ''
+        print(f"  {name:<24} {seconds * 1000:9.1f} ms  ({baseline / seconds:5.1f}x)  heavy modules: {loaded or 'none'}")
+
+    print(f"Slowest imports of '{LAZY_START}' and its direct imports")
+    try:
+        breakdown = import_breakdown(LAZY_START, args.top)
+    except RuntimeError as e:
+        print(f"  skipped: {str(e).splitlines()[-1]}")
+        return
+    for cumulative, module in breakdown:
+        print(f"  {module:<40} {cumulative / 1000:9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,5 +3,9 @@
 
 from .fetcher import StockDataFetcher
 from .preprocessor import DataPreprocessor
+from .indicators import IndicatorState
+from .providers import MarketDataProvider, YFinanceProvider, ReplayProvider
+from .window_dataset import WindowDataset
+from .forecast_store import ForecastStore
 
-__all__ = ['StockDataFetcher', 'DataPreprocessor']
+__all__ = ['StockDataFetcher', 'DataPreprocessor', 'IndicatorState', 'MarketDataProvider', 'YFinanceProvider', 'ReplayProvider', 'WindowDataset', 'ForecastStore']
@@ -0,0 +1,285 @@
+import errno
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+def to_wall_clock(values):
+    """
+    Convert a column or index of dates to timezone-naive exchange-local timestamps
+
+    yfinance returns dates localized to the exchange timezone, and the CSV cache
+    stores them as strings with a UTC offset that changes with daylight saving
+    time (e.g. '-04:00' and '-05:00' in the same file), which pandas cannot parse
+    into a single datetime64 column. Dropping the offset keeps the trading date
+    each bar belongs to.
+
+    Args:
+        values: DatetimeIndex, Series or array of dates (tz-aware, naive or strings)
+
+    Returns:
+        DatetimeIndex of naive timestamps
+    """
+    index = pd.Index(values)
+    if isinstance(index, pd.DatetimeIndex):
+        return index.tz_localize(None) if index.tz is not None else index
+
+    if len(index) and isinstance(index[0], str):
+        # 'YYYY-MM-DD HH:MM:SS' followed by an optional UTC offset
+        return pd.DatetimeIndex(pd.to_datetime(pd.Series(index).str.slice(0, 19)))
+
+    # Mixed UTC offsets leave an object index of Timestamps
+    return pd.DatetimeIndex([pd.Timestamp(v).replace(tzinfo=None) for v in index])
+
+
+class CacheBackend:
+    """Base class for the on-disk history cache used by StockDataFetcher"""
+
+    name = None
+    extension = None
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def path(self, symbol, period, currency):
+        """Return the cache location for a (symbol, period, currency) key"""
+        return os.path.join(self.cache_dir, f"{symbol}_{period}_{currency}{self.extension}")
+
+    def _stamp_file(self, symbol, period, currency):
+        """File whose modification time marks when an entry was last written"""
+        return self.path(symbol, period, currency)
+
+    def exists(self, symbol, period, currency):
+        return self.mtime(symbol, period, currency) is not None
+
+    def mtime(self, symbol, period, currency):
+        """Return the last modification time of a cache entry, or None if it is missing"""
+        try:
+            return os.path.getmtime(self._stamp_file(symbol, period, currency))
+        except OSError:
+            return None
+
+    def touch(self, symbol, period, currency, mtime=None):
+        """Set the modification time of an entry (default: now)"""
+        stamp_file = self._stamp_file(symbol, period, currency)
+        os.utime(stamp_file, None if mtime is None else (mtime, mtime))
+
+    def state_path(self, symbol, period, currency):
+        """Sidecar file holding the streaming indicator state of an entry"""
+        return os.path.join(self.cache_dir, f"{symbol}_{period}_{currency}.state.json")
+
+    def load_state(self, symbol, period, currency):
+        """Return the saved indicator state of an entry as a dict, or None"""
+        try:
+            with open(self.state_path(symbol, period, currency), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_state(self, symbol, period, currency, state):
+        """Save an indicator state dict next to the entry, replacing it atomically"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.state_path(symbol, period, currency)
+        tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def load(self, symbol, period, currency):
+        """Load a cached history frame indexed by Date"""
+        raise NotImplementedError
+
+    def save(self, symbol, period, currency, data):
+        """Save a history frame indexed by Date"""
+        raise NotImplementedError
+
+
+class CSVCacheBackend(CacheBackend):
+    """Legacy per-symbol CSV cache"""
+
+    name = 'csv'
+    extension = '.csv'
+
+    def load(self, symbol, period, currency):
+        df = pd.read_csv(self.path(symbol, period, currency))
+        df.index = to_wall_clock(df.pop('Date'))
+        df.index.name = 'Date'
+        return df
+
+    def save(self, symbol, period, currency, data):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        data.reset_index().to_csv(self.path(symbol, period, currency), index=False)
+
+
+class NumpyCacheBackend(CacheBackend):
+    """
+    Columnar cache storing each history as a directory of NumPy arrays
+
+    Layout of '{symbol}_{period}_{currency}.npcache/':
+        index.npy   int64 nanosecond timestamps (naive, exchange-local)
+        values.npy  float64 matrix of shape (bars, columns)
+        meta.json   column names and the dtypes to restore them to
+
+    Loading is two binary reads and no text parsing. With mmap=True the value
+    matrix is memory-mapped read-only instead of being read into memory.
+    """
+
+    name = 'npy'
+    extension = '.npcache'
+
+    def __init__(self, cache_dir, mmap=False):
+        super().__init__(cache_dir)
+        self.mmap = mmap
+
+    def _stamp_file(self, symbol, period, currency):
+        # meta.json is written last, so its mtime marks a complete entry
+        return os.path.join(self.path(symbol, period, currency), 'meta.json')
+
+    def load(self, symbol, period, currency):
+        path = self.path(symbol, period, currency)
+        # A concurrent save can swap the entry between the three reads; read again if they disagree
+        for attempt in range(3):
+            with open(os.path.join(path, 'meta.json'), 'r') as f:
+                meta = json.load(f)
+            index = np.load(os.path.join(path, 'index.npy'))
+            values = np.load(os.path.join(path, 'values.npy'), mmap_mode='r' if self.mmap else None)
+            if values.shape == (len(index), len(meta['columns'])) == (meta['rows'], len(meta['columns'])):
+                break
+        else:
+            raise ValueError(f"Inconsistent cache entry {path}")
+
+        index = pd.DatetimeIndex(index.view('datetime64[ns]'), name='Date')
+
+        df = pd.DataFrame(values, index=index, columns=meta['columns'], copy=False)
+
+        # Restore integer columns such as Volume (column-wise assignment is far
+        # cheaper than DataFrame.astype with a mapping)
+        for col, dtype in meta['dtypes'].items():
+            if dtype != 'float64':
+                df[col] = df[col].to_numpy().astype(dtype)
+        return df
+
+    def save(self, symbol, period, currency, data):
+        path = self.path(symbol, period, currency)
+        tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        os.makedirs(tmp_path, exist_ok=True)
+
+        numeric = data.select_dtypes(include=[np.number, bool])
+        index = to_wall_clock(data.index)
+
+        np.save(os.path.join(tmp_path, 'index.npy'), index.as_unit('ns').asi8)
+        np.save(os.path.join(tmp_path, 'values.npy'), np.ascontiguousarray(numeric.to_numpy(dtype=np.float64)))
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump({
+                'columns': list(numeric.columns),
+                'dtypes': {col: str(dtype) for col, dtype in numeric.dtypes.items()},
+                'rows': len(numeric),
+                'saved_at': datetime.now().isoformat()
+            }, f)
+
+        # Swap the new entry in: move the old one aside, rename the new one into
+        # place, and delete the old one last, so the entry is missing only
+        # between two renames
+        old_path = f"{path}.old-{os.getpid()}-{threading.get_ident()}"
+        while True:
+            shutil.rmtree(old_path, ignore_errors=True)
+            try:
+                os.rename(path, old_path)
+            except FileNotFoundError:
+                pass
+            try:
+                os.replace(tmp_path, path)
+                break
+            except OSError as e:
+                # Another writer swapped its entry in between our renames; move that one aside too
+                if e.errno not in (errno.ENOTEMPTY, errno.EEXIST):
+                    raise
+        shutil.rmtree(old_path, ignore_errors=True)
+
+
+CACHE_BACKENDS = {
+    CSVCacheBackend.name: CSVCacheBackend,
+    NumpyCacheBackend.name: NumpyCacheBackend,
+}
+
+
+def get_cache_backend(backend, cache_dir):
+    """Resolve a backend name or instance to a CacheBackend"""
+    if isinstance(backend, CacheBackend):
+        return backend
+    try:
+        return CACHE_BACKENDS[backend](cache_dir)
+    except KeyError:
+        raise ValueError(f"Unknown cache backend '{backend}'. Choose from: {', '.join(CACHE_BACKENDS)}")
+
+
+def migrate_csv_entry(symbol, period, currency, source, target, remove_csv=False):
+    """
+    Copy one legacy CSV cache entry into another backend
+
+    The modification time of the CSV file is carried over so the 24-hour
+    freshness check in StockDataFetcher is unaffected by the migration.
+
+    Returns:
+        The migrated DataFrame
+    """
+    data = source.load(symbol, period, currency)
+    target.save(symbol, period, currency, data)
+    target.touch(symbol, period, currency, source.mtime(symbol, period, currency))
+
+    if remove_csv:
+        os.remove(source.path(symbol, period, currency))
+    return data
+
+
+def migrate_csv_cache(cache_dir, target=None, remove_csv=False):
+    """
+    One-shot migration of the legacy CSV cache to a columnar backend
+
+    Args:
+        cache_dir: Directory holding '{symbol}_{period}_{currency}.csv' files
+        target: Destination backend (default: NumpyCacheBackend in cache_dir)
+        remove_csv: Whether to delete each CSV file once it has been migrated
+
+    Returns:
+        List of (symbol, period, currency) keys that were migrated
+    """
+    source = CSVCacheBackend(cache_dir)
+    target = target or NumpyCacheBackend(cache_dir)
+    migrated = []
+
+    for filename in sorted(os.listdir(cache_dir)):
+        if not filename.endswith('.csv'):
+            continue
+        try:
+            symbol, period, currency = filename[:-len('.csv')].rsplit('_', 2)
+        except ValueError:
+            continue
+
+        try:
+            migrate_csv_entry(symbol, period, currency, source, target, remove_csv=remove_csv)
+        except Exception as e:
+            # Unreadable files (e.g. Git LFS pointers) are left in place
+            print(f"Skipping {filename} during cache migration: {e}")
+            continue
+
+        migrated.append((symbol, period, currency))
+
+    print(f"Migrated {len(migrated)} cached histories to the '{target.name}' backend")
+    return migrated
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Migrate the CSV history cache to the columnar format')
+    parser.add_argument('--cache-dir', default='data/cache')
+    parser.add_argument('--remove-csv', action='store_true', help='Delete CSV files after migrating them')
+    args = parser.parse_args()
+
+    migrate_csv_cache(args.cache_dir, remove_csv=args.remove_csv)
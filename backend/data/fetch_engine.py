@@ -0,0 +1,109 @@
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+# Outcome of fetching one symbol: data is None when error is set
+FetchResult = namedtuple('FetchResult', ['symbol', 'data', 'error', 'attempts', 'elapsed'])
+
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter
+
+    Tokens refill continuously at `rate` per second up to `capacity`, so short
+    bursts of up to `capacity` requests are allowed while the long-run request
+    rate never exceeds `rate`.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate: Sustained requests per second
+            capacity: Maximum burst size (default: one second worth of tokens)
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self, tokens=1):
+        """Take tokens without waiting; return whether they were available"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        """Block until tokens are available, then take them"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _fetch_with_retry(fetch_fn, symbol, retries, backoff):
+    """Call fetch_fn(symbol), retrying failures with exponential backoff and jitter"""
+    start = time.perf_counter()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            data = fetch_fn(symbol)
+            return FetchResult(symbol, data, None, attempt, time.perf_counter() - start)
+        except Exception as e:
+            if attempt > retries:
+                return FetchResult(symbol, None, e, attempt, time.perf_counter() - start)
+            time.sleep(backoff * (2 ** (attempt - 1)) * (1 + random.random()))
+
+
+def fetch_concurrently(fetch_fn, symbols, max_workers=8, retries=2, backoff=0.5, callback=None):
+    """
+    Fetch many symbols on a bounded thread pool, yielding results as they complete
+
+    Errors are isolated per symbol: a symbol that still fails after its retries
+    is yielded with its exception instead of aborting the other fetches. Rate
+    limiting is the job of fetch_fn (StockDataFetcher shares one TokenBucket
+    across all of its network requests).
+
+    Args:
+        fetch_fn: Callable taking a symbol and returning its data
+        symbols: Symbols to fetch (duplicates are fetched once)
+        max_workers: Maximum number of concurrent fetches
+        retries: Extra attempts for a failed fetch
+        backoff: Base delay in seconds before the first retry, doubled on each retry
+        callback: Optional callable invoked with each FetchResult as it completes
+
+    Yields:
+        FetchResult for every symbol, in completion order
+    """
+    unique_symbols = list(dict.fromkeys(symbols))
+    if not unique_symbols:
+        return
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(unique_symbols))) as executor:
+        futures = [
+            executor.submit(_fetch_with_retry, fetch_fn, symbol, retries, backoff)
+            for symbol in unique_symbols
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            if callback is not None:
+                callback(result)
+            yield result
@@ -1,23 +1,53 @@
 
-import yfinance as yf
 import pandas as pd
 from datetime import datetime, timedelta
 import os
 import json
 import numpy as np
+from .cache_backend import CSVCacheBackend, get_cache_backend, migrate_csv_entry, to_wall_clock
+from .fetch_engine import TokenBucket, fetch_concurrently
+from .frame_cache import FrameCache
+from .indicators import FETCHER_INDICATORS, IndicatorState, add_indicators
+from .info_cache import InfoCache
+from .symbol_index import SymbolIndex
+from .providers import get_provider, period_start
 
 class StockDataFetcher:
-    def __init__(self, cache_dir='data/cache', currency='INR'):
+    def __init__(self, cache_dir='data/cache', currency='INR', cache_backend='npy', incremental=True,
+                 max_requests_per_second=5.0, max_workers=8, provider='yfinance', cache_ttl=86400,
+                 memory_cache_bytes=256 * 1024 * 1024, revalidate_interval=5.0, info_ttl=86400):
         """
         Initialize the StockDataFetcher with caching support and currency conversion
         
         Args:
             cache_dir: Directory to store cached data
             currency: Currency to convert prices to (default: 'INR')
+            cache_backend: History cache format, 'npy' (columnar, default), 'csv'
+                or a CacheBackend instance
+            incremental: Refresh stale caches by fetching only the missing bars
+            max_requests_per_second: Rate limit shared by all data source requests
+            max_workers: Default number of concurrent fetches in fetch_multiple_stocks
+            provider: Market data source, 'yfinance' (default), 'replay' or a
+                MarketDataProvider instance
+            cache_ttl: Seconds before a cached history is refreshed (default: 24 hours)
+            memory_cache_bytes: Memory budget of the in-process LRU of loaded histories
+            revalidate_interval: Seconds an in-memory history is served before the
+                cache file's mtime is checked again for changes by other processes
+            info_ttl: Seconds company information is served from the info cache
         """
         self.cache_dir = cache_dir
         os.makedirs(cache_dir, exist_ok=True)
         self.currency = currency
+        self.cache_backend = get_cache_backend(cache_backend, cache_dir)
+        self._legacy_cache = CSVCacheBackend(cache_dir)
+        self.incremental = incremental
+        self.rate_limiter = TokenBucket(max_requests_per_second)
+        self.max_workers = max_workers
+        self.provider = get_provider(provider)
+        self.cache_ttl = cache_ttl
+        self.frame_cache = FrameCache(memory_cache_bytes)
+        self.revalidate_interval = revalidate_interval
+        self.info_cache = InfoCache(os.path.join(cache_dir, 'stock_info.json'), ttl=info_ttl)
         
         # USD to INR conversion rate (updated periodically)
         self.usd_to_inr = 82.5
@@ -31,9 +61,16 @@ class StockDataFetcher:
             'AAPL', 'MSFT', 'AMZN', 'GOOGL', 'META'
         ]
         
+        # Search index over symbols and company names, ranked by popularity
+        self.symbol_index = SymbolIndex()
+        self.symbol_index.set_popularity({
+            symbol: len(self.popular_symbols) - rank for rank, symbol in enumerate(self.popular_symbols)
+        })
+        
         # Create stock list cache file
         self.stocks_cache_file = os.path.join(cache_dir, 'all_stocks.json')
         self._load_or_fetch_all_symbols()
+        self._refresh_symbol_index()
     
     def _load_or_fetch_all_symbols(self):
         """Load stock symbols from cache or fetch if needed"""
@@ -78,6 +115,7 @@ class StockDataFetcher:
                 json.dump(stocks_data, f)
             
             print(f"Updated and cached {len(self.all_symbols)} stock symbols")
+            self._refresh_symbol_index()
         except Exception as e:
             print(f"Error updating stock symbols: {e}")
             # If failed, ensure we have at least the popular symbols
@@ -136,6 +174,30 @@ class StockDataFetcher:
         """Return list of all supported stock symbols"""
         return self.all_symbols
     
+    def _refresh_symbol_index(self):
+        """Apply symbol list and company name changes to the search index"""
+        entries = {}
+        for symbol in self.all_symbols:
+            info = self.info_cache.get(symbol, allow_stale=True)
+            entries[symbol] = (info.get('longName') or info.get('shortName') or '') if info else ''
+        changes = self.symbol_index.update(entries)
+        if changes:
+            print(f"Search index updated: {changes} changes, {len(self.symbol_index)} symbols")
+    
+    def search_symbols(self, query, limit=20, offset=0):
+        """
+        Search symbols and company names for autocomplete
+        
+        Args:
+            query: Search text
+            limit: Maximum number of results
+            offset: Number of ranked results to skip
+            
+        Returns:
+            Tuple of (list of {'symbol', 'name'} dicts, total number of matches)
+        """
+        return self.symbol_index.search(query, limit=limit, offset=offset)
+    
     def get_popular_symbols(self, limit=50):
         """Return list of popular stock symbols"""
         # Prioritize certain well-known stocks, then add others to reach the limit
@@ -168,9 +230,9 @@ class StockDataFetcher:
         else:
             return data_frame
     
-    def fetch_stock_data(self, symbol, period='5y', years=5, use_cache=True, force_refresh=False):
+    def fetch_stock_data(self, symbol, period='5y', years=5, use_cache=True, force_refresh=False, incremental=None):
         """
-        Fetch historical stock data from Yahoo Finance or cache with INR conversion
+        Fetch historical stock data from the data provider or cache with INR conversion
         
         Args:
             symbol: Stock symbol (e.g., 'RELIANCE.NS', 'AAPL')
@@ -178,6 +240,8 @@ class StockDataFetcher:
             years: Alternative way to specify the period in years
             use_cache: Whether to use cached data if available
             force_refresh: Whether to force a refresh of the data
+            incremental: Whether a stale cache is refreshed by fetching only the
+                missing bars (default: the fetcher's incremental setting)
             
         Returns:
             Pandas DataFrame with historical stock data in specified currency
@@ -185,122 +249,386 @@ class StockDataFetcher:
         # If years is provided, convert to period string
         if years:
             period = f"{years}y"
+        if incremental is None:
+            incremental = self.incremental
             
-        cache_file = os.path.join(self.cache_dir, f"{symbol}_{period}_{self.currency}.csv")
-        
         # Check if we should use cached data
-        if use_cache and os.path.exists(cache_file) and not force_refresh:
-            # Check if cache is less than 24 hours old
-            file_time = os.path.getmtime(cache_file)
-            if (datetime.now() - datetime.fromtimestamp(file_time)).total_seconds() < 86400:  # 24 hours
-                df = pd.read_csv(cache_file, parse_dates=['Date'])
-                df.set_index('Date', inplace=True)
-                return df
+        cache_time = self._cache_mtime(symbol, period) if use_cache else None
+        if cache_time and not force_refresh:
+            # Check if cache is fresh (less than 24 hours old by default)
+            if (datetime.now() - datetime.fromtimestamp(cache_time)).total_seconds() < self.cache_ttl:
+                try:
+                    return self._load_cache(symbol, period)
+                except Exception as e:
+                    # Unreadable cache entry: fetch the full history again
+                    print(f"Error reading cached history for {symbol}: {e}")
+                    cache_time = None
         
-        # Fetch new data from Yahoo Finance
         try:
-            stock = yf.Ticker(symbol)
-            data = stock.history(period=period)
-            data = data.reset_index()  # Reset index to have Date as a column
+            # Delta refresh: append only the bars newer than the cached history
+            if cache_time and incremental and not force_refresh:
+                return self._refresh_incremental(symbol, period)
             
-            # Apply currency conversion if needed
-            if not symbol.endswith('.NS'):  # US stocks need conversion
-                for col in ['Open', 'High', 'Low', 'Close', 'Adj Close']:
-                    if col in data.columns:
-                        data[col] = data[col] * self.usd_to_inr
+            # Fetch new data from the provider
+            data = self._download_history(symbol, period=period)
             
             # Add some technical indicators
-            # Calculate moving averages
-            data['MA20'] = data['Close'].rolling(window=20).mean()
-            data['MA50'] = data['Close'].rolling(window=50).mean()
-            data['MA200'] = data['Close'].rolling(window=200).mean()
-            
-            # Calculate MACD
-            data['EMA12'] = data['Close'].ewm(span=12, adjust=False).mean()
-            data['EMA26'] = data['Close'].ewm(span=26, adjust=False).mean()
-            data['MACD'] = data['EMA12'] - data['EMA26']
-            data['Signal_Line'] = data['MACD'].ewm(span=9, adjust=False).mean()
-            
-            # Calculate RSI
-            delta = data['Close'].diff()
-            gain = delta.where(delta > 0, 0)
-            loss = -delta.where(delta < 0, 0)
-            avg_gain = gain.rolling(window=14).mean()
-            avg_loss = loss.rolling(window=14).mean()
-            rs = avg_gain / avg_loss
-            data['RSI'] = 100 - (100 / (1 + rs))
+            data = self._add_technical_indicators(data)
             
             # Save to cache
             if use_cache:
-                os.makedirs(os.path.dirname(cache_file), exist_ok=True)
-                data.to_csv(cache_file, index=False)
+                self._save_cache(symbol, period, data)
             
-            # Set Date as index and return
-            data.set_index('Date', inplace=True)
             return data
             
         except Exception as e:
             # If error and cache exists, use cache as fallback
-            if use_cache and os.path.exists(cache_file):
-                df = pd.read_csv(cache_file, parse_dates=['Date'])
-                df.set_index('Date', inplace=True)
-                return df
+            if use_cache and self._cache_mtime(symbol, period):
+                return self._load_cache(symbol, period)
             else:
                 raise Exception(f"Failed to fetch data for {symbol}: {str(e)}")
     
-    def fetch_multiple_stocks(self, symbols, period='1y'):
-        """Fetch data for multiple stock symbols"""
+    def _download_history(self, symbol, period=None, start=None):
+        """
+        Download raw daily bars from the provider, converted to the fetcher's currency
+        
+        Args:
+            symbol: Stock symbol
+            period: Time period to fetch (e.g. '5y'), used when start is None
+            start: First date to fetch (inclusive)
+            
+        Returns:
+            DataFrame of OHLCV bars indexed by naive exchange-local Date
+        """
+        self.rate_limiter.acquire()
+        data = self.provider.history(symbol, period=period, start=start)
+        data.index = to_wall_clock(data.index)
+        data.index.name = 'Date'
+        
+        # Apply currency conversion if needed
+        if not symbol.endswith('.NS'):  # US stocks need conversion
+            data = data.copy()
+            for col in ['Open', 'High', 'Low', 'Close', 'Adj Close']:
+                if col in data.columns:
+                    data[col] = data[col] * self.usd_to_inr
+        
+        return data
+    
+    @staticmethod
+    def _add_technical_indicators(data):
+        """Add moving averages, MACD and RSI to a frame of daily bars"""
+        return add_indicators(data.copy(), FETCHER_INDICATORS, overwrite=True)
+    
+    def _refresh_incremental(self, symbol, period):
+        """Append bars newer than the cached history and update its indicators"""
+        cached = self._load_cache(symbol, period)
+        last_date = cached.index[-1]
+        
+        new_bars = self._download_history(symbol, start=last_date + timedelta(days=1))
+        new_bars = new_bars[new_bars.index > last_date]
+        
+        if new_bars.empty:
+            # Nothing new (weekend or holiday); mark the cache as checked
+            self._touch_cache(symbol, period, cached)
+            return cached
+        
+        return self.append_bars(symbol, new_bars, period=period, cached=cached)
+    
+    def append_bars(self, symbol, new_bars, period='5y', cached=None):
+        """
+        Append new daily bars, e.g. from a live feed, to a cached history
+        
+        Indicators for the new bars are continued from the streaming indicator
+        state saved next to the cache, so the cost per bar does not depend on
+        the length of the history.
+        
+        Args:
+            symbol: Stock symbol
+            new_bars: Raw bars indexed by Date, in the fetcher's currency; bars
+                not newer than the cached history are ignored
+            period: Cached period the bars belong to (e.g. '5y')
+            cached: Cached history if already loaded
+            
+        Returns:
+            The updated history
+        """
+        if cached is None:
+            cached = self._load_cache(symbol, period)
+        new_bars = new_bars.copy()
+        new_bars.index = to_wall_clock(new_bars.index)
+        new_bars = new_bars[new_bars.index > cached.index[-1]]
+        if new_bars.empty:
+            return cached
+        
+        state = self._load_indicator_state(symbol, period, cached)
+        data = self._extend_history(cached, new_bars, state)
+        data = self._trim_to_period(data, period)
+        self._save_cache(symbol, period, data, state)
+        print(f"Appended {len(new_bars)} new bars to cached history for {symbol}")
+        return data
+    
+    @staticmethod
+    def _extend_history(cached, new_bars, state=None):
+        """
+        Append new bars to a cached history, continuing its indicators
+        
+        Args:
+            cached: History with indicator columns, indexed by Date
+            new_bars: Raw bars dated after the last cached bar
+            state: IndicatorState at the last cached bar, advanced in place over
+                the new bars (built from the cached history when None)
+            
+        Returns:
+            The combined history
+        """
+        if any(col not in cached.columns for col in FETCHER_INDICATORS):
+            raw = pd.concat([cached.drop(columns=FETCHER_INDICATORS, errors='ignore'), new_bars])
+            return StockDataFetcher._add_technical_indicators(raw)
+        
+        if state is None:
+            state = IndicatorState.from_history(cached)
+        extension = new_bars.reindex(columns=cached.columns)
+        for name, values in state.update_many(new_bars['Close'], new_bars.index).items():
+            extension[name] = values
+        
+        return pd.concat([cached, extension])
+    
+    @staticmethod
+    def _trim_to_period(data, period):
+        """Drop bars older than a period such as '5y' measured from the last bar"""
+        cutoff = period_start(data.index[-1], period)
+        return data if cutoff is None else data[data.index >= cutoff]
+    
+    def _cache_key(self, symbol, period):
+        return (symbol, period, self.currency)
+    
+    def _cache_mtime(self, symbol, period):
+        """Modification time of the cached history, falling back to a legacy CSV file"""
+        # A recently validated in-memory copy answers without touching the disk
+        cache_time = self.frame_cache.known_version(self._cache_key(symbol, period), self.revalidate_interval)
+        if cache_time is not None:
+            return cache_time
+        
+        cache_time = self.cache_backend.mtime(symbol, period, self.currency)
+        if cache_time is None and self.cache_backend.name != 'csv':
+            cache_time = self._legacy_cache.mtime(symbol, period, self.currency)
+        return cache_time
+    
+    def _load_cache(self, symbol, period):
+        """Load cached history from memory or disk, migrating a legacy CSV file on first access"""
+        key = self._cache_key(symbol, period)
+        cache_time = self._cache_mtime(symbol, period)
+        
+        data = self.frame_cache.get(key, cache_time)
+        if data is None:
+            if self.cache_backend.exists(symbol, period, self.currency):
+                data = self.cache_backend.load(symbol, period, self.currency)
+            else:
+                data = migrate_csv_entry(symbol, period, self.currency, self._legacy_cache, self.cache_backend)
+            self.frame_cache.put(key, data, cache_time)
+        
+        # Callers get their own copy so they cannot modify the cached frame
+        return data.copy()
+    
+    def _save_cache(self, symbol, period, data, state=None):
+        """Write a history and its indicator state to disk and the history to the in-memory cache"""
+        if state is None or not state.matches(data):
+            state = IndicatorState.from_history(data)
+        self.cache_backend.save(symbol, period, self.currency, data)
+        self.cache_backend.save_state(symbol, period, self.currency, state.to_dict())
+        self.frame_cache.put(self._cache_key(symbol, period), data.copy(),
+                             self.cache_backend.mtime(symbol, period, self.currency))
+    
+    def _load_indicator_state(self, symbol, period, cached):
+        """Streaming indicator state at the end of a cached history, rebuilt if missing or out of date"""
+        payload = self.cache_backend.load_state(symbol, period, self.currency)
+        if payload is not None:
+            try:
+                state = IndicatorState.from_dict(payload)
+                if state.matches(cached):
+                    return state
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Ignoring unreadable indicator state for {symbol}: {e}")
+        return IndicatorState.from_history(cached)
+    
+    def _touch_cache(self, symbol, period, data):
+        """Mark a cached history as up to date without rewriting it"""
+        self.cache_backend.touch(symbol, period, self.currency)
+        self.frame_cache.put(self._cache_key(symbol, period), data.copy(),
+                             self.cache_backend.mtime(symbol, period, self.currency))
+    
+    def get_cache_stats(self):
+        """Hit, miss and eviction counters of the in-memory history cache"""
+        return self.frame_cache.stats()
+    
+    def fetch_multiple_stocks(self, symbols, period='1y', max_workers=None, callback=None, **kwargs):
+        """
+        Fetch data for multiple stock symbols concurrently
+        
+        Args:
+            symbols: Stock symbols to fetch
+            period: Time period to fetch
+            max_workers: Concurrent fetches (default: the fetcher's max_workers)
+            callback: Optional callable invoked with each FetchResult as it completes
+            **kwargs: Passed on to fetch_stock_data
+            
+        Returns:
+            Dictionary of symbol to DataFrame for the symbols that were fetched
+        """
         result = {}
-        for symbol in symbols:
-            result[symbol] = self.fetch_stock_data(symbol, period)
+        for fetched in self.iter_fetch_stocks(symbols, period, max_workers=max_workers, callback=callback, **kwargs):
+            if fetched.error is None:
+                result[fetched.symbol] = fetched.data
+            else:
+                print(f"Error fetching {fetched.symbol}: {fetched.error}")
         return result
     
-    def get_stock_info(self, symbol):
-        """Get additional information about a stock"""
-        try:
-            stock = yf.Ticker(symbol)
-            info = stock.info
-            
-            # Extract relevant information
-            relevant_info = {
-                'shortName': info.get('shortName', ''),
-                'longName': info.get('longName', symbol),
-                'sector': info.get('sector', 'N/A'),
-                'industry': info.get('industry', 'N/A'),
-                'marketCap': info.get('marketCap', 0),
-                'peRatio': info.get('trailingPE', None),
-                'dividendYield': info.get('dividendYield', 0) * 100 if info.get('dividendYield') else 0,
-                'fiftyTwoWeekHigh': info.get('fiftyTwoWeekHigh', 0),
-                'fiftyTwoWeekLow': info.get('fiftyTwoWeekLow', 0),
-                'currency': info.get('currency', 'USD'),
-                'exchange': info.get('exchange', ''),
-                'country': info.get('country', '')
-            }
+    def iter_fetch_stocks(self, symbols, period='5y', max_workers=None, retries=2, backoff=0.5, callback=None, **kwargs):
+        """
+        Fetch multiple symbols concurrently, yielding each result as it completes
+        
+        Requests to the data source are throttled by the fetcher's shared rate
+        limiter, failed fetches are retried with exponential backoff, and a
+        symbol that keeps failing is yielded with its error without affecting
+        the others.
+        
+        Args:
+            symbols: Stock symbols to fetch
+            period: Time period to fetch
+            max_workers: Concurrent fetches (default: the fetcher's max_workers)
+            retries: Extra attempts for a failed fetch
+            backoff: Base delay in seconds before the first retry
+            callback: Optional callable invoked with each FetchResult as it completes
+            **kwargs: Passed on to fetch_stock_data
             
-            # Convert values to INR if needed
-            if self.currency == 'INR' and relevant_info['currency'] != 'INR':
-                relevant_info['marketCap'] *= self.usd_to_inr
-                relevant_info['fiftyTwoWeekHigh'] *= self.usd_to_inr
-                relevant_info['fiftyTwoWeekLow'] *= self.usd_to_inr
-                relevant_info['currency'] = 'INR'
+        Yields:
+            FetchResult(symbol, data, error, attempts, elapsed)
+        """
+        def fetch(symbol):
+            return self.fetch_stock_data(symbol, period, **kwargs)
+        
+        return fetch_concurrently(
+            fetch, symbols,
+            max_workers=max_workers or self.max_workers,
+            retries=retries,
+            backoff=backoff,
+            callback=callback
+        )
+    
+    def get_stock_info(self, symbol, use_cache=True):
+        """
+        Get additional information about a stock
+        
+        Args:
+            symbol: Stock symbol
+            use_cache: Whether to serve the information from the persistent cache
             
+        Returns:
+            Dictionary of company information
+        """
+        if use_cache:
+            cached = self.info_cache.get(symbol)
+            if cached is not None:
+                return cached
+        
+        try:
+            relevant_info = self._fetch_stock_info(symbol)
+            if use_cache:
+                self.info_cache.put(symbol, relevant_info)
             return relevant_info
             
         except Exception as e:
             print(f"Error fetching info for {symbol}: {str(e)}")
-            return {
-                'shortName': symbol,
-                'longName': symbol,
-                'sector': 'N/A',
-                'industry': 'N/A',
-                'marketCap': 0,
-                'peRatio': None,
-                'dividendYield': 0,
-                'fiftyTwoWeekHigh': 0,
-                'fiftyTwoWeekLow': 0,
-                'currency': 'INR',
-                'exchange': '',
-                'country': '',
-                'error': str(e)
-            }
-
+            return self._fallback_info(symbol, e)
+    
+    def get_stock_info_many(self, symbols, fetch_missing=True, max_workers=None):
+        """
+        Get information for many stocks, fetching cache misses concurrently
+        
+        Args:
+            symbols: Stock symbols
+            fetch_missing: Fetch symbols missing from the cache; when False they
+                get placeholder information and no request is made
+            max_workers: Concurrent fetches (default: the fetcher's max_workers)
+            
+        Returns:
+            Dictionary of symbol to company information, in the order of symbols
+        """
+        results = {}
+        missing = []
+        for symbol in symbols:
+            cached = self.info_cache.get(symbol)
+            if cached is not None:
+                results[symbol] = cached
+            else:
+                missing.append(symbol)
+        
+        if missing and fetch_missing:
+            for fetched in fetch_concurrently(self._fetch_stock_info, missing,
+                                              max_workers=max_workers or self.max_workers, retries=1):
+                if fetched.error is None:
+                    results[fetched.symbol] = fetched.data
+                    self.info_cache.put(fetched.symbol, fetched.data, flush=False)
+                else:
+                    print(f"Error fetching info for {fetched.symbol}: {str(fetched.error)}")
+            self.info_cache.flush()
+            self._refresh_symbol_index()
+        
+        # Expired information is better than none when a fetch failed or was skipped
+        for symbol in missing:
+            if symbol not in results:
+                stale = self.info_cache.get(symbol, allow_stale=True)
+                results[symbol] = stale if stale is not None else self._fallback_info(symbol)
+        
+        return {symbol: results[symbol] for symbol in symbols}
+    
+    def _fetch_stock_info(self, symbol):
+        """Request information about a stock from the provider"""
+        self.rate_limiter.acquire()
+        info = self.provider.info(symbol)
+        
+        # Extract relevant information
+        relevant_info = {
+            'shortName': info.get('shortName', ''),
+            'longName': info.get('longName', symbol),
+            'sector': info.get('sector', 'N/A'),
+            'industry': info.get('industry', 'N/A'),
+            'marketCap': info.get('marketCap', 0),
+            'peRatio': info.get('trailingPE', None),
+            'dividendYield': info.get('dividendYield', 0) * 100 if info.get('dividendYield') else 0,
+            'fiftyTwoWeekHigh': info.get('fiftyTwoWeekHigh', 0),
+            'fiftyTwoWeekLow': info.get('fiftyTwoWeekLow', 0),
+            'currency': info.get('currency', 'USD'),
+            'exchange': info.get('exchange', ''),
+            'country': info.get('country', '')
+        }
+        
+        # Convert values to INR if needed
+        if self.currency == 'INR' and relevant_info['currency'] != 'INR':
+            relevant_info['marketCap'] *= self.usd_to_inr
+            relevant_info['fiftyTwoWeekHigh'] *= self.usd_to_inr
+            relevant_info['fiftyTwoWeekLow'] *= self.usd_to_inr
+            relevant_info['currency'] = 'INR'
+        
+        return relevant_info
+    
+    @staticmethod
+    def _fallback_info(symbol, error=None):
+        """Placeholder information for a stock whose details are unavailable"""
+        info = {
+            'shortName': symbol,
+            'longName': symbol,
+            'sector': 'N/A',
+            'industry': 'N/A',
+            'marketCap': 0,
+            'peRatio': None,
+            'dividendYield': 0,
+            'fiftyTwoWeekHigh': 0,
+            'fiftyTwoWeekLow': 0,
+            'currency': 'INR',
+            'exchange': '',
+            'country': ''
+        }
+        if error is not None:
+            info['error'] = str(error)
+        return info
@@ -0,0 +1,242 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+
+class ForecastStore:
+    """
+    Persistent forecast cache keyed by (symbol, last bar, horizon, model version)
+
+    A forecast is reused only for the same history (its last bar), the same
+    number of days and the same models, so a new bar, a longer horizon or a
+    retrained model all miss. Each forecast is kept in columnar form: one blob
+    of int64 dates and one of float64 Price/Lower/Upper, rather than a list of
+    record dicts. The last two closes of the history are kept with it, so
+    pages can show current prices without reading histories.
+
+    Entries live in a SQLite database, so they survive restarts and are shared
+    by every thread and worker process. Each thread uses its own connection.
+    When the stored forecasts exceed max_bytes, the least recently read ones
+    are evicted.
+    """
+
+    COLUMNS = ('Price', 'Lower', 'Upper')
+
+    def __init__(self, path='data/cache/forecasts.sqlite', max_bytes=64 * 1024 * 1024, max_age=None):
+        """
+        Args:
+            path: SQLite database file
+            max_bytes: Budget for the size of the stored forecast columns
+            max_age: Seconds after which a forecast is no longer served (default: never)
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connection() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS forecasts (
+                    symbol TEXT NOT NULL,
+                    last_bar TEXT NOT NULL,
+                    horizon INTEGER NOT NULL,
+                    model_version TEXT NOT NULL,
+                    tier TEXT NOT NULL,
+                    model TEXT,
+                    dates BLOB NOT NULL,
+                    columns BLOB NOT NULL,
+                    metadata TEXT,
+                    last_close REAL,
+                    previous_close REAL,
+                    nbytes INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL,
+                    PRIMARY KEY (symbol, last_bar, horizon, model_version)
+                )
+            ''')
+            connection.execute('CREATE INDEX IF NOT EXISTS forecasts_accessed ON forecasts (accessed)')
+            # Stores created before the closes were kept
+            existing = {row[1] for row in connection.execute('PRAGMA table_info(forecasts)')}
+            for column in ('last_close', 'previous_close'):
+                if column not in existing:
+                    connection.execute(f'ALTER TABLE forecasts ADD COLUMN {column} REAL')
+
+    def _connection(self):
+        """This thread's connection (SQLite connections must not be shared between threads)"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _key(symbol, last_bar, horizon, model_version):
+        return (symbol, pd.Timestamp(last_bar).isoformat(), int(horizon), str(model_version))
+
+    def get(self, symbol, last_bar, horizon, model_version):
+        """
+        Return the stored forecast for a key, or None
+
+        Args:
+            symbol: Stock symbol
+            last_bar: Date of the last bar of the history the forecast was made from
+            horizon: Number of days forecast
+            model_version: Version of the models that made it
+
+        Returns:
+            Tuple of (prediction records, metadata), or None
+        """
+        key = self._key(symbol, last_bar, horizon, model_version)
+        connection = self._connection()
+        row = connection.execute(
+            'SELECT model, dates, columns, metadata, created FROM forecasts '
+            'WHERE symbol = ? AND last_bar = ? AND horizon = ? AND model_version = ?', key
+        ).fetchone()
+        if row is None or (self.max_age is not None and time.time() - row[4] > self.max_age):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        with connection:
+            connection.execute(
+                'UPDATE forecasts SET accessed = ? '
+                'WHERE symbol = ? AND last_bar = ? AND horizon = ? AND model_version = ?', (time.time(),) + key
+            )
+
+        model, dates, columns, metadata, _ = row
+        dates = pd.to_datetime(np.frombuffer(dates, dtype=np.int64), unit='ns')
+        columns = np.frombuffer(columns, dtype=np.float64).reshape(len(self.COLUMNS), len(dates))
+        records = [
+            {'Date': date, 'Price': price, 'Lower': lower, 'Upper': upper, 'Model': model}
+            for date, price, lower, upper in zip(dates, *(column.tolist() for column in columns))
+        ]
+        return records, json.loads(metadata) if metadata else {}
+
+    def put(self, symbol, last_bar, horizon, model_version, predictions, metadata=None, last_closes=None):
+        """
+        Store a forecast, evicting the least recently read ones over the size budget
+
+        A forecast whose metadata marks it as the fast tier does not replace a
+        full forecast stored under the same key.
+
+        Args:
+            symbol: Stock symbol
+            last_bar: Date of the last bar of the history the forecast was made from
+            horizon: Number of days forecast
+            model_version: Version of the models that made it
+            predictions: Prediction records with Date, Price, Lower, Upper and Model
+            metadata: JSON-serializable information stored with the forecast
+            last_closes: The last closes of the history, oldest first (the last
+                two are kept and returned by quotes())
+        """
+        metadata = metadata or {}
+        closes = [float(close) for close in (last_closes if last_closes is not None else [])][-2:]
+        last_close = closes[-1] if closes else None
+        previous_close = closes[-2] if len(closes) > 1 else None
+        tier = metadata.get('tier', 'full')
+        dates = pd.DatetimeIndex([record['Date'] for record in predictions]).as_unit('ns').asi8.tobytes()
+        columns = np.array([[record[name] for record in predictions] for name in self.COLUMNS],
+                           dtype=np.float64).tobytes()
+        model = predictions[0]['Model'] if predictions else None
+        now = time.time()
+
+        connection = self._connection()
+        with connection:
+            connection.execute('''
+                INSERT INTO forecasts (symbol, last_bar, horizon, model_version, tier, model, dates, columns,
+                                       metadata, last_close, previous_close, nbytes, created, accessed)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (symbol, last_bar, horizon, model_version) DO UPDATE SET
+                    tier = excluded.tier, model = excluded.model, dates = excluded.dates,
+                    columns = excluded.columns, metadata = excluded.metadata,
+                    last_close = COALESCE(excluded.last_close, forecasts.last_close),
+                    previous_close = COALESCE(excluded.previous_close, forecasts.previous_close),
+                    nbytes = excluded.nbytes, created = excluded.created, accessed = excluded.accessed
+                WHERE excluded.tier = 'full' OR forecasts.tier != 'full'
+            ''', self._key(symbol, last_bar, horizon, model_version) + (
+                tier, model, dates, columns, json.dumps(metadata, default=str), last_close, previous_close,
+                len(dates) + len(columns), now, now))
+            self._evict(connection)
+
+    def _evict(self, connection):
+        """Delete the least recently read forecasts until the store fits in max_bytes"""
+        total = connection.execute('SELECT COALESCE(SUM(nbytes), 0) FROM forecasts').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for rowid, nbytes in connection.execute('SELECT rowid, nbytes FROM forecasts ORDER BY accessed').fetchall():
+            if total <= self.max_bytes:
+                break
+            connection.execute('DELETE FROM forecasts WHERE rowid = ?', (rowid,))
+            total -= nbytes
+            evicted += 1
+        with self._lock:
+            self.evictions += evicted
+
+    def discard(self, symbol, last_bar, horizon, model_version, tier=None):
+        """Delete a stored forecast (only if it is of the given tier, when one is given)"""
+        query = 'DELETE FROM forecasts WHERE symbol = ? AND last_bar = ? AND horizon = ? AND model_version = ?'
+        params = self._key(symbol, last_bar, horizon, model_version)
+        if tier is not None:
+            query += ' AND tier = ?'
+            params += (tier,)
+        connection = self._connection()
+        with connection:
+            connection.execute(query, params)
+
+    def quotes(self, symbols):
+        """
+        Last and previous close of the newest stored history of each symbol
+
+        Args:
+            symbols: Symbols to look up
+
+        Returns:
+            Dictionary of symbol to (last close, previous close or None), for the
+            symbols with a stored forecast that recorded its closes
+        """
+        symbols = list(symbols)
+        if not symbols:
+            return {}
+        rows = self._connection().execute(
+            f'SELECT symbol, last_close, previous_close FROM forecasts '
+            f'WHERE symbol IN ({", ".join("?" * len(symbols))}) AND last_close IS NOT NULL ORDER BY last_bar',
+            symbols
+        ).fetchall()
+        # Ordered by last bar, so the newest history of each symbol wins
+        return {symbol: (last_close, previous_close) for symbol, last_close, previous_close in rows}
+
+    def symbols(self):
+        """Symbols with at least one stored forecast"""
+        rows = self._connection().execute('SELECT DISTINCT symbol FROM forecasts ORDER BY symbol').fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self):
+        """Counters and current size of the store"""
+        entries, total = self._connection().execute(
+            'SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM forecasts').fetchone()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': entries,
+                'bytes': total,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class FrameCache:
+    """
+    Thread-safe, memory-bounded LRU cache of DataFrames
+
+    Each entry carries a version (StockDataFetcher uses the cache file's mtime)
+    and is dropped when it is requested with a different version. The budget is
+    expressed in bytes as reported by DataFrame.memory_usage, and the least
+    recently used entries are evicted until the cache fits in it.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        """
+        Args:
+            max_bytes: Memory budget for cached frames (0 disables caching)
+        """
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> [frame, version, nbytes, checked_at]
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def frame_size(frame):
+        """Bytes used by a frame, including its index"""
+        return int(frame.memory_usage(index=True, deep=True).sum())
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[2]
+
+    def get(self, key, version=None):
+        """
+        Return the cached frame for a key, or None on a miss
+
+        Args:
+            key: Cache key, e.g. (symbol, period, currency)
+            version: Expected version; an entry with another version is invalidated
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and version is not None and entry[1] != version:
+                self._remove(key)
+                self.invalidations += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            if version is not None:
+                entry[3] = time.monotonic()
+            self.hits += 1
+            return entry[0]
+
+    def known_version(self, key, max_age):
+        """Version of an entry if it was validated within the last max_age seconds, else None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[3] < max_age:
+                return entry[1]
+            return None
+
+    def put(self, key, frame, version=None):
+        """Cache a frame, evicting least recently used entries to stay within budget"""
+        nbytes = self.frame_size(frame)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if nbytes > self.max_bytes:
+                return
+
+            self._entries[key] = [frame, version, nbytes, time.monotonic()]
+            self._bytes += nbytes
+
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, key=None):
+        """Drop one entry, or every entry when key is None"""
+        with self._lock:
+            if key is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                self._bytes = 0
+            elif key in self._entries:
+                self._remove(key)
+                self.invalidations += 1
+
+    def stats(self):
+        """Counters and current size of the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,392 @@
+import re
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+# Columns StockDataFetcher stores with every cached history
+FETCHER_INDICATORS = ['MA20', 'MA50', 'MA200', 'EMA12', 'EMA26', 'MACD', 'Signal_Line', 'RSI']
+
+# Columns DataPreprocessor adds for the models
+PREPROCESSOR_INDICATORS = [
+    'MA5', 'MA20', 'MA50', 'RSI', 'MACD', 'MACD_signal',
+    'MA20_std', 'upper_band', 'lower_band',
+    'Volume_1d_change', 'Price_1d_change', 'Price_5d_change'
+]
+
+
+def _pad_front(values, count):
+    """Prepend `count` NaNs along the last axis"""
+    pad = np.full(values.shape[:-1] + (count,), np.nan)
+    return np.concatenate([pad, values], axis=-1)
+
+
+def rolling_mean(x, window):
+    """Trailing mean over `window` bars (NaN until the window is full), like pandas rolling().mean()"""
+    x = np.asarray(x, dtype=np.float64)
+    if x.shape[-1] < window:
+        return np.full(x.shape, np.nan)
+    # Each window is reduced independently, so the value for a bar does not
+    # depend on how much history precedes the window
+    return _pad_front(sliding_window_view(x, window, axis=-1).mean(axis=-1), window - 1)
+
+
+def rolling_std(x, window, ddof=1):
+    """Trailing sample standard deviation over `window` bars, like pandas rolling().std()"""
+    x = np.asarray(x, dtype=np.float64)
+    if x.shape[-1] < window:
+        return np.full(x.shape, np.nan)
+    return _pad_front(sliding_window_view(x, window, axis=-1).std(axis=-1, ddof=ddof), window - 1)
+
+
+def ema(x, span, init=None):
+    """
+    Exponential moving average, like pandas ewm(span=span, adjust=False).mean()
+
+    The recurrence y[t] = alpha * x[t] + (1 - alpha) * y[t-1] runs in C via
+    scipy.signal.lfilter along the last axis.
+
+    Args:
+        x: 1-D series or 2-D (symbols x time) panel without NaNs
+        span: EMA span; alpha = 2 / (span + 1)
+        init: Previous EMA value(s) to continue from; when None the first
+            output equals the first input
+
+    Returns:
+        Array with the same shape as x
+    """
+    x = np.asarray(x, dtype=np.float64)
+    alpha = 2.0 / (span + 1.0)
+    b, a = [alpha], [1.0, alpha - 1.0]
+    if x.shape[-1] == 0:
+        return x.copy()
+
+    if init is None:
+        out = np.empty_like(x)
+        out[..., 0] = x[..., 0]
+        if x.shape[-1] > 1:
+            zi = ((1.0 - alpha) * x[..., :1])
+            out[..., 1:], _ = lfilter(b, a, x[..., 1:], axis=-1, zi=zi)
+        return out
+
+    zi = (1.0 - alpha) * np.asarray(init, dtype=np.float64).reshape(x.shape[:-1] + (1,))
+    out, _ = lfilter(b, a, x, axis=-1, zi=zi)
+    return out
+
+
+def pct_change(x, periods=1):
+    """Relative change over `periods` bars, like pandas pct_change()"""
+    x = np.asarray(x, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return _pad_front(x[..., periods:] / x[..., :-periods] - 1.0, periods)
+
+
+def rsi(close, window=14):
+    """
+    Relative Strength Index from simple rolling means of gains and losses
+
+    Matches the pandas formulation used throughout the app: the undefined first
+    change counts as zero, and the first value appears once `window` changes
+    including it are available.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    delta = np.zeros_like(close)
+    delta[..., 1:] = np.diff(close, axis=-1)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = rolling_mean(gain, window) / rolling_mean(loss, window)
+        return 100 - (100 / (1 + rs))
+
+
+# Declarative indicator specs: name pattern -> (input columns/indicators, function)
+_SPECS = [
+    (r'MA(\d+)$', lambda m: (['Close'], lambda close: rolling_mean(close, int(m.group(1))))),
+    (r'MA(\d+)_std$', lambda m: (['Close'], lambda close: rolling_std(close, int(m.group(1))))),
+    (r'EMA(\d+)$', lambda m: (['Close'], lambda close: ema(close, int(m.group(1))))),
+    (r'MACD$', lambda m: (['EMA12', 'EMA26'], lambda fast, slow: fast - slow)),
+    (r'(Signal_Line|MACD_signal)$', lambda m: (['MACD'], lambda macd: ema(macd, 9))),
+    (r'RSI(\d*)$', lambda m: (['Close'], lambda close: rsi(close, int(m.group(1) or 14)))),
+    (r'upper_band$', lambda m: (['MA20', 'MA20_std'], lambda ma, std: ma + std * 2)),
+    (r'lower_band$', lambda m: (['MA20', 'MA20_std'], lambda ma, std: ma - std * 2)),
+    (r'Price_(\d+)d_change$', lambda m: (['Close'], lambda close: pct_change(close, int(m.group(1))))),
+    (r'Volume_(\d+)d_change$', lambda m: (['Volume'], lambda volume: pct_change(volume, int(m.group(1))))),
+]
+
+
+def indicator_spec(name):
+    """Return (inputs, function) for an indicator name such as 'MA20' or 'Price_5d_change'"""
+    for pattern, build in _SPECS:
+        match = re.match(pattern, name)
+        if match:
+            return build(match)
+    raise ValueError(f"Unknown indicator '{name}'")
+
+
+def compute_indicators(inputs, names, precomputed=None):
+    """
+    Compute indicators from raw price arrays, sharing intermediate results
+
+    Every indicator is computed at most once: dependencies such as the EMAs
+    behind MACD are reused, and anything already in `precomputed` (for
+    example columns stored by StockDataFetcher) is taken as is.
+
+    Args:
+        inputs: Mapping of raw columns ('Close', 'Volume') to 1-D series or
+            2-D (symbols x time) panels
+        names: Indicator names to compute
+        precomputed: Optional mapping of indicator name to existing values
+
+    Returns:
+        Dictionary of name to array for every requested name
+    """
+    values = {key: np.asarray(value, dtype=np.float64) for key, value in inputs.items()}
+    values.update({key: np.asarray(value, dtype=np.float64) for key, value in (precomputed or {}).items()})
+
+    def resolve(name):
+        if name not in values:
+            dependencies, fn = indicator_spec(name)
+            values[name] = fn(*[resolve(dependency) for dependency in dependencies])
+        return values[name]
+
+    return {name: resolve(name) for name in names}
+
+
+def add_indicators(df, names, overwrite=False):
+    """
+    Add indicator columns to a DataFrame of daily bars
+
+    Args:
+        df: DataFrame with a Close column (and Volume for volume indicators)
+        names: Indicator names to add
+        overwrite: Recompute columns that already exist instead of reusing them
+
+    Returns:
+        The DataFrame, modified in place
+    """
+    raw = {col: df[col].to_numpy(dtype=np.float64) for col in ('Close', 'Volume') if col in df.columns}
+    precomputed = {}
+    if not overwrite:
+        precomputed = {col: df[col].to_numpy(dtype=np.float64) for col in df.columns
+                       if col not in raw and _is_indicator(col)}
+
+    computed = compute_indicators(raw, names, precomputed)
+    for name in names:
+        if overwrite or name not in df.columns:
+            df[name] = computed[name]
+    return df
+
+
+def _is_indicator(name):
+    try:
+        indicator_spec(name)
+        return True
+    except ValueError:
+        return False
+
+
+class IndicatorState:
+    """
+    Streaming form of the StockDataFetcher indicators (FETCHER_INDICATORS)
+
+    Holds the closes, gains and losses needed by the longest window together
+    with the current EMA values, so a new bar is processed in constant time
+    however long the history is. The results are bit-identical to the batch
+    functions above: window means are taken over the same contiguous slices
+    and the EMA recurrence performs the same floating-point operations as
+    lfilter.
+
+    The state can be saved as a dict (to_dict/from_dict) next to a cached
+    history and rebuilt from a history with from_history.
+    """
+
+    MA_WINDOWS = (20, 50, 200)
+    EMA_SPANS = (12, 26)
+    SIGNAL_SPAN = 9
+    RSI_WINDOW = 14
+    VERSION = 1
+
+    def __init__(self):
+        self._capacity = max(max(self.MA_WINDOWS), self.RSI_WINDOW)
+        # Appended contiguously and compacted when full, so window slices never wrap
+        self._close = np.empty(2 * self._capacity)
+        self._gain = np.empty(2 * self._capacity)
+        self._loss = np.empty(2 * self._capacity)
+        self._end = 0
+
+        self.bars = 0
+        self.last_close = None
+        self.last_date = None
+        self.ema = {span: None for span in self.EMA_SPANS}
+        self.signal = None
+
+    @staticmethod
+    def _alpha(span):
+        return 2.0 / (span + 1.0)
+
+    def _push(self, close):
+        """Append a close to the window buffers"""
+        if self._end == len(self._close):
+            keep = self._capacity
+            for buffer in (self._close, self._gain, self._loss):
+                buffer[:keep] = buffer[self._end - keep:self._end]
+            self._end = keep
+
+        # The first bar of a series has no change, as in rsi()
+        delta = 0.0 if self.last_close is None else close - self.last_close
+        self._close[self._end] = close
+        self._gain[self._end] = delta if delta > 0 else 0.0
+        self._loss[self._end] = -delta if delta < 0 else 0.0
+        self._end += 1
+        self.bars += 1
+        self.last_close = close
+
+    def _window_mean(self, buffer, window):
+        if self.bars < window:
+            return np.nan
+        # Same pairwise summation and division as np.mean, without its overhead
+        return float(np.add.reduce(buffer[self._end - window:self._end])) / window
+
+    def _continue_ema(self, previous, value, span):
+        if previous is None:
+            return value
+        alpha = self._alpha(span)
+        return (1.0 - alpha) * previous + alpha * value
+
+    def update(self, close, date=None):
+        """
+        Add one bar and return its indicator values
+
+        Args:
+            close: Closing price of the new bar
+            date: Optional date of the bar, kept to check the state against a history
+
+        Returns:
+            Dictionary of indicator name to value
+        """
+        close = float(close)
+        self._push(close)
+        if date is not None:
+            self.last_date = pd.Timestamp(date)
+
+        values = {f'MA{window}': self._window_mean(self._close, window) for window in self.MA_WINDOWS}
+        for span in self.EMA_SPANS:
+            self.ema[span] = self._continue_ema(self.ema[span], close, span)
+            values[f'EMA{span}'] = self.ema[span]
+
+        macd = self.ema[self.EMA_SPANS[0]] - self.ema[self.EMA_SPANS[1]]
+        self.signal = self._continue_ema(self.signal, macd, self.SIGNAL_SPAN)
+        values['MACD'] = macd
+        values['Signal_Line'] = self.signal
+
+        gain = self._window_mean(self._gain, self.RSI_WINDOW)
+        loss = self._window_mean(self._loss, self.RSI_WINDOW)
+        if loss == 0:
+            # Division by zero as NumPy does it: inf, or NaN for 0 / 0
+            rs = np.inf if gain > 0 else np.nan
+        else:
+            rs = gain / loss
+        values['RSI'] = 100 - (100 / (1 + rs))
+        return values
+
+    def update_many(self, closes, dates=None):
+        """
+        Add a batch of bars in order
+
+        Args:
+            closes: Closing prices of the new bars
+            dates: Optional dates of the bars
+
+        Returns:
+            Dictionary of indicator name to an array with one value per bar
+        """
+        closes = np.asarray(closes, dtype=np.float64)
+        dates = [None] * len(closes) if dates is None else list(dates)
+        columns = {name: np.empty(len(closes)) for name in FETCHER_INDICATORS}
+        for i, (close, date) in enumerate(zip(closes, dates)):
+            for name, value in self.update(close, date).items():
+                columns[name][i] = value
+        return columns
+
+    def matches(self, data):
+        """Whether the state ends at the last bar of a history"""
+        if self.last_date is None or data.empty:
+            return False
+        return (self.last_date == data.index[-1]
+                and self.last_close == float(data['Close'].iloc[-1]))
+
+    @classmethod
+    def from_history(cls, data):
+        """
+        Build the state at the end of a history
+
+        Indicator columns already in the frame (EMA12, EMA26, Signal_Line)
+        are continued from; missing EMAs are computed from the closes.
+
+        Args:
+            data: Frame of daily bars with a Close column, indexed by Date
+        """
+        state = cls()
+        close = data['Close'].to_numpy(dtype=np.float64)
+        if len(close) == 0:
+            return state
+
+        # Only the closes inside the longest window (plus the one before it
+        # for the first change) affect future values
+        start = max(0, len(close) - state._capacity)
+        if start > 0:
+            state.bars = start
+            state.last_close = float(close[start - 1])
+        for value in close[start:].tolist():
+            state._push(value)
+        state.last_date = pd.Timestamp(data.index[-1])
+
+        for span in cls.EMA_SPANS:
+            column = f'EMA{span}'
+            series = data[column].to_numpy(dtype=np.float64) if column in data.columns else ema(close, span)
+            state.ema[span] = float(series[-1])
+        if 'Signal_Line' in data.columns:
+            state.signal = float(data['Signal_Line'].iloc[-1])
+        else:
+            macd = ema(close, cls.EMA_SPANS[0]) - ema(close, cls.EMA_SPANS[1])
+            state.signal = float(ema(macd, cls.SIGNAL_SPAN)[-1])
+        return state
+
+    def to_dict(self):
+        """JSON-serializable snapshot of the state"""
+        size = min(self._end, self._capacity)
+        window = slice(self._end - size, self._end)
+        return {
+            'version': self.VERSION,
+            'bars': self.bars,
+            'last_close': self.last_close,
+            'last_date': None if self.last_date is None else self.last_date.isoformat(),
+            'close': self._close[window].tolist(),
+            'gain': self._gain[window].tolist(),
+            'loss': self._loss[window].tolist(),
+            'ema': {str(span): value for span, value in self.ema.items()},
+            'signal': self.signal,
+        }
+
+    @classmethod
+    def from_dict(cls, payload):
+        """Restore a state saved with to_dict"""
+        if payload.get('version') != cls.VERSION:
+            raise ValueError(f"Unsupported indicator state version {payload.get('version')}")
+
+        state = cls()
+        size = len(payload['close'])
+        state._close[:size] = payload['close']
+        state._gain[:size] = payload['gain']
+        state._loss[:size] = payload['loss']
+        state._end = size
+
+        state.bars = payload['bars']
+        state.last_close = payload['last_close']
+        if payload['last_date'] is not None:
+            state.last_date = pd.Timestamp(payload['last_date'])
+        for span in cls.EMA_SPANS:
+            state.ema[span] = payload['ema'].get(str(span))
+        state.signal = payload['signal']
+        return state
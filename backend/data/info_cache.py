@@ -0,0 +1,77 @@
+import json
+import os
+import threading
+import time
+
+
+class InfoCache:
+    """
+    Persistent TTL cache of company information keyed by symbol
+
+    Entries are kept in memory and saved as one JSON file. Writes can be
+    batched with flush=False followed by a single flush(); the file is
+    replaced atomically so readers never see a partial write.
+    """
+
+    def __init__(self, path, ttl=86400):
+        """
+        Args:
+            path: JSON file to persist the cache to
+            ttl: Seconds an entry is considered fresh (default: 24 hours)
+        """
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = self._read()
+        self._dirty = False
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f).get('entries', {})
+        except (OSError, ValueError) as e:
+            if os.path.exists(self.path):
+                print(f"Error loading stock info cache: {e}")
+            return {}
+
+    def get(self, symbol, allow_stale=False):
+        """
+        Return a copy of the cached information for a symbol, or None
+
+        Args:
+            symbol: Stock symbol
+            allow_stale: Return the entry even if it is older than the TTL
+        """
+        with self._lock:
+            entry = self._entries.get(symbol)
+        if entry is None:
+            return None
+        if not allow_stale and time.time() - entry['fetched_at'] > self.ttl:
+            return None
+        return dict(entry['info'])
+
+    def put(self, symbol, info, flush=True):
+        """Store the information for a symbol, saving the file unless flush is False"""
+        with self._lock:
+            self._entries[symbol] = {'info': dict(info), 'fetched_at': time.time()}
+            self._dirty = True
+        if flush:
+            self.flush()
+
+    def flush(self):
+        """Save pending changes to disk"""
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = json.dumps({'entries': self._entries})
+            self._dirty = False
+
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.tmp-{os.getpid()}-{threading.get_ident()}"
+            with open(tmp_path, 'w') as f:
+                f.write(payload)
+            os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -1,7 +1,88 @@
 
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from sklearn.preprocessing import MinMaxScaler
+from .indicators import PREPROCESSOR_INDICATORS, add_indicators
+
+
+def sliding_windows(features, window, target_col=0, horizon=1):
+    """
+    Training windows over a feature array as zero-copy, read-only views
+    
+    Window i holds rows i .. i+window-1 and its target is column target_col of
+    row i+window (rows i+window .. i+window+horizon-1 for a multi-step target),
+    so a history of T bars yields T - window - horizon + 1 windows.
+    
+    Args:
+        features: (time, features) array for one symbol, or a (symbols, time,
+            features) panel of aligned histories
+        window: Number of bars per input window
+        target_col: Index of the column to predict
+        horizon: Number of future bars in each target
+        
+    Returns:
+        Tuple (X, y): X has shape (n_windows, window, features), or (symbols,
+        n_windows, window, features) for a panel, and y holds the targets, with
+        an extra trailing axis of length horizon when horizon > 1
+    """
+    features = np.asarray(features)
+    if features.ndim not in (2, 3):
+        raise ValueError(f"Expected a (time, features) array or a (symbols, time, features) panel, got shape {features.shape}")
+    
+    n_windows = max(features.shape[-2] - window - horizon + 1, 0)
+    if n_windows == 0:
+        # sliding_window_view rejects windows longer than the series
+        shape = features.shape[:-2] + (0, window, features.shape[-1])
+        target_shape = shape[:-2] + ((horizon,) if horizon > 1 else ())
+        return np.empty(shape, dtype=features.dtype), np.empty(target_shape, dtype=features.dtype)
+    
+    # The last bars are only ever targets; windows come out as (..., n, features,
+    # window) and swapping the last two axes only changes strides
+    X = sliding_window_view(features[..., :n_windows + window - 1, :], window, axis=-2).swapaxes(-1, -2)
+    if horizon > 1:
+        y = sliding_window_view(features[..., window:, target_col], horizon, axis=-1)
+    else:
+        y = features[..., window:, target_col].view()
+        y.flags.writeable = False
+    return X, y
+
+
+def stack_windows(feature_arrays, window, target_col=0, dtype=np.float32, horizon=1):
+    """
+    Training windows from several symbols with histories of different lengths
+    
+    Windows never span two symbols. They are written once into a single
+    preallocated array instead of being collected in a list and copied again.
+    
+    Args:
+        feature_arrays: Iterable of (time, features) arrays, one per symbol
+        window: Number of bars per input window
+        target_col: Index of the column to predict
+        dtype: dtype of the returned arrays (float32 halves the memory of float64)
+        horizon: Number of future bars in each target
+        
+    Returns:
+        Tuple (X, y) with X of shape (total_windows, window, features)
+    """
+    views = [sliding_windows(features, window, target_col, horizon) for features in feature_arrays]
+    if not views:
+        raise ValueError("No feature arrays to build windows from")
+    
+    n_features = views[0][0].shape[-1]
+    total = sum(len(y) for _, y in views)
+    X = np.empty((total, window, n_features), dtype=dtype)
+    y = np.empty((total,) + views[0][1].shape[1:], dtype=dtype)
+    
+    position = 0
+    for X_symbol, y_symbol in views:
+        if X_symbol.shape[-1] != n_features:
+            raise ValueError("All symbols must have the same number of features")
+        X[position:position + len(y_symbol)] = X_symbol
+        y[position:position + len(y_symbol)] = y_symbol
+        position += len(y_symbol)
+    return X, y
+
 
 class DataPreprocessor:
     def __init__(self):
@@ -35,38 +116,14 @@ class DataPreprocessor:
         return df
     
     def _add_technical_indicators(self, df):
-        """Add technical indicators to the dataframe"""
-        # Moving averages
-        df['MA5'] = df['Close'].rolling(window=5).mean()
-        df['MA20'] = df['Close'].rolling(window=20).mean()
-        df['MA50'] = df['Close'].rolling(window=50).mean()
-        
-        # Relative Strength Index (RSI)
-        delta = df['Close'].diff()
-        gain = delta.where(delta > 0, 0).rolling(window=14).mean()
-        loss = -delta.where(delta < 0, 0).rolling(window=14).mean()
-        rs = gain / loss
-        df['RSI'] = 100 - (100 / (1 + rs))
-        
-        # MACD (Moving Average Convergence Divergence)
-        ema12 = df['Close'].ewm(span=12, adjust=False).mean()
-        ema26 = df['Close'].ewm(span=26, adjust=False).mean()
-        df['MACD'] = ema12 - ema26
-        df['MACD_signal'] = df['MACD'].ewm(span=9, adjust=False).mean()
-        
-        # Bollinger Bands
-        df['MA20_std'] = df['Close'].rolling(window=20).std()
-        df['upper_band'] = df['MA20'] + (df['MA20_std'] * 2)
-        df['lower_band'] = df['MA20'] - (df['MA20_std'] * 2)
-        
-        # Volume indicators
-        df['Volume_1d_change'] = df['Volume'].pct_change()
-        
-        # Price momentum
-        df['Price_1d_change'] = df['Close'].pct_change()
-        df['Price_5d_change'] = df['Close'].pct_change(periods=5)
+        """
+        Add technical indicators to the dataframe
         
-        return df
+        Adds moving averages, RSI, MACD, Bollinger bands and volume/price
+        momentum. Indicators already present (e.g. MA20, MA50, RSI and MACD
+        from StockDataFetcher) are reused rather than recomputed.
+        """
+        return add_indicators(df, PREPROCESSOR_INDICATORS)
     
     def split_data(self, df, test_size=0.2):
         """Split data into training and testing sets"""
@@ -84,15 +141,43 @@ class DataPreprocessor:
         data_scaled[feature_columns] = self.scaler.fit_transform(data[feature_columns])
         return data_scaled
     
-    def create_sequences(self, data, target_col='Close', sequence_length=60):
-        """Create sequences for time series prediction"""
-        sequences = []
-        targets = []
+    def create_sequences(self, data, target_col='Close', sequence_length=60, dtype=None):
+        """
+        Create sequences for time series prediction
         
-        for i in range(len(data) - sequence_length):
-            seq = data.iloc[i:i+sequence_length]
-            target = data.iloc[i+sequence_length][target_col]
-            sequences.append(seq.values)
-            targets.append(target)
+        Args:
+            data: DataFrame of features for one symbol, a (symbols, time, features)
+                array of aligned histories, or a list/dict of DataFrames for
+                several symbols
+            target_col: Column to predict for the bar after each sequence
+            sequence_length: Number of bars per sequence
+            dtype: Materialize the sequences as a contiguous array of this dtype
+                (e.g. np.float32); by default a single symbol or aligned panel
+                yields read-only views that share memory with the data
             
-        return np.array(sequences), np.array(targets)
+        Returns:
+            Tuple (X, y) of sequences with shape (n, sequence_length, features)
+            and their targets
+        """
+        if isinstance(data, dict):
+            data = list(data.values())
+        
+        if isinstance(data, (list, tuple)):
+            target_index = self._column_index(data[0], target_col)
+            arrays = [frame.to_numpy() if isinstance(frame, pd.DataFrame) else frame for frame in data]
+            return stack_windows(arrays, sequence_length, target_index,
+                                 dtype=dtype or np.result_type(*arrays))
+        
+        target_index = self._column_index(data, target_col)
+        values = data.to_numpy() if isinstance(data, pd.DataFrame) else data
+        X, y = sliding_windows(values, sequence_length, target_index)
+        if dtype is not None:
+            X, y = np.ascontiguousarray(X, dtype=dtype), np.ascontiguousarray(y, dtype=dtype)
+        return X, y
+    
+    @staticmethod
+    def _column_index(data, column):
+        """Position of a named column in a DataFrame; arrays take an integer index"""
+        if isinstance(data, pd.DataFrame):
+            return data.columns.get_loc(column)
+        return column if isinstance(column, int) else 0
@@ -0,0 +1,229 @@
+import glob
+import os
+import random
+import threading
+import time
+
+import pandas as pd
+
+from .cache_backend import to_wall_clock
+
+
+class ProviderError(Exception):
+    """Raised when a market-data provider cannot serve a request"""
+
+
+class MarketDataProvider:
+    """
+    Source of raw daily bars and company information for StockDataFetcher
+
+    Providers return prices in the instrument's native currency; currency
+    conversion and technical indicators are applied by StockDataFetcher.
+    """
+
+    name = None
+
+    def history(self, symbol, period=None, start=None):
+        """
+        Return daily OHLCV bars for a symbol
+
+        Args:
+            symbol: Stock symbol
+            period: Time period such as '5y' or '6mo', used when start is None
+            start: First date to return (inclusive)
+
+        Returns:
+            DataFrame with Open, High, Low, Close and Volume columns indexed by date
+        """
+        raise NotImplementedError
+
+    def info(self, symbol):
+        """Return a dictionary of company information using yfinance's field names"""
+        raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Live data from Yahoo Finance"""
+
+    name = 'yfinance'
+
+    def _ticker(self, symbol):
+        import yfinance as yf
+        return yf.Ticker(symbol)
+
+    def history(self, symbol, period=None, start=None):
+        stock = self._ticker(symbol)
+        if start is not None:
+            return stock.history(start=pd.Timestamp(start).strftime('%Y-%m-%d'))
+        return stock.history(period=period)
+
+    def info(self, symbol):
+        return self._ticker(symbol).info
+
+
+def period_start(end, period):
+    """Return the first date covered by a yfinance-style period ending at `end`"""
+    if period in (None, 'max'):
+        return None
+    units = {'y': 'years', 'mo': 'months', 'wk': 'weeks', 'd': 'days'}
+    for suffix, unit in units.items():
+        if period.endswith(suffix) and period[:-len(suffix)].isdigit():
+            return end - pd.DateOffset(**{unit: int(period[:-len(suffix)])})
+    raise ValueError(f"Unsupported period '{period}'")
+
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Offline provider that replays bars from the CSV history cache
+
+    Used to run and benchmark the pipeline without network access. It can
+    inject latency and random failures, and it can simulate a live market: when
+    a start date is given, only bars up to the replay clock are visible and
+    advance() releases the following trading days one at a time.
+
+    Example:
+        provider = ReplayProvider('data/cache', latency=(0.05, 0.2), failure_rate=0.05,
+                                  start_date='2024-01-02')
+        fetcher = StockDataFetcher(provider=provider)
+        fetcher.fetch_stock_data('AAPL')
+        provider.advance()  # the next trading day becomes available
+    """
+
+    name = 'replay'
+    RAW_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+
+    def __init__(self, cache_dir='data/cache', latency=0.0, failure_rate=0.0, seed=None,
+                 start_date=None, usd_to_inr=82.5):
+        """
+        Args:
+            cache_dir: Directory holding '{symbol}_{period}_{currency}.csv' files
+            latency: Seconds added to every request, or a (min, max) range to draw from
+            failure_rate: Probability that a request raises ProviderError
+            seed: Seed for the latency and failure draws
+            start_date: Replay clock; bars after it are hidden until advance() is called
+                (default: serve the full history)
+            usd_to_inr: Rate the cached non-'.NS' prices were converted with, undone
+                here so that StockDataFetcher's conversion reproduces the cached prices
+        """
+        self.cache_dir = cache_dir
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.usd_to_inr = usd_to_inr
+        self.clock = pd.Timestamp(start_date) if start_date is not None else None
+        self.requests = 0
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._bars = {}
+
+    def symbols(self):
+        """Symbols with a readable cached history"""
+        found = set()
+        for path in glob.glob(os.path.join(self.cache_dir, '*_*_*.csv')):
+            symbol = os.path.basename(path)[:-len('.csv')].rsplit('_', 2)[0]
+            try:
+                self._load(symbol)
+                found.add(symbol)
+            except ProviderError:
+                continue
+        return sorted(found)
+
+    def advance(self, days=1):
+        """Move the replay clock forward by a number of business days and return it"""
+        if self.clock is None:
+            raise ProviderError("advance() requires a ReplayProvider created with a start_date")
+        with self._lock:
+            self.clock = self.clock + pd.offsets.BDay(days)
+            return self.clock
+
+    def _simulate_request(self, symbol):
+        """Apply the configured latency and failure injection"""
+        with self._lock:
+            self.requests += 1
+            if isinstance(self.latency, (tuple, list)):
+                delay = self._random.uniform(*self.latency)
+            else:
+                delay = self.latency
+            failed = self._random.random() < self.failure_rate
+
+        if delay:
+            time.sleep(delay)
+        if failed:
+            raise ProviderError(f"Injected failure for {symbol}")
+
+    def _load(self, symbol):
+        """Read and memoize the raw bars of a symbol in its native currency"""
+        with self._lock:
+            if symbol in self._bars:
+                return self._bars[symbol]
+
+        paths = sorted(glob.glob(os.path.join(glob.escape(self.cache_dir), f"{glob.escape(symbol)}_*_*.csv")))
+        if not paths:
+            raise ProviderError(f"No replay data for {symbol}")
+
+        try:
+            df = pd.read_csv(paths[0])
+            df.index = to_wall_clock(df.pop('Date'))
+        except Exception as e:
+            # e.g. a Git LFS pointer instead of the CSV content
+            raise ProviderError(f"Unreadable replay data for {symbol}: {e}")
+        df.index.name = 'Date'
+        df = df[[col for col in self.RAW_COLUMNS if col in df.columns]]
+
+        if not symbol.endswith('.NS'):
+            df = df.copy()
+            for col in ['Open', 'High', 'Low', 'Close']:
+                df[col] = df[col] / self.usd_to_inr
+
+        with self._lock:
+            self._bars[symbol] = df
+        return df
+
+    def history(self, symbol, period=None, start=None):
+        self._simulate_request(symbol)
+        bars = self._load(symbol)
+
+        if self.clock is not None:
+            bars = bars[bars.index <= self.clock]
+        if bars.empty:
+            return bars.copy()
+
+        if start is not None:
+            first = pd.Timestamp(start)
+        else:
+            first = period_start(bars.index[-1], period)
+        if first is not None:
+            bars = bars[bars.index >= first]
+        return bars.copy()
+
+    def info(self, symbol):
+        self._simulate_request(symbol)
+        bars = self._load(symbol)
+        if self.clock is not None:
+            bars = bars[bars.index <= self.clock]
+        last_year = bars['Close'].iloc[-252:]
+
+        return {
+            'shortName': symbol,
+            'longName': symbol,
+            'currency': 'INR' if symbol.endswith('.NS') else 'USD',
+            'exchange': 'NSI' if symbol.endswith('.NS') else '',
+            'fiftyTwoWeekHigh': float(last_year.max()) if len(last_year) else 0,
+            'fiftyTwoWeekLow': float(last_year.min()) if len(last_year) else 0,
+        }
+
+
+PROVIDERS = {
+    YFinanceProvider.name: YFinanceProvider,
+    ReplayProvider.name: ReplayProvider,
+}
+
+
+def get_provider(provider):
+    """Resolve a provider name or instance to a MarketDataProvider"""
+    if isinstance(provider, MarketDataProvider):
+        return provider
+    try:
+        return PROVIDERS[provider]()
+    except KeyError:
+        raise ValueError(f"Unknown data provider '{provider}'. Choose from: {', '.join(PROVIDERS)}")
@@ -0,0 +1,244 @@
+import bisect
+import heapq
+import re
+import threading
+from collections import defaultdict
+
+
+class SymbolIndex:
+    """
+    In-memory search index over stock symbols and company names
+
+    Lookups combine three strategies, ranked in this order:
+        1. prefix of the symbol
+        2. prefix of a word of the company name
+        3. fuzzy match on character n-grams of the symbol and name, used when
+           the prefix matches do not fill a page of results (typos, fragments
+           from the middle of a word)
+    Ties are broken by popularity and then alphabetically.
+
+    Prefix lookups binary-search a sorted array of (tier, key, symbol) tuples
+    and read at most max_candidates matches from it, and fuzzy lookups only
+    score symbols sharing an n-gram with the query, so neither scans the whole
+    universe. The candidates depend only on the query (and page size, for the
+    fuzzy fill), so every page of one query is a slice of the same ranking.
+    When a prefix has more matches than max_candidates, the most popular
+    symbols are still ranked first and the total counts the candidates.
+    update() applies only the differences from the current contents.
+    """
+
+    def __init__(self, ngram=3, min_similarity=0.5, popular_candidates=100, max_candidates=1000):
+        """
+        Args:
+            ngram: Length of the character n-grams used for fuzzy matching
+            min_similarity: Fraction of the query's n-grams a fuzzy match must contain
+            popular_candidates: Number of most popular symbols checked against every
+                query, so they rank first even when its prefix matches are capped
+            max_candidates: Most prefix matches ranked per query; results past
+                them cannot be paged to
+        """
+        self.ngram = ngram
+        self.min_similarity = min_similarity
+        self.popular_candidates = popular_candidates
+        self.max_candidates = max_candidates
+
+        self._names = {}
+        self._keys = []                  # sorted (tier, key, symbol) tuples for prefix lookup
+        self._grams = defaultdict(set)   # n-gram -> symbols containing it
+        self._popularity = {}
+        self._popular_keys = None        # prefix keys of the most popular symbols, built on demand
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _normalize(text):
+        return re.sub(r'\s+', ' ', text.lower()).strip()
+
+    def _prefix_keys(self, symbol, name):
+        # Tier 0 keys are symbols, tier 1 keys are words of the company name
+        keys = {(1, word, symbol) for word in re.findall(r'[a-z0-9&]+', self._normalize(name))}
+        keys.add((0, symbol.lower(), symbol))
+        return keys
+
+    def _ngrams(self, text):
+        text = f" {self._normalize(text)} "
+        if len(text) <= self.ngram:
+            return {text}
+        return {text[i:i + self.ngram] for i in range(len(text) - self.ngram + 1)}
+
+    def _symbol_grams(self, symbol, name):
+        return self._ngrams(symbol) | self._ngrams(name)
+
+    def _add(self, symbol, name, new_keys):
+        self._names[symbol] = name
+        new_keys.extend(self._prefix_keys(symbol, name))
+        for gram in self._symbol_grams(symbol, name):
+            self._grams[gram].add(symbol)
+
+    def _remove(self, symbol, stale_keys):
+        name = self._names.pop(symbol)
+        stale_keys.update(self._prefix_keys(symbol, name))
+        for gram in self._symbol_grams(symbol, name):
+            symbols = self._grams.get(gram)
+            if symbols is not None:
+                symbols.discard(symbol)
+                if not symbols:
+                    del self._grams[gram]
+
+    def _apply_key_changes(self, new_keys, stale_keys):
+        """Update the sorted key array, re-sorting only for large batches"""
+        if len(new_keys) + len(stale_keys) > len(self._keys) // 8:
+            if stale_keys:
+                self._keys = [key for key in self._keys if key not in stale_keys]
+            self._keys.extend(new_keys)
+            self._keys.sort()
+            return
+
+        for key in stale_keys:
+            position = bisect.bisect_left(self._keys, key)
+            if position < len(self._keys) and self._keys[position] == key:
+                del self._keys[position]
+        for key in new_keys:
+            bisect.insort(self._keys, key)
+
+    def update(self, entries, remove_missing=True):
+        """
+        Bring the index in line with a {symbol: name} mapping
+
+        Args:
+            entries: Mapping of symbol to company name ('' if unknown)
+            remove_missing: Drop indexed symbols that are not in entries
+
+        Returns:
+            Number of symbols added, changed or removed
+        """
+        with self._lock:
+            new_keys, stale_keys = [], set()
+            changes = 0
+            if remove_missing:
+                for symbol in [s for s in self._names if s not in entries]:
+                    self._remove(symbol, stale_keys)
+                    changes += 1
+
+            for symbol, name in entries.items():
+                name = name or ''
+                current = self._names.get(symbol)
+                if current == name:
+                    continue
+                if current is not None:
+                    self._remove(symbol, stale_keys)
+                self._add(symbol, name, new_keys)
+                changes += 1
+
+            # Keys shared by the old and new version of an entry stay in place
+            unchanged = stale_keys.intersection(new_keys)
+            self._apply_key_changes([k for k in new_keys if k not in unchanged], stale_keys - unchanged)
+            if changes:
+                self._popular_keys = None
+            return changes
+
+    def set_popularity(self, scores):
+        """Set popularity scores (higher ranks first) for some symbols"""
+        with self._lock:
+            self._popularity.update(scores)
+            self._popular_keys = None
+
+    def record_access(self, symbol, weight=1.0):
+        """
+        Increase the popularity of a symbol, e.g. when it is analyzed
+
+        Symbols that are not in the index are ignored, so arbitrary user input
+        cannot grow the popularity table.
+
+        Returns:
+            True if the symbol is indexed and its popularity was increased
+        """
+        with self._lock:
+            if symbol not in self._names:
+                return False
+            self._popularity[symbol] = self._popularity.get(symbol, 0.0) + weight
+            self._popular_keys = None
+            return True
+
+    def _prefix_range(self, tier, prefix):
+        """Start and end positions of the keys of a tier that start with prefix"""
+        start = bisect.bisect_left(self._keys, (tier, prefix))
+        end = bisect.bisect_left(self._keys, (tier, prefix + '\uffff'), lo=start)
+        return start, end
+
+    def _top_popular(self):
+        """(symbol, prefix keys) of the most popular indexed symbols"""
+        if self._popular_keys is None:
+            indexed = (symbol for symbol in self._popularity if symbol in self._names)
+            top = heapq.nlargest(self.popular_candidates, indexed, key=self._popularity.get)
+            self._popular_keys = [(symbol, self._prefix_keys(symbol, self._names[symbol])) for symbol in top]
+        return self._popular_keys
+
+    def search(self, query, limit=20, offset=0):
+        """
+        Find symbols matching a query
+
+        Args:
+            query: Search text (symbol or company name fragment)
+            limit: Maximum number of results
+            offset: Number of ranked results to skip
+
+        Returns:
+            Tuple of (list of {'symbol', 'name'} dicts, total number of ranked
+            matches). Past max_candidates prefix matches, the total counts only
+            the candidates, which are all the results offset can reach
+        """
+        query = self._normalize(query)
+        if not query:
+            return [], 0
+
+        with self._lock:
+            # Best tier per symbol: 0 symbol prefix, 1 name word prefix, 2+ fuzzy.
+            # The candidates do not depend on offset, so pages never overlap or skip
+            tiers = {}
+            truncated = False
+            for tier in (0, 1):
+                start, end = self._prefix_range(tier, query)
+                position = start
+                while position < end and len(tiers) < self.max_candidates:
+                    # A symbol can have several matching name words, so read until enough are distinct
+                    stop = min(end, position + self.max_candidates - len(tiers))
+                    for _, _, symbol in self._keys[position:stop]:
+                        tiers.setdefault(symbol, tier)
+                    position = stop
+                truncated = truncated or position < end
+
+            if truncated:
+                # Popular symbols outrank the rest of their tier wherever they fall in key order
+                for symbol, keys in self._top_popular():
+                    matched = [tier for tier, key, _ in keys if key.startswith(query)]
+                    if matched:
+                        tiers[symbol] = min(min(matched), tiers.get(symbol, 1))
+
+            # Fuzzy matches only fill queries whose prefix matches leave a page short
+            if len(query) >= self.ngram and len(tiers) < limit:
+                # Without padding so fragments from the middle of a word match too
+                query_grams = {query[i:i + self.ngram] for i in range(len(query) - self.ngram + 1)}
+                counts = defaultdict(int)
+                for gram in query_grams:
+                    for symbol in self._grams.get(gram, ()):
+                        counts[symbol] += 1
+                needed = self.min_similarity * len(query_grams)
+                for symbol, count in counts.items():
+                    if count >= needed and symbol not in tiers:
+                        tiers[symbol] = 2 + (1 - count / len(query_grams))
+
+            popularity = self._popularity
+            ranked = heapq.nsmallest(
+                offset + limit,
+                ((tier, -popularity.get(symbol, 0.0), symbol) for symbol, tier in tiers.items())
+            )
+            results = [{'symbol': s, 'name': self._names[s] or s} for _, _, s in ranked[offset:]]
+            return results, len(tiers)
+
+    def name(self, symbol):
+        with self._lock:
+            return self._names.get(symbol)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._names)
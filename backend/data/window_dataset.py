@@ -0,0 +1,149 @@
+import os
+
+import numpy as np
+
+from .preprocessor import sliding_windows
+
+
+class WindowDataset:
+    """
+    Training windows over many symbols, read in batches from memory-mapped arrays
+
+    Each symbol's scaled features are a float32 .npy file, opened with mmap_mode='r',
+    and windows are zero-copy views of it (see sliding_windows). Only the windows
+    of the batch being built are copied into RAM, so a universe of thousands of
+    symbols trains with the memory of a few batches. Every epoch visits the
+    windows of all symbols in a new random order.
+
+    The last validation_split of each symbol's windows is held out for
+    validation, so validation windows always come after the training windows
+    of the same symbol.
+    """
+
+    def __init__(self, arrays, window, horizon=1, target_col=0, batch_size=32,
+                 validation_split=0.2, seed=None):
+        """
+        Args:
+            arrays: Dictionary of symbol to (time, features) array (usually memory-mapped)
+            window: Number of bars per input window
+            horizon: Number of future bars in each target
+            target_col: Index of the column to predict
+            batch_size: Windows per batch
+            validation_split: Fraction of each symbol's windows held out for validation
+            seed: Seed for the shuffling order
+        """
+        self.window = window
+        self.horizon = horizon
+        self.batch_size = batch_size
+        self.symbols = []
+        self._views = []
+        self.n_features = None
+
+        train_counts, validation_counts = [], []
+        for symbol, features in arrays.items():
+            X, y = sliding_windows(features, window, target_col, horizon)
+            if len(y) == 0:
+                continue
+            if self.n_features is None:
+                self.n_features = X.shape[-1]
+            elif X.shape[-1] != self.n_features:
+                raise ValueError(f"{symbol} has {X.shape[-1]} features, expected {self.n_features}")
+            n_validation = int(len(y) * validation_split)
+            self.symbols.append(symbol)
+            self._views.append((X, y))
+            train_counts.append(len(y) - n_validation)
+            validation_counts.append(n_validation)
+
+        if not self.symbols:
+            raise ValueError(f"No symbol has enough data for a window of {window} and a horizon of {horizon}")
+
+        # Window k of a subset belongs to the symbol whose offset range holds k;
+        # `first` is the index of the symbol's first window in that subset
+        train_counts = np.array(train_counts, dtype=np.int64)
+        validation_counts = np.array(validation_counts, dtype=np.int64)
+        self._subsets = {
+            'train': (np.concatenate(([0], np.cumsum(train_counts))), np.zeros_like(train_counts)),
+            'validation': (np.concatenate(([0], np.cumsum(validation_counts))), train_counts),
+        }
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_directory(cls, directory, symbols=None, **kwargs):
+        """
+        Open the feature arrays written by save_features, memory-mapped
+
+        Args:
+            directory: Directory of <symbol>.npy files
+            symbols: Symbols to load (default: every file in the directory)
+            **kwargs: Passed to WindowDataset()
+        """
+        if symbols is None:
+            symbols = sorted(name[:-len('.npy')] for name in os.listdir(directory) if name.endswith('.npy'))
+        arrays = {symbol: np.load(os.path.join(directory, f"{symbol}.npy"), mmap_mode='r') for symbol in symbols}
+        return cls(arrays, **kwargs)
+
+    @staticmethod
+    def save_features(directory, symbol, features):
+        """Write one symbol's feature array as float32, to be memory-mapped by from_directory"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{symbol}.npy")
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.asarray(features, dtype=np.float32))
+        os.replace(tmp_path, path)
+
+    def __len__(self):
+        """Number of training windows"""
+        return self.size('train')
+
+    def size(self, subset='train'):
+        return int(self._subsets[subset][0][-1])
+
+    def steps(self, subset='train'):
+        """Number of batches per epoch"""
+        return -(-self.size(subset) // self.batch_size)
+
+    def batches(self, subset='train', shuffle=None):
+        """
+        Yield (X, y) float32 batches of one epoch
+
+        Args:
+            subset: 'train' or 'validation'
+            shuffle: Visit windows in random order (default: for training only)
+        """
+        offsets, first = self._subsets[subset]
+        size = int(offsets[-1])
+        if shuffle is None:
+            shuffle = subset == 'train'
+        order = self._rng.permutation(size) if shuffle else np.arange(size)
+
+        for position in range(0, size, self.batch_size):
+            ids = order[position:position + self.batch_size]
+            owners = np.searchsorted(offsets, ids, side='right') - 1
+            starts = ids - offsets[owners] + first[owners]
+
+            X_batch = np.empty((len(ids), self.window, self.n_features), dtype=np.float32)
+            y_batch = np.empty((len(ids),) + ((self.horizon,) if self.horizon > 1 else ()), dtype=np.float32)
+            # One gather per symbol in the batch, reading only the pages its windows touch
+            for owner in np.unique(owners):
+                rows = np.flatnonzero(owners == owner)
+                X, y = self._views[owner]
+                X_batch[rows] = X[starts[rows]]
+                y_batch[rows] = y[starts[rows]]
+            yield X_batch, y_batch
+
+    def to_tf_dataset(self, subset='train', shuffle=None):
+        """
+        The batches of a subset as a prefetching tf.data.Dataset
+
+        Each pass over the dataset (one Keras epoch) reshuffles the windows.
+        """
+        import tensorflow as tf
+
+        target_shape = (None, self.horizon) if self.horizon > 1 else (None,)
+        signature = (tf.TensorSpec((None, self.window, self.n_features), tf.float32),
+                     tf.TensorSpec(target_shape, tf.float32))
+        dataset = tf.data.Dataset.from_generator(lambda: self.batches(subset, shuffle), output_signature=signature)
+        # Known cardinality lets Keras show progress and size each epoch
+        dataset = dataset.apply(tf.data.experimental.assert_cardinality(self.steps(subset)))
+        return dataset.prefetch(tf.data.AUTOTUNE)
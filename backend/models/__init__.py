@@ -4,5 +4,7 @@
 from .lstm_model import LSTMModel
 from .prophet_model import ProphetModel
 from .ensemble import EnsembleModel
+from .baseline_model import BaselineModel
+from .registry import ModelRegistry
 
-__all__ = ['LSTMModel', 'ProphetModel', 'EnsembleModel']
+__all__ = ['LSTMModel', 'ProphetModel', 'EnsembleModel', 'BaselineModel', 'ModelRegistry']
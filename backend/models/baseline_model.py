@@ -0,0 +1,218 @@
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+from .registry import data_fingerprint
+
+class BaselineModel:
+    """
+    Autoregressive model of daily log returns, fitted and forecast for many symbols at once
+
+    Each symbol's last `lookback` closes are right-aligned into one (symbols x
+    time) panel. An AR(order) model with drift is fitted to every row of the
+    panel by a single batched least-squares solve, and the forecasts of all
+    symbols are rolled out together. Fitting and forecasting take milliseconds,
+    so it serves as a fast member of, or fallback for, the slower models.
+    Fits are kept per symbol in an LRU of at most max_fits entries.
+    """
+    MODEL_TYPE = 'baseline'
+
+    def __init__(self, order=5, lookback=500, interval_width=0.95, ridge=1e-6, max_fits=10000):
+        """
+        Args:
+            order: Number of lagged returns each forecast depends on
+            lookback: Number of most recent closes fitted per symbol
+            interval_width: Coverage of the Lower/Upper interval
+            ridge: Regularization added to the normal equations, so short or
+                flat histories still give a solvable system
+            max_fits: Number of per-symbol fits kept; the least recently used are evicted
+        """
+        self.order = order
+        self.lookback = lookback
+        self.interval_width = interval_width
+        self.ridge = ridge
+        self.max_fits = max_fits
+        # Symbol -> (fingerprint, coefficients, residual standard deviation), least recently used first
+        self.fits = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _returns_panel(self, closes):
+        """Right-aligned (symbols x lookback) panel of log returns, NaN where a history is shorter"""
+        panel = np.full((len(closes), self.lookback), np.nan)
+        for row, close in enumerate(closes):
+            returns = np.diff(np.log(np.asarray(close, dtype=float)[-(self.lookback + 1):]))
+            if len(returns):
+                panel[row, -len(returns):] = returns
+        return panel
+
+    def _fit_panel(self, panel):
+        """
+        Fit AR(order) with drift to every row of a returns panel
+
+        Returns:
+            Tuple of (coefficients of shape (symbols, order + 1) with the drift
+            first and lag 1 next, residual standard deviations of shape (symbols,))
+        """
+        n_symbols, length = panel.shape
+        p = self.order
+        # Design rows [1, r[t-1], ..., r[t-p]] with target r[t], for every symbol at once
+        lags = np.stack([panel[:, p - k:length - k] for k in range(1, p + 1)], axis=2)
+        design = np.concatenate([np.ones((n_symbols, length - p, 1)), lags], axis=2)
+        target = panel[:, p:]
+
+        valid = ~(np.isnan(target) | np.isnan(lags).any(axis=2))
+        design = np.where(valid[:, :, None], design, 0.0)
+        target = np.where(valid, target, 0.0)
+
+        gram = np.einsum('stj,stk->sjk', design, design) + self.ridge * np.eye(p + 1)
+        moment = np.einsum('stj,st->sj', design, target)
+        coefficients = np.linalg.solve(gram, moment[:, :, None])[:, :, 0]
+
+        # Keep the recursion stable: shrink lag coefficients whose absolute sum reaches 1
+        lag_sum = np.abs(coefficients[:, 1:]).sum(axis=1)
+        coefficients[:, 1:] *= np.minimum(1.0, 0.98 / np.maximum(lag_sum, 1e-12))[:, None]
+
+        residuals = np.where(valid, target - np.einsum('stj,sj->st', design, coefficients), 0.0)
+        dof = np.maximum(valid.sum(axis=1) - (p + 1), 1)
+        sigma = np.sqrt((residuals ** 2).sum(axis=1) / dof)
+        return coefficients, sigma
+
+    def train(self, data, symbol=None):
+        """
+        Fit the model to a stock's closes
+
+        Args:
+            data: Historical stock data with a Close column
+            symbol: Symbol the data belongs to (fits are kept per symbol)
+        """
+        self.train_many({symbol: data})
+        return self
+
+    def train_many(self, frames):
+        """
+        Fit the model for many symbols in one batched solve
+
+        Args:
+            frames: Dictionary of symbol to historical data with a Close column
+        """
+        self._fit_frames(frames)
+        return self
+
+    def _fit_frames(self, frames, fingerprints=None):
+        """
+        Fit many symbols in one batched solve and keep the fits
+
+        Returns:
+            Dictionary of symbol to (fingerprint, coefficients, sigma), so callers
+            do not depend on the fits surviving eviction
+        """
+        symbols = list(frames)
+        if not symbols:
+            return {}
+        if fingerprints is None:
+            fingerprints = {s: data_fingerprint(frames[s][['Close']]) for s in symbols}
+        coefficients, sigma = self._fit_panel(self._returns_panel([frames[s]['Close'].values for s in symbols]))
+        fits = {symbol: (fingerprints[symbol], coefficients[i], sigma[i]) for i, symbol in enumerate(symbols)}
+
+        with self._lock:
+            for symbol, fit in fits.items():
+                self.fits[symbol] = fit
+                self.fits.move_to_end(symbol)
+            while len(self.fits) > self.max_fits:
+                self.fits.popitem(last=False)
+        return fits
+
+    def _forecast(self, frames, prediction_days):
+        """
+        Log-return forecasts and their cumulative standard deviations for many symbols
+
+        Symbols that were not fitted on exactly this data are fitted first.
+
+        Returns:
+            Tuple of (expected cumulative log returns, standard deviations), each
+            of shape (symbols, prediction_days), in the order of frames
+        """
+        symbols = list(frames)
+        fingerprints = {s: data_fingerprint(frames[s][['Close']]) for s in symbols}
+        fits = {}
+        with self._lock:
+            for s in symbols:
+                fit = self.fits.get(s)
+                if fit is not None and fit[0] == fingerprints[s]:
+                    self.fits.move_to_end(s)
+                    fits[s] = fit
+        stale = {s: frames[s] for s in symbols if s not in fits}
+        if stale:
+            fits.update(self._fit_frames(stale, fingerprints))
+
+        coefficients = np.stack([fits[s][1] for s in symbols])
+        sigma = np.array([fits[s][2] for s in symbols])
+        drift, phi = coefficients[:, 0], coefficients[:, 1:]
+        p = self.order
+
+        # Most recent returns first, zero where a history is too short
+        panel = self._returns_panel([frames[s]['Close'].values for s in symbols])
+        history = np.nan_to_num(panel[:, ::-1][:, :p])
+
+        # Roll the recursion forward for all symbols, with its impulse response for the intervals
+        expected = np.empty((len(symbols), prediction_days))
+        psi = np.zeros((len(symbols), prediction_days))
+        psi[:, 0] = 1.0
+        for step in range(prediction_days):
+            expected[:, step] = drift + (phi * history).sum(axis=1)
+            history = np.concatenate([expected[:, step:step + 1], history[:, :-1]], axis=1)
+            if step:
+                recent = psi[:, max(step - p, 0):step][:, ::-1]
+                psi[:, step] = (phi[:, :recent.shape[1]] * recent).sum(axis=1)
+
+        # Variance of the h-day log return: sigma^2 * sum over shocks k <= h of (psi_0 + ... + psi_{h-k})^2
+        cumulative_psi = np.cumsum(psi, axis=1)
+        std = sigma[:, None] * np.sqrt(np.cumsum(cumulative_psi ** 2, axis=1))
+        return np.cumsum(expected, axis=1), std
+
+    def predict(self, data, prediction_days=30, symbol=None):
+        """
+        Generate predictions for the next prediction_days
+
+        Args:
+            data: Historical stock data with a Close column
+            prediction_days: Number of days to predict
+            symbol: Symbol the data belongs to; its fit is reused when it was
+                made on the same data, otherwise the model is fitted first
+        """
+        return self.predict_many({symbol: data}, prediction_days)[symbol]
+
+    def predict_many(self, frames, prediction_days=30):
+        """
+        Generate predictions for several symbols at once
+
+        Args:
+            frames: Dictionary of symbol to historical data
+            prediction_days: Number of days to predict
+
+        Returns:
+            Dictionary of symbol to predictions in the format returned by predict()
+        """
+        if not frames:
+            return {}
+        log_returns, std = self._forecast(frames, prediction_days)
+        z = norm.ppf(0.5 + self.interval_width / 2)
+
+        results = {}
+        for i, (symbol, data) in enumerate(frames.items()):
+            last_close = float(data['Close'].iloc[-1])
+            # Business days, as the LSTM forecasts
+            last_date = pd.to_datetime(data.index[-1])
+            future_dates = pd.bdate_range(start=last_date + pd.Timedelta(days=1), periods=prediction_days)
+
+            results[symbol] = pd.DataFrame({
+                'Date': future_dates,
+                'Price': last_close * np.exp(log_returns[i]),
+                'Lower': last_close * np.exp(log_returns[i] - z * std[i]),
+                'Upper': last_close * np.exp(log_returns[i] + z * std[i]),
+                'Model': 'Baseline-AR'
+            }).to_dict(orient='records')
+        return results
@@ -1,27 +1,64 @@
 
-import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from xgboost import XGBRegressor
+import hashlib
 import os
+import threading
+import time
 import joblib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, wait
+from .registry import data_fingerprint, fit_cache, load_fit_metadata, save_fit_metadata
 
 class EnsembleModel:
-    def __init__(self, models, weights=None):
+    MODEL_TYPE = 'ensemble'
+    # Forecasts the ensemble's own thread pool runs at once, across requests and refinements
+    CONCURRENT_FORECASTS = 8
+    # Seconds between checks for queued members that have started running
+    START_POLL_INTERVAL = 0.05
+    
+    def __init__(self, models, weights=None, registry=None, fallback=None,
+                 parallel=False, member_timeout=None, executor=None, max_workers=None):
         """
         Initialize the ensemble model with a list of models.
         
         Args:
             models: List of model objects that have predict method
             weights: Optional weights for each model (defaults to equal weights)
+            registry: ModelRegistry for per-symbol meta-models; symbols without
+                one use the shared meta-model
+            fallback: Fast model (e.g. BaselineModel) whose forecast stands in
+                for a member that fails to predict; without one, errors propagate
+            parallel: Run the members concurrently in threads, so a forecast takes
+                as long as the slowest member rather than the sum; TensorFlow,
+                Prophet's Stan backend and NumPy release the GIL while they compute
+            member_timeout: Seconds each member may run when they run concurrently,
+                counted from when it starts running rather than while it waits
+                behind other forecasts; a late member counts as failed
+            executor: concurrent.futures executor to run the members in instead
+                of the ensemble's own thread pool, e.g. a ProcessPoolExecutor when
+                every member can be pickled (ProphetModel, BaselineModel)
+            max_workers: Threads in the ensemble's own pool, shared by concurrent
+                requests (default: CONCURRENT_FORECASTS forecasts' worth of members)
         """
         self.models = models
+        self.registry = registry
+        self.fallback = fallback
+        self.parallel = parallel
+        self.member_timeout = member_timeout
+        self.executor = executor
+        self.max_workers = max_workers or len(models) * self.CONCURRENT_FORECASTS
+        self._thread_pool = None
+        self._executor_lock = threading.Lock()
+        # Background full forecasts started by predict_within, by (symbol, days, last bar)
+        self._refinement_pool = None
+        self._refining = {}
         self.meta_model = None
         self.meta_model_path = 'saved_models/ensemble_meta_model.pkl'
+        self.fingerprint = None
         
         # Try to load the meta-model if it exists
         try:
             self.meta_model = joblib.load(self.meta_model_path)
+            self.fingerprint = load_fit_metadata(self.meta_model_path).get('fingerprint')
             print("Loaded ensemble meta-model")
         except (OSError, IOError):
             print("Will create new ensemble meta-model during training")
@@ -34,9 +71,17 @@ class EnsembleModel:
             total = sum(weights)
             self.weights = [w/total for w in weights]
     
-    def train(self, data):
+    def train(self, data, symbol=None):
         """
         Train all models in the ensemble plus a meta-model for improved accuracy
+        
+        Args:
+            data: Historical stock data
+            symbol: Symbol the data belongs to; passed to the base models, and
+                with a registry the meta-model is published for that symbol
+        
+        Base models reuse fits on data they have already seen, and the
+        meta-model is not refitted when one was fitted on the same data.
         """
         # Train base models
         model_predictions = []
@@ -45,11 +90,23 @@ class EnsembleModel:
         train_data = data.iloc[:validation_start]
         valid_data = data.iloc[validation_start:]
         
-        # Train each base model and collect their predictions on validation data
         for model in self.models:
-            model.train(train_data)
-            preds = model.predict(train_data, prediction_days=len(valid_data))
-            model_predictions.append(pd.DataFrame(preds)['Price'].values)
+            model.train(train_data, symbol=symbol)
+        
+        fingerprint = data_fingerprint(data, models=[type(model).__name__ for model in self.models])
+        per_symbol = symbol is not None and self.registry is not None
+        if per_symbol and self.registry.reuse(self.MODEL_TYPE, symbol, fingerprint) is not None:
+            fit_cache.record(self.MODEL_TYPE, True, symbol, fingerprint)
+            return self
+        if not per_symbol and self.meta_model is not None and self.fingerprint == fingerprint:
+            fit_cache.record(self.MODEL_TYPE, True, fingerprint=fingerprint)
+            return self
+        fit_cache.record(self.MODEL_TYPE, False, symbol, fingerprint)
+        
+        # Collect the base models' predictions on validation data
+        for model in self.models:
+            preds = model.predict(train_data, prediction_days=len(valid_data), symbol=symbol)
+            model_predictions.append(_prices(preds))
         
         # Stack predictions as features
         meta_features = np.column_stack(model_predictions)
@@ -58,88 +115,377 @@ class EnsembleModel:
         meta_target = valid_data['Close'].values
         
         # Train a meta-model (XGBoost) to learn optimal combination
-        self.meta_model = XGBRegressor(
+        from xgboost import XGBRegressor
+        meta_model = XGBRegressor(
             n_estimators=100,
             learning_rate=0.05,
             max_depth=4,
             random_state=42
         )
         
-        self.meta_model.fit(meta_features, meta_target)
+        meta_model.fit(meta_features, meta_target)
+        
+        if per_symbol:
+            self.registry.publish(self.MODEL_TYPE, symbol,
+                                  lambda directory: joblib.dump(meta_model, os.path.join(directory, 'meta_model.pkl')),
+                                  fingerprint=fingerprint)
+            return self
         
         # Save the meta-model
+        self.meta_model = meta_model
+        self.fingerprint = fingerprint
         os.makedirs(os.path.dirname(self.meta_model_path), exist_ok=True)
         joblib.dump(self.meta_model, self.meta_model_path)
+        save_fit_metadata(self.meta_model_path, fingerprint=fingerprint)
         
         return self
     
-    def predict(self, data, prediction_days=30):
+    def _meta_model_for(self, symbol):
+        """The symbol's own meta-model from the registry, else the shared one"""
+        if symbol is not None and self.registry is not None:
+            meta_model, _ = self.registry.load(
+                self.MODEL_TYPE, symbol,
+                lambda directory, meta: joblib.load(os.path.join(directory, 'meta_model.pkl'))
+            )
+            if meta_model is not None:
+                return meta_model
+        return self.meta_model
+    
+    def version(self, symbol=None):
+        """
+        Short identifier of the models a symbol's forecast comes from
+        
+        Combines the registry version of each member and of the meta-model for
+        the symbol, or the data fingerprint of the shared model it falls back
+        to, so it changes whenever any of them is retrained.
+        """
+        parts = []
+        for model in list(self.models) + [self]:
+            model_type = getattr(model, 'model_type', getattr(model, 'MODEL_TYPE', type(model).__name__))
+            registry = getattr(model, 'registry', None)
+            version = None
+            if symbol is not None and registry is not None:
+                version = registry.current_version(model_type, symbol)
+            parts.append(f"{model_type}:{version or getattr(model, 'fingerprint', None)}")
+        return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()[:16]
+    
+    def _get_executor(self):
+        """The executor members run in: the one given, else the ensemble's own thread pool"""
+        if self.executor is not None:
+            return self.executor
+        with self._executor_lock:
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                       thread_name_prefix='ensemble-member')
+            return self._thread_pool
+    
+    def _wait_members(self, futures):
+        """
+        Wait for member futures, each for at most member_timeout after it starts running
+        
+        A member queued behind other forecasts is not charged for the wait; its
+        start is noticed within START_POLL_INTERVAL.
+        
+        Returns:
+            Set of the futures that ran out of time (they keep running in their
+            workers; their results are discarded)
+        """
+        started = {}
+        late = set()
+        pending = set(futures)
+        while pending:
+            now = time.perf_counter()
+            for future in pending:
+                if future not in started and future.running():
+                    started[future] = now
+            late.update(f for f in pending if f in started and now - started[f] >= self.member_timeout)
+            pending -= late
+            if not pending:
+                break
+            deadlines = [started[f] + self.member_timeout - now for f in pending if f in started]
+            if len(deadlines) < len(pending):
+                deadlines.append(self.START_POLL_INTERVAL)
+            _, pending = wait(pending, timeout=min(deadlines), return_when=FIRST_COMPLETED)
+        return late
+    
+    def _run_members(self, call, args, fallback_call):
+        """
+        Run one call per member, concurrently when enabled, within member_timeout
+        
+        Args:
+            call: Module-level function called as call(model, *args), returning
+                (result, seconds)
+            args: Arguments after the model
+            fallback_call: Function returning the fallback's (result, seconds), or
+                None when there is no fallback; a failed or late member gets its result
+        
+        Returns:
+            Tuple of (results in member order, per-member timing metadata)
+        """
+        started = time.perf_counter()
+        concurrent = self.parallel or self.executor is not None
+        late = set()
+        if concurrent:
+            executor = self._get_executor()
+            futures = [executor.submit(call, model, *args) for model in self.models]
+            if self.member_timeout is not None:
+                late = self._wait_members(futures)
+        
+        results = []
+        members = []
+        fallback_result = None
+        for i, model in enumerate(self.models):
+            name = type(model).__name__
+            try:
+                if not concurrent:
+                    result, seconds = call(model, *args)
+                elif futures[i] in late:
+                    raise TimeoutError(f"{name} did not finish within {self.member_timeout}s")
+                else:
+                    result, seconds = futures[i].result()
+                status = 'ok'
+            except Exception as e:
+                if fallback_call is None:
+                    raise
+                status = 'timeout' if isinstance(e, TimeoutError) else 'failed'
+                print(f"Error predicting with {name}, using {type(self.fallback).__name__}: {str(e)}")
+                if fallback_result is None:
+                    fallback_result = fallback_call()
+                result, seconds = fallback_result
+            results.append(result)
+            members.append({'model': name, 'status': status, 'seconds': round(seconds, 4)})
+        
+        metadata = {
+            'parallel': concurrent,
+            'members': members,
+            'seconds': round(time.perf_counter() - started, 4),
+        }
+        return results, metadata
+    
+    def predict(self, data, prediction_days=30, symbol=None, return_metadata=False):
         """
         Generate predictions using ensemble of models with smart weighting
         
         Args:
             data: Historical stock price data
             prediction_days: Number of days to predict
+            symbol: Symbol the data belongs to, so per-symbol models are used
+            return_metadata: Also return how long each member took and whether
+                it succeeded, failed or timed out
             
         Returns:
-            Dictionary with predictions
+            List of prediction records, or a tuple of (records, metadata) with
+            return_metadata
         """
-        # First, get individual model predictions
-        model_predictions = []
-        meta_input = None
+        fallback_call = None
+        if self.fallback is not None:
+            fallback_call = lambda: _timed_predict(self.fallback, data, prediction_days, symbol)
+        member_records, metadata = self._run_members(_timed_predict, (data, prediction_days, symbol), fallback_call)
         
-        # Get predictions from each model
-        for i, model in enumerate(self.models):
-            model_preds = model.predict(data, prediction_days)
-            model_predictions.append(pd.DataFrame(model_preds))
+        # If no models returned predictions
+        if not member_records:
+            return ([], metadata) if return_metadata else []
+        
+        # Dates from the first model (assuming all models predict for same dates),
+        # base model prices one column per model
+        dates = [record['Date'] for record in member_records[0]]
+        model_prices = np.column_stack([_prices(records) for records in member_records])
+        
+        predictions = self._combine(dates, model_prices, self._ensemble_prices(model_prices, self._meta_model_for(symbol)))
+        return (predictions, metadata) if return_metadata else predictions
+    
+    def _refinement(self, data, prediction_days, symbol):
+        """Future of the full forecast, joining one already running for the same history and horizon"""
+        # The last bar is part of the key, so a request made after a new bar never
+        # receives a forecast of the older history
+        key = (symbol, prediction_days, data.index[-1]) if symbol is not None and len(data) else None
+        with self._executor_lock:
+            future = self._refining.get(key) if key is not None else None
+            if future is not None:
+                return future
+            if self._refinement_pool is None:
+                self._refinement_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='ensemble-refine')
+            future = self._refinement_pool.submit(self.predict, data, prediction_days, symbol, True)
+            if key is not None:
+                self._refining[key] = future
+        
+        if key is not None:
+            # Called right away if already done; must not take _executor_lock
+            future.add_done_callback(lambda done: self._refining.pop(key, None) if self._refining.get(key) is done else None)
+        return future
+    
+    def is_refining(self, symbol, prediction_days=30, last_bar=None):
+        """
+        Whether a background full forecast for the symbol and horizon is running
+        
+        Args:
+            symbol: Stock symbol
+            prediction_days: Number of days forecast
+            last_bar: Date of the last bar of the history being forecast (default:
+                any history of the symbol)
+        """
+        if last_bar is not None:
+            return (symbol, prediction_days, last_bar) in self._refining
+        return any(key[:2] == (symbol, prediction_days) for key in list(self._refining))
+    
+    @staticmethod
+    def _deliver(future, on_refined):
+        """Pass a finished background forecast to on_refined, or None if it failed"""
+        try:
+            predictions, metadata = future.result()
+        except Exception as e:
+            print(f"Background ensemble forecast failed: {str(e)}")
+            on_refined(None, {'tier': 'failed', 'error': str(e)})
+            return
+        on_refined(predictions, dict(metadata, tier='full'))
+    
+    def predict_within(self, data, budget, prediction_days=30, symbol=None, on_refined=None, on_fast=None):
+        """
+        Best forecast available within a latency budget, refining it in the background
+        
+        The full forecast (all members and the meta-model) starts in a background
+        thread while the fallback model forecasts. If the full forecast finishes
+        within the budget it is returned; otherwise the fallback's forecast is,
+        and the full one keeps running and is passed to on_refined when it
+        finishes. Requests for a symbol, horizon and last bar already being
+        refined join that forecast instead of starting another.
+        
+        Args:
+            data: Historical stock price data
+            budget: Seconds the caller can wait
+            prediction_days: Number of days to predict
+            symbol: Symbol the data belongs to
+            on_refined: Function called with (predictions, metadata) when a full
+                forecast finishes after the budget; predictions is None if it failed
+            on_fast: Function called with the fast-tier (predictions, metadata)
+                when the budget runs out, before on_refined can be called, e.g.
+                to store the fast forecast so the refined one always replaces it
             
-            # Extract prices for meta-model input
-            if meta_input is None:
-                meta_input = np.array(pd.DataFrame(model_preds)['Price'].values).reshape(-1, 1)
-            else:
-                meta_input = np.hstack((
-                    meta_input, 
-                    np.array(pd.DataFrame(model_preds)['Price'].values).reshape(-1, 1)
-                ))
+        Returns:
+            Tuple of (predictions, metadata); metadata['tier'] is 'full' or 'fast'
+        """
+        if self.fallback is None:
+            raise ValueError("A latency budget requires a fallback model for the fast tier")
         
-        # If no models returned predictions
-        if not model_predictions:
-            return []
+        started = time.perf_counter()
+        future = self._refinement(data, prediction_days, symbol)
+        
+        # The fast tier is computed while the full forecast runs, so it is ready at the deadline
+        fast_predictions = self.fallback.predict(data, prediction_days, symbol=symbol)
+        fast_seconds = time.perf_counter() - started
+        
+        try:
+            predictions, metadata = future.result(timeout=max(budget - fast_seconds, 0))
+            return predictions, dict(metadata, tier='full', budget=budget,
+                                     seconds=round(time.perf_counter() - started, 4))
+        except FuturesTimeoutError:
+            refining = True
+        except Exception as e:
+            refining = False
+            print(f"Ensemble forecast failed, using {type(self.fallback).__name__}: {str(e)}")
+        
+        metadata = {
+            'tier': 'fast',
+            'budget': budget,
+            'refining': refining,
+            'members': [{'model': type(self.fallback).__name__, 'status': 'ok', 'seconds': round(fast_seconds, 4)}],
+            'seconds': round(time.perf_counter() - started, 4),
+        }
+        if refining:
+            if on_fast is not None:
+                on_fast(fast_predictions, metadata)
+            if on_refined is not None:
+                # Runs right away if the full forecast finished meanwhile, still after on_fast
+                future.add_done_callback(lambda done: self._deliver(done, on_refined))
+        return fast_predictions, metadata
+    
+    def predict_many(self, frames, prediction_days=30, return_metadata=False):
+        """
+        Generate ensemble predictions for several symbols at once
         
-        # Get dates from the first model (assuming all models predict for same dates)
-        dates = model_predictions[0]['Date']
+        Base models with a predict_many method (e.g. LSTMModel) forecast all
+        symbols in one batch; the others are called once per symbol. Each
+        meta-model then scores all the symbols using it in a single call.
+        With a fallback model, it forecasts the symbols a member failed on.
         
-        # Determine final predictions based on strategy
-        if self.meta_model is not None:
+        Args:
+            frames: Dictionary of symbol to historical data
+            prediction_days: Number of days to predict
+            return_metadata: Also return how long each member took for the whole
+                batch, in the format predict() returns
+            
+        Returns:
+            Dictionary of symbol to predictions in the format returned by predict();
+            symbols that any base model failed to predict are left out. With
+            return_metadata, a tuple of (that dictionary, metadata)
+        """
+        fallback_call = (lambda: ({}, 0.0)) if self.fallback is not None else None
+        member_predictions, metadata = self._run_members(_timed_predict_many, (frames, prediction_days), fallback_call)
+        member_predictions = [dict(predictions) for predictions in member_predictions]
+        
+        if self.fallback is not None:
+            # One batched fallback forecast for every symbol some member is missing
+            missing = [s for s in frames if any(s not in predictions for predictions in member_predictions)]
+            if missing:
+                fallback_predictions = self.fallback.predict_many({s: frames[s] for s in missing}, prediction_days)
+                for predictions in member_predictions:
+                    for symbol, records in fallback_predictions.items():
+                        predictions.setdefault(symbol, records)
+        
+        symbols = [s for s in frames if all(s in predictions for predictions in member_predictions)]
+        if not symbols or not member_predictions:
+            return ({}, metadata) if return_metadata else {}
+        
+        dates = {}
+        model_prices = {}
+        for symbol in symbols:
+            dates[symbol] = [record['Date'] for record in member_predictions[0][symbol]]
+            model_prices[symbol] = np.column_stack([_prices(predictions[symbol]) for predictions in member_predictions])
+        
+        # Score the symbols sharing a meta-model together, then split the result back per symbol
+        groups = {}
+        meta_models = {}
+        for symbol in symbols:
+            meta_model = self._meta_model_for(symbol)
+            meta_models[id(meta_model)] = meta_model
+            groups.setdefault(id(meta_model), []).append(symbol)
+        
+        results = {}
+        for meta_id, group in groups.items():
+            stacked_prices = self._ensemble_prices(np.vstack([model_prices[symbol] for symbol in group]), meta_models[meta_id])
+            offsets = np.cumsum([0] + [len(model_prices[symbol]) for symbol in group])
+            for i, symbol in enumerate(group):
+                results[symbol] = self._combine(dates[symbol], model_prices[symbol], stacked_prices[offsets[i]:offsets[i + 1]])
+        results = {symbol: results[symbol] for symbol in symbols}
+        return (results, metadata) if return_metadata else results
+    
+    def _ensemble_prices(self, model_prices, meta_model=None):
+        """Combine base model prices (one column per model) into ensemble prices"""
+        if meta_model is not None:
             # Use meta-model for final predictions
-            ensemble_prices = self.meta_model.predict(meta_input)
-        else:
-            # Use weighted average as fallback
-            ensemble_prices = np.zeros(len(dates))
-            for i, predictions_df in enumerate(model_predictions):
-                ensemble_prices += predictions_df['Price'].values * self.weights[i]
+            return meta_model.predict(model_prices)
         
+        # Use weighted average as fallback
+        return model_prices @ np.asarray(self.weights)
+    
+    def _combine(self, dates, model_prices, ensemble_prices):
+        """Build the prediction records for one symbol from base model and ensemble prices"""
         # Calculate confidence intervals (tighter than individual models)
         # Use the standard deviation of base model predictions as uncertainty measure
-        model_prices = np.column_stack([df['Price'].values for df in model_predictions])
         prediction_std = np.std(model_prices, axis=1)
         
+        ensemble_prices = np.asarray(ensemble_prices, dtype=float)
         lower_bounds = ensemble_prices - 1.96 * prediction_std
         upper_bounds = ensemble_prices + 1.96 * prediction_std
         
-        # Create final predictions dataframe
-        ensemble_predictions = pd.DataFrame({
-            'Date': dates,
-            'Price': ensemble_prices,
-            'Lower': lower_bounds,
-            'Upper': upper_bounds,
-            'Model': 'Advanced Ensemble'
-        })
-        
         # Log prediction quality metrics
         self._log_prediction_quality(model_prices, ensemble_prices)
         
-        return ensemble_predictions.to_dict(orient='records')
+        # Records straight from the arrays, without an intermediate DataFrame
+        return [
+            {'Date': date, 'Price': price, 'Lower': lower, 'Upper': upper, 'Model': 'Advanced Ensemble'}
+            for date, price, lower, upper in zip(dates, ensemble_prices.tolist(), lower_bounds.tolist(), upper_bounds.tolist())
+        ]
     
     def _log_prediction_quality(self, model_predictions, ensemble_predictions):
         """Log metrics about prediction quality and model agreement"""
@@ -151,3 +497,35 @@ class EnsembleModel:
         print(f"Model Agreement: {'High' if cv < 5 else 'Medium' if cv < 10 else 'Low'}")
         print(f"Average Variation: {cv:.2f}%")
         print(f"Max Prediction Difference: {np.max(std_prices)/np.mean(mean_prices)*100:.2f}%")
+
+
+def _prices(records):
+    """Price column of a model's prediction records as an array"""
+    return np.fromiter((record['Price'] for record in records), dtype=float, count=len(records))
+
+
+def _timed_predict(model, data, prediction_days, symbol):
+    """A member's predictions and the seconds they took (module level, so process pools can run it)"""
+    started = time.perf_counter()
+    predictions = model.predict(data, prediction_days, symbol=symbol)
+    return predictions, time.perf_counter() - started
+
+
+def _timed_predict_many(model, frames, prediction_days):
+    """
+    A member's predictions for several symbols and the seconds they took
+    
+    Members without predict_many are called once per symbol; symbols they fail
+    on are left out.
+    """
+    started = time.perf_counter()
+    if hasattr(model, 'predict_many'):
+        return model.predict_many(frames, prediction_days), time.perf_counter() - started
+    
+    predictions = {}
+    for symbol, data in frames.items():
+        try:
+            predictions[symbol] = model.predict(data, prediction_days, symbol=symbol)
+        except Exception as e:
+            print(f"Error predicting {symbol} with {type(model).__name__}: {str(e)}")
+    return predictions, time.perf_counter() - started
@@ -2,46 +2,143 @@
 import numpy as np
 import pandas as pd
 from sklearn.preprocessing import MinMaxScaler
-from tensorflow.keras.models import Sequential, Model
-from tensorflow.keras.layers import LSTM, Dense, Dropout, Input, Conv1D, MaxPooling1D, Attention, concatenate, UpSampling1D
-from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau
-from tensorflow.keras.optimizers import Adam
-import tensorflow as tf
 import joblib
+import hashlib
 import os
+import shutil
+import sys
+import tempfile
+from data.preprocessor import sliding_windows
+from data.window_dataset import WindowDataset
+from .numpy_runtime import NumpyModel, export_keras_model
+from .registry import data_fingerprint, fit_cache, load_fit_metadata, save_fit_metadata
+
+# TensorFlow is imported only when a Keras model is built, loaded or trained,
+# so processes serving an exported model never load it
 
 class LSTMModel:
-    def __init__(self, window_size=60, epochs=100, batch_size=32, attention=True, n_layers=3):
+    MODES = ('recursive', 'direct')
+    RUNTIMES = ('auto', 'keras', 'numpy')
+    
+    def __init__(self, window_size=60, epochs=100, batch_size=32, attention=True, n_layers=3,
+                 mode='recursive', horizon=30, runtime='auto', registry=None):
+        """
+        Args:
+            window_size: Number of past days the model sees
+            epochs: Maximum training epochs
+            batch_size: Training batch size
+            attention: Use the attention architecture instead of stacked LSTMs
+            n_layers: Number of LSTM layers
+            mode: 'recursive' predicts one day per forward pass and feeds it back;
+                'direct' predicts the next `horizon` days in one forward pass
+            horizon: Days predicted per forward pass in direct mode
+            runtime: Inference runtime: 'keras', 'numpy' (the exported model,
+                without TensorFlow), or 'auto' to use the exported model when it
+                is up to date and TensorFlow has not been imported yet
+            registry: ModelRegistry for per-symbol models; symbols without one
+                are predicted with the shared model
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown LSTM mode '{mode}'. Choose from: {', '.join(self.MODES)}")
+        if runtime not in self.RUNTIMES:
+            raise ValueError(f"Unknown LSTM runtime '{runtime}'. Choose from: {', '.join(self.RUNTIMES)}")
+        
         self.window_size = window_size
         self.epochs = epochs
         self.batch_size = batch_size
         self.model = None
+        self.numpy_model = None
+        self.fingerprint = None
         self.scaler = MinMaxScaler(feature_range=(0, 1))
-        self.model_path = 'saved_models/lstm_model'
-        self.scaler_path = 'saved_models/lstm_scaler.pkl'
+        self.mode = mode
+        self.runtime = runtime
+        self.horizon = horizon if mode == 'direct' else 1
+        self.registry = registry
+        self.model_type = 'lstm_direct' if mode == 'direct' else 'lstm'
+        # Direct models have a different output layer, so they are saved separately
+        if mode == 'direct':
+            self.model_path = 'saved_models/lstm_direct_model'
+            self.scaler_path = 'saved_models/lstm_direct_scaler.pkl'
+        else:
+            self.model_path = 'saved_models/lstm_model'
+            self.scaler_path = 'saved_models/lstm_scaler.pkl'
+        self.export_path = f"{self.model_path}.npz"
         self.use_attention = attention
         self.n_layers = n_layers
+        self._forward = None
+        self._forward_model = None
         
         # Try to load pretrained model if exists
         self._load_or_create_model()
 
     def _load_or_create_model(self):
+        if self._use_numpy_runtime():
+            try:
+                self._load_exported_model()
+                print("Loaded exported LSTM model (NumPy runtime)")
+                return
+            except (OSError, IOError, ValueError) as e:
+                if self.runtime == 'numpy':
+                    raise ValueError(f"Cannot use the NumPy runtime: {e}")
+                print(f"Not using exported LSTM model: {e}")
+        
+        self._load_or_create_keras_model()
+    
+    def _use_numpy_runtime(self):
+        if self.runtime != 'auto':
+            return self.runtime == 'numpy'
+        if 'tensorflow' in sys.modules or not os.path.exists(self.export_path):
+            return False
+        # An export older than the Keras model predates its last training
+        return not os.path.exists(self.model_path) or os.path.getmtime(self.export_path) >= os.path.getmtime(self.model_path)
+    
+    def _load_exported_model(self):
+        """Load the exported model and scaler for the NumPy runtime"""
+        numpy_model = NumpyModel.load(self.export_path)
+        if numpy_model.output_width != self.horizon:
+            raise ValueError(f"exported model predicts {numpy_model.output_width} days, not {self.horizon}")
+        self.scaler = joblib.load(self.scaler_path)
+        self.numpy_model = numpy_model
+        self.fingerprint = load_fit_metadata(self.model_path).get('fingerprint')
+    
+    def _load_or_create_keras_model(self):
+        import tensorflow as tf
+        
         try:
             self.model = tf.keras.models.load_model(self.model_path)
             self.scaler = joblib.load(self.scaler_path)
+            self.fingerprint = load_fit_metadata(self.model_path).get('fingerprint')
             print("Loaded pretrained LSTM model")
         except (OSError, IOError):
             print("Creating new LSTM model")
             self.model = self._build_model()
+            return
+        
+        if self.model.output_shape[-1] != self.horizon:
+            print(f"Saved LSTM model predicts {self.model.output_shape[-1]} days, not {self.horizon}; creating new model")
+            self.model = self._build_model()
+            self.fingerprint = None
     
     def _build_model(self):
+        if self.mode == 'direct':
+            return self._build_direct_model(self.horizon)
         if self.use_attention:
             return self._build_attention_model()
         else:
             return self._build_vanilla_model()
     
-    def _build_vanilla_model(self):
+    def _build_direct_model(self, horizon):
+        """Build a model whose output layer predicts the next `horizon` days at once"""
+        if self.use_attention:
+            return self._build_attention_model(outputs=horizon)
+        return self._build_vanilla_model(outputs=horizon)
+    
+    def _build_vanilla_model(self, outputs=1):
         """Build a standard LSTM model"""
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import LSTM, Dense, Dropout
+        from tensorflow.keras.optimizers import Adam
+        
         model = Sequential()
         model.add(LSTM(units=100, return_sequences=True, input_shape=(self.window_size, 4)))
         model.add(Dropout(0.2))
@@ -49,14 +146,18 @@ class LSTMModel:
         model.add(Dropout(0.2))
         model.add(LSTM(units=100))
         model.add(Dropout(0.2))
-        model.add(Dense(units=1))
+        model.add(Dense(units=outputs))
         
         optimizer = Adam(learning_rate=0.001)
         model.compile(optimizer=optimizer, loss='mean_squared_error', metrics=['mae'])
         return model
     
-    def _build_attention_model(self):
+    def _build_attention_model(self, outputs=1):
         """Build an advanced LSTM model with attention mechanism for improved accuracy"""
+        from tensorflow.keras.models import Model
+        from tensorflow.keras.layers import LSTM, Dense, Dropout, Input, Conv1D, MaxPooling1D, Attention, concatenate, UpSampling1D
+        from tensorflow.keras.optimizers import Adam
+        
         # Input layer
         input_layer = Input(shape=(self.window_size, 4))
         
@@ -85,7 +186,7 @@ class LSTMModel:
         lstm3 = Dropout(0.2)(lstm3)
         
         # Output layer
-        output = Dense(units=1)(lstm3)
+        output = Dense(units=outputs)(lstm3)
         
         # Create model
         model = Model(inputs=input_layer, outputs=output)
@@ -96,8 +197,14 @@ class LSTMModel:
         
         return model
     
-    def _prepare_features(self, data):
-        """Prepare features for model training - enhanced with technical indicators"""
+    def _prepare_features(self, data, scaler=None):
+        """
+        Prepare features for model training - enhanced with technical indicators
+        
+        Args:
+            data: Historical stock data
+            scaler: Scaler to fit on the features (default: the model's own scaler)
+        """
         # Start with the Close price
         features = data['Close'].values.reshape(-1, 1)
         
@@ -117,24 +224,59 @@ class LSTMModel:
                 features = np.hstack((features, indicator_data))
         
         # Scale all features
-        scaled_features = self.scaler.fit_transform(features)
+        scaler = self.scaler if scaler is None else scaler
+        scaled_features = scaler.fit_transform(features)
         
         return scaled_features
     
-    def train(self, data):
-        """Train the LSTM model with stock price data and technical indicators"""
-        # Prepare multi-feature input
-        scaled_data = self._prepare_features(data)
+    def train(self, data, symbol=None):
+        """
+        Train the LSTM model with stock price data and technical indicators
+        
+        Args:
+            data: Historical stock data
+            symbol: Symbol the data belongs to; with a registry, a new model is
+                fitted and published as that symbol's new version instead of
+                training the shared model
+        
+        A model already fitted on data with the same fingerprint (and the same
+        model settings) is reused instead of training again.
+        
+        Returns:
+            The Keras model, also when it is a reused registry version
+        """
+        fingerprint = data_fingerprint(data, **self._fit_params())
+        per_symbol = symbol is not None and self.registry is not None
+        version = self.registry.reuse(self.model_type, symbol, fingerprint) if per_symbol else None
+        if version is not None:
+            fit_cache.record(self.model_type, True, symbol, fingerprint)
+            import tensorflow as tf
+            return tf.keras.models.load_model(os.path.join(self.registry.version_dir(self.model_type, symbol, version), 'model'))
+        if not per_symbol and self._is_fitted_on(fingerprint):
+            fit_cache.record(self.model_type, True, fingerprint=fingerprint)
+            return self.model
+        fit_cache.record(self.model_type, False, symbol, fingerprint)
+        
+        from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau
+        
+        if per_symbol:
+            model = self._build_model()
+            scaler = MinMaxScaler(feature_range=(0, 1))
+        else:
+            # Training always uses Keras, even when predictions use the NumPy runtime
+            if self.model is None:
+                self._load_or_create_keras_model()
+            model, scaler = self.model, self.scaler
         
-        # Create training sequences
-        X_train, y_train = [], []
+        # Prepare multi-feature input
+        scaled_data = self._prepare_features(data, scaler)
         
-        for i in range(self.window_size, len(scaled_data)):
-            X_train.append(scaled_data[i-self.window_size:i])
-            # Target is always the first column (Close price)
-            y_train.append(scaled_data[i, 0])
-            
-        X_train, y_train = np.array(X_train), np.array(y_train)
+        # Create training sequences; the target is always the first column (Close price),
+        # for the next `horizon` days in direct mode. The windows are views of
+        # scaled_data, materialized once in the model's float32
+        X_train, y_train = sliding_windows(scaled_data, self.window_size, target_col=0, horizon=self.horizon)
+        X_train = np.ascontiguousarray(X_train, dtype=np.float32)
+        y_train = np.ascontiguousarray(y_train, dtype=np.float32)
         
         # Define callbacks for better training
         callbacks = [
@@ -143,7 +285,7 @@ class LSTMModel:
         ]
         
         # Train the model with validation split
-        self.model.fit(
+        model.fit(
             X_train, y_train, 
             epochs=self.epochs, 
             batch_size=self.batch_size, 
@@ -152,52 +294,283 @@ class LSTMModel:
             verbose=1
         )
         
-        # Save the model and scaler
+        if per_symbol:
+            self.registry.publish(self.model_type, symbol, lambda directory: self._write_artifacts(model, directory),
+                                  fingerprint=fingerprint)
+            return model
+        
+        self._save_trained_model(fingerprint)
+        return self.model
+    
+    def _fit_params(self):
+        """Settings that change what a fit produces, part of the training data fingerprint"""
+        return {
+            'window_size': self.window_size, 'epochs': self.epochs, 'batch_size': self.batch_size,
+            'attention': self.use_attention, 'n_layers': self.n_layers, 'mode': self.mode, 'horizon': self.horizon,
+        }
+    
+    def _is_fitted_on(self, fingerprint):
+        """Whether the shared model in use was trained on data with this fingerprint"""
+        return (self.model is not None or self.numpy_model is not None) and self.fingerprint == fingerprint
+    
+    @staticmethod
+    def _write_artifacts(model, directory):
+        """Registry artifacts: the Keras model and its export for the NumPy runtime"""
+        model.save(os.path.join(directory, 'model'))
+        export_keras_model(model, os.path.join(directory, 'model.npz'))
+    
+    def _read_artifacts(self, directory, meta):
+        """Forward function of a registry model, in the NumPy runtime unless runtime is 'keras'"""
+        export_path = os.path.join(directory, 'model.npz')
+        if self.runtime != 'keras' and os.path.exists(export_path):
+            return NumpyModel.load(export_path)
+        
+        import tensorflow as tf
+        return self._compile(tf.keras.models.load_model(os.path.join(directory, 'model')))
+    
+    def _symbol_forward(self, symbol):
+        """Forward function of a symbol's own model, or None to use the shared model"""
+        if symbol is None or self.registry is None:
+            return None
+        forward, _ = self.registry.load(self.model_type, symbol, self._read_artifacts)
+        return forward
+    
+    def train_many(self, frames, feature_dir=None, validation_split=0.2, seed=None):
+        """
+        Train one model on the histories of many symbols
+        
+        Each symbol's features are scaled with a scaler of its own (as in
+        predict_many) and written to a memory-mapped float32 array, so only one
+        history is in memory at a time. Training then streams shuffled batches
+        of windows from all symbols through a prefetching tf.data pipeline
+        (see WindowDataset) instead of materializing every window.
+        
+        Args:
+            frames: Dictionary of symbol to historical data, or an iterable of
+                (symbol, data) pairs, e.g. a generator reading the history cache
+            feature_dir: Directory to keep the feature arrays in for later runs
+                (default: a temporary directory removed after training)
+            validation_split: Fraction of each symbol's latest windows used for validation
+            seed: Seed for the order in which windows are visited
+        
+        Training is skipped when the shared model was already trained on the
+        same symbols with the same data fingerprints.
+        """
+        from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau
+        
+        if self.model is None:
+            self._load_or_create_keras_model()
+        n_inputs = self.model.input_shape[-1]
+        
+        directory = feature_dir or tempfile.mkdtemp(prefix='lstm_features_')
+        try:
+            symbols = []
+            combined = hashlib.sha256()
+            for symbol, data in (frames.items() if hasattr(frames, 'items') else frames):
+                combined.update(f"{symbol}:{data_fingerprint(data, **self._fit_params())};".encode('utf-8'))
+                features = self._prepare_features(data, MinMaxScaler(feature_range=(0, 1)))
+                if features.shape[1] != n_inputs:
+                    print(f"Skipping LSTM training data for {symbol}: {features.shape[1]} features, model expects {n_inputs}")
+                    continue
+                WindowDataset.save_features(directory, symbol, features)
+                symbols.append(symbol)
+            
+            fingerprint = combined.hexdigest()
+            if self._is_fitted_on(fingerprint):
+                fit_cache.record(self.model_type, True, f"{len(symbols)} symbols", fingerprint)
+                return self.model
+            fit_cache.record(self.model_type, False, f"{len(symbols)} symbols", fingerprint)
+            
+            dataset = WindowDataset.from_directory(
+                directory, symbols, window=self.window_size, horizon=self.horizon,
+                batch_size=self.batch_size, validation_split=validation_split, seed=seed
+            )
+            print(f"Training LSTM on {dataset.size('train')} windows from {len(dataset.symbols)} symbols")
+            
+            validation = dataset.to_tf_dataset('validation') if dataset.size('validation') else None
+            monitor = 'val_loss' if validation is not None else 'loss'
+            self.model.fit(
+                dataset.to_tf_dataset('train'),
+                validation_data=validation,
+                epochs=self.epochs,
+                callbacks=[
+                    EarlyStopping(patience=20, monitor=monitor, restore_best_weights=True),
+                    ReduceLROnPlateau(monitor=monitor, factor=0.5, patience=5, min_lr=0.0001)
+                ],
+                verbose=1
+            )
+        finally:
+            if feature_dir is None:
+                shutil.rmtree(directory, ignore_errors=True)
+        
+        self._save_trained_model(fingerprint)
+        return self.model
+    
+    def _save_trained_model(self, fingerprint=None):
+        # Save the model and scaler, with the fingerprint of the training data next to them
         os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
         self.model.save(self.model_path)
         joblib.dump(self.scaler, self.scaler_path)
+        save_fit_metadata(self.model_path, fingerprint=fingerprint)
+        self.fingerprint = fingerprint
         
-        return self.model
+        # Keep the exported copy in step, and predict with the new weights
+        self.export()
+        if self.numpy_model is not None:
+            self.numpy_model = NumpyModel.load(self.export_path)
     
-    def predict(self, data, prediction_days=30):
-        """Generate predictions for the next prediction_days using the trained model"""
+    def export(self, path=None):
+        """
+        Export the Keras model for the NumPy runtime
+        
+        Args:
+            path: Destination file (default: export_path)
+        """
         if self.model is None:
-            raise ValueError("Model not trained yet. Call train() first.")
+            self._load_or_create_keras_model()
+        export_keras_model(self.model, path or self.export_path)
+    
+    def _forward_fn(self):
+        """
+        Forward pass of the model in use, taking and returning NumPy arrays
+        
+        The NumPy runtime is called directly; a Keras model runs as a
+        tf.function, traced once per input shape.
+        """
+        if self.numpy_model is not None:
+            return self.numpy_model
+        
+        if self._forward is None or self._forward_model is not self.model:
+            self._forward = self._compile(self.model)
+            self._forward_model = self.model
+        return self._forward
+    
+    @staticmethod
+    def _compile(model):
+        """A Keras model as a function of NumPy arrays, traced once per input shape"""
+        import tensorflow as tf
         
-        # Prepare features with enhanced indicators
-        features = self._prepare_features(data)
+        compiled = tf.function(lambda x: model(x, training=False), reduce_retracing=True)
+        return lambda x: compiled(tf.constant(x)).numpy()
+    
+    def _rollout(self, window, prediction_days, forward=None):
+        """
+        Autoregressive forecast of the scaled Close price
+        
+        The rows fed to the model live in one buffer preallocated for the whole
+        rollout: each step reads the last window_size rows and writes its
+        predictions to the rows that follow, so no window is rebuilt per step.
+        Features other than Close keep their last known values. A step predicts
+        one day in recursive mode and `horizon` days in direct mode, so a direct
+        forecast up to the horizon is a single forward pass. Each step is one
+        forward pass for every window in the batch, compiled with tf.function
+        or run by the NumPy runtime.
+        
+        Args:
+            window: Scaled features of the last window_size days, or a batch of
+                such windows with shape (symbols, window_size, features)
+            prediction_days: Number of days to predict
+            forward: Forward function to use (default: the shared model's)
+            
+        Returns:
+            Array of scaled Close predictions, with shape (symbols, prediction_days)
+            for a batch
+        """
+        windows = window if window.ndim == 3 else window[np.newaxis]
+        steps = -(-prediction_days // self.horizon)
+        buffer = np.empty((len(windows), self.window_size + steps * self.horizon, windows.shape[-1]), dtype=np.float32)
+        buffer[:, :self.window_size] = windows
+        buffer[:, self.window_size:] = windows[:, -1:]
+        
+        if forward is None:
+            forward = self._forward_fn()
+        for step in range(steps):
+            start = step * self.horizon
+            output = forward(buffer[:, start:start + self.window_size])
+            buffer[:, self.window_size + start:self.window_size + start + self.horizon, 0] = output
+        
+        predictions = buffer[:, self.window_size:self.window_size + prediction_days, 0]
+        return predictions if window.ndim == 3 else predictions[0]
+    
+    def predict(self, data, prediction_days=30, symbol=None):
+        """
+        Generate predictions for the next prediction_days using the trained model
+        
+        Args:
+            data: Historical stock data
+            prediction_days: Number of days to predict
+            symbol: Symbol the data belongs to; with a registry, that symbol's
+                current model is used if it has one
+        """
+        forward = self._symbol_forward(symbol)
+        if forward is None and self.model is None and self.numpy_model is None:
+            raise ValueError("Model not trained yet. Call train() first.")
         
-        # Get the last window_size days of data for initial prediction
-        input_data = features[-self.window_size:]
+        # Prepare features with enhanced indicators; a scaler of this call's own,
+        # as predictions for different symbols can run concurrently
+        scaler = MinMaxScaler(feature_range=(0, 1))
+        features = self._prepare_features(data, scaler)
         
-        # Make future predictions
-        predictions = []
-        current_batch = input_data.reshape(1, self.window_size, features.shape[1])
+        # Roll the model forward from the last window_size days
+        predictions = self._rollout(features[-self.window_size:], prediction_days, forward)
         
-        for _ in range(prediction_days):
-            # Predict the next day
-            next_pred = self.model.predict(current_batch, verbose=0)[0, 0]
-            predictions.append(next_pred)
-            
-            # Create next feature set (most features will be impossible to predict accurately)
-            # So we'll make a simple assumption for the additional features
-            next_features = np.zeros((1, features.shape[1]))
-            next_features[0, 0] = next_pred  # Close price
-            
-            # For other features, just use the last known values
-            for j in range(1, features.shape[1]):
-                next_features[0, j] = current_batch[0, -1, j]
+        return self._format_predictions(data, predictions, scaler, features.shape[1])
+    
+    def predict_many(self, frames, prediction_days=30):
+        """
+        Generate predictions for several symbols at once
+        
+        The windows of all symbols are stacked into one batch, so each day of the
+        rollout is a single forward pass for every symbol. Each symbol's features
+        are scaled with a scaler of its own. With a registry, symbols that have a
+        model of their own are rolled out with it, the rest share one batch.
+        
+        Args:
+            frames: Dictionary of symbol to historical data
+            prediction_days: Number of days to predict
             
-            # Update the batch to include the new prediction
-            current_batch = np.append(current_batch[:, 1:, :], next_features.reshape(1, 1, features.shape[1]), axis=1)
+        Returns:
+            Dictionary of symbol to predictions in the format returned by predict();
+            symbols with less than window_size days of data are left out
+        """
+        prepared = {}
+        for symbol, data in frames.items():
+            scaler = MinMaxScaler(feature_range=(0, 1))
+            features = self._prepare_features(data, scaler)
+            if len(features) < self.window_size:
+                print(f"Skipping LSTM prediction for {symbol}: {len(features)} days of data, need {self.window_size}")
+                continue
+            prepared[symbol] = (features, scaler)
+        
+        # Only windows with the same model and number of features can share a batch
+        batches = {}
+        forwards = {}
+        for symbol, (features, _) in prepared.items():
+            forward = self._symbol_forward(symbol)
+            if forward is None and self.model is None and self.numpy_model is None:
+                raise ValueError("Model not trained yet. Call train() first.")
+            forwards[id(forward)] = forward
+            batches.setdefault((id(forward), features.shape[1]), []).append(symbol)
+        
+        results = {}
+        for (forward_id, _), symbols in batches.items():
+            windows = np.stack([prepared[symbol][0][-self.window_size:] for symbol in symbols])
+            for symbol, predictions in zip(symbols, self._rollout(windows, prediction_days, forwards[forward_id])):
+                features, scaler = prepared[symbol]
+                results[symbol] = self._format_predictions(frames[symbol], predictions, scaler, features.shape[1])
+        return results
+    
+    def _format_predictions(self, data, predictions, scaler, n_features):
+        """Convert scaled Close predictions to prices with dates and confidence intervals"""
+        prediction_days = len(predictions)
         
         # Convert predictions back to original scale (focusing on Close price column)
         # Create an array with zeros for all columns except Close price
-        inverse_predictions = np.zeros((len(predictions), features.shape[1]))
+        inverse_predictions = np.zeros((len(predictions), n_features))
         inverse_predictions[:, 0] = predictions  # Set Close price column
         
         # Inverse transform to get actual prices
-        predicted_prices = self.scaler.inverse_transform(inverse_predictions)[:, 0]
+        predicted_prices = scaler.inverse_transform(inverse_predictions)[:, 0]
         
         # Create dates for predictions (assuming business days)
         last_date = pd.to_datetime(data.index[-1])
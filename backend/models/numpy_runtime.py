@@ -0,0 +1,316 @@
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+
+def _sigmoid(x):
+    # Written with tanh so large negative inputs do not overflow exp
+    return 0.5 * (np.tanh(0.5 * x) + 1.0)
+
+
+def _softmax(x, axis=-1):
+    e = np.exp(x - np.max(x, axis=axis, keepdims=True))
+    return e / np.sum(e, axis=axis, keepdims=True)
+
+
+ACTIVATIONS = {
+    None: lambda x: x,
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'tanh': np.tanh,
+    'sigmoid': _sigmoid,
+    'softmax': _softmax,
+}
+
+
+def _activation(spec):
+    """Activation function from a Keras config value (a name, or a serialized dict in Keras 3)"""
+    if isinstance(spec, dict):
+        spec = spec.get('config', {}).get('name') or spec.get('class_name')
+    try:
+        return ACTIVATIONS[spec]
+    except KeyError:
+        raise ValueError(f"Unsupported activation '{spec}'")
+
+
+def _single(value):
+    """Keras stores kernel sizes, strides and pool sizes as ints or 1-element lists"""
+    return value[0] if isinstance(value, (list, tuple)) else value
+
+
+def _lstm(inputs, config, weights, kwargs):
+    if config.get('go_backwards') or config.get('stateful'):
+        raise ValueError("Unsupported LSTM options: go_backwards/stateful")
+    x = inputs[0]
+    kernel, recurrent_kernel = weights[0], weights[1]
+    bias = weights[2] if config.get('use_bias', True) else 0.0
+    activation = _activation(config.get('activation', 'tanh'))
+    recurrent_activation = _activation(config.get('recurrent_activation', 'sigmoid'))
+    units = recurrent_kernel.shape[0]
+
+    # The input projection of every timestep is one matrix product
+    projected = x @ kernel + bias
+    h = np.zeros((x.shape[0], units), dtype=x.dtype)
+    c = np.zeros((x.shape[0], units), dtype=x.dtype)
+    sequence = np.empty((x.shape[0], x.shape[1], units), dtype=x.dtype) if config.get('return_sequences') else None
+
+    # Gates are packed in Keras order: input, forget, cell, output
+    for t in range(x.shape[1]):
+        z = projected[:, t] + h @ recurrent_kernel
+        i = recurrent_activation(z[:, :units])
+        f = recurrent_activation(z[:, units:2 * units])
+        g = activation(z[:, 2 * units:3 * units])
+        o = recurrent_activation(z[:, 3 * units:])
+        c = f * c + i * g
+        h = o * activation(c)
+        if sequence is not None:
+            sequence[:, t] = h
+    return sequence if sequence is not None else h
+
+
+def _dense(inputs, config, weights, kwargs):
+    y = inputs[0] @ weights[0]
+    if config.get('use_bias', True):
+        y = y + weights[1]
+    return _activation(config.get('activation'))(y)
+
+
+def _conv1d(inputs, config, weights, kwargs):
+    x = inputs[0]
+    if config.get('data_format', 'channels_last') != 'channels_last' or config.get('groups', 1) != 1:
+        raise ValueError("Unsupported Conv1D options: only channels_last without groups")
+    kernel = weights[0]
+    size = kernel.shape[0]
+    stride = _single(config.get('strides', 1))
+    dilation = _single(config.get('dilation_rate', 1))
+    span = (size - 1) * dilation + 1
+    padding = config.get('padding', 'valid')
+
+    length = x.shape[1]
+    if padding == 'same':
+        out_length = -(-length // stride)
+        total = max((out_length - 1) * stride + span - length, 0)
+        x = np.pad(x, ((0, 0), (total // 2, total - total // 2), (0, 0)))
+    elif padding == 'causal':
+        x = np.pad(x, ((0, 0), (span - 1, 0), (0, 0)))
+
+    # (batch, steps, channels, span) windows, keeping every dilation-th tap
+    windows = np.lib.stride_tricks.sliding_window_view(x, span, axis=1)[:, ::stride, :, ::dilation]
+    y = np.einsum('btck,kcf->btf', windows, kernel)
+    if config.get('use_bias', True):
+        y = y + weights[1]
+    return _activation(config.get('activation'))(y)
+
+
+def _max_pooling1d(inputs, config, weights, kwargs):
+    x = inputs[0]
+    pool = _single(config.get('pool_size', 2))
+    stride = _single(config.get('strides') or pool)
+    if config.get('padding', 'valid') == 'same':
+        out_length = -(-x.shape[1] // stride)
+        total = max((out_length - 1) * stride + pool - x.shape[1], 0)
+        x = np.pad(x, ((0, 0), (total // 2, total - total // 2), (0, 0)), constant_values=-np.inf)
+    windows = np.lib.stride_tricks.sliding_window_view(x, pool, axis=1)[:, ::stride]
+    return windows.max(axis=-1)
+
+
+def _up_sampling1d(inputs, config, weights, kwargs):
+    return np.repeat(inputs[0], config.get('size', 2), axis=1)
+
+
+def _concatenate(inputs, config, weights, kwargs):
+    return np.concatenate(inputs, axis=config.get('axis', -1))
+
+
+def _attention(inputs, config, weights, kwargs):
+    """Dot-product (Luong) or additive ('concat') attention as in keras.layers.Attention"""
+    query, value = inputs[0], inputs[1]
+    key = inputs[2] if len(inputs) > 2 else value
+    remaining = list(weights)
+    scale = remaining.pop(0) if config.get('use_scale') else None
+
+    if config.get('score_mode', 'dot') == 'concat':
+        concat_weight = remaining.pop(0)
+        summed = query[:, :, np.newaxis, :] + key[:, np.newaxis, :, :]
+        if scale is not None:
+            summed = scale * summed
+        scores = concat_weight * np.sum(np.tanh(summed), axis=-1)
+    else:
+        scores = query @ key.transpose(0, 2, 1)
+        if scale is not None:
+            scores = scores * scale
+
+    if kwargs.get('use_causal_mask') or config.get('causal'):
+        future = np.triu(np.ones(scores.shape[-2:], dtype=bool), k=1)
+        scores = np.where(future, -np.inf, scores)
+    return _softmax(scores) @ value
+
+
+LAYERS = {
+    'LSTM': _lstm,
+    'Dense': _dense,
+    'Conv1D': _conv1d,
+    'MaxPooling1D': _max_pooling1d,
+    'UpSampling1D': _up_sampling1d,
+    'Concatenate': _concatenate,
+    'Attention': _attention,
+    'Dropout': lambda inputs, config, weights, kwargs: inputs[0],
+    'Activation': lambda inputs, config, weights, kwargs: _activation(config.get('activation'))(inputs[0]),
+}
+
+
+def _inbound_layers(node):
+    """Names of the layers feeding one call, from a Keras 2 or Keras 3 inbound node"""
+    if isinstance(node, dict):
+        history = node.get('config', {}).get('keras_history')
+        if history is not None:
+            # Keras 3 tensor: {'class_name': '__keras_tensor__', 'config': {'keras_history': [name, node, index]}}
+            return [history[0]]
+        # Keras 3 call: {'args': [...], 'kwargs': {...}}
+        return [name for arg in node.get('args', []) for name in _inbound_layers(arg)]
+    if isinstance(node, (list, tuple)):
+        if node and isinstance(node[0], str):
+            # Keras 2 tensor: [name, node_index, tensor_index, call_kwargs]
+            return [node[0]]
+        return [name for item in node for name in _inbound_layers(item)]
+    return []
+
+
+def _call_kwargs(node):
+    """Keyword arguments of one call, e.g. use_causal_mask for Attention"""
+    if isinstance(node, dict):
+        return node.get('kwargs', {})
+    if node and isinstance(node[0], (list, tuple)) and len(node[0]) > 3 and isinstance(node[0][3], dict):
+        return node[0][3]
+    return {}
+
+
+class NumpyModel:
+    """
+    Inference-only NumPy runtime for the Keras models built by LSTMModel
+
+    Runs Sequential and functional models made of LSTM, Conv1D, MaxPooling1D,
+    UpSampling1D, Concatenate, Attention, Dropout and Dense layers from their
+    Keras architecture (Keras 2 or Keras 3 JSON) and weights, in float32,
+    without importing TensorFlow.
+    """
+
+    def __init__(self, architecture, weights):
+        """
+        Args:
+            architecture: Parsed model.to_json() of the Keras model
+            weights: Dictionary of layer name to the list of its weights
+        """
+        config = architecture['config']
+        self.layers = []
+        previous = None
+        for entry in config['layers']:
+            layer_config = entry['config']
+            name = entry.get('name') or layer_config['name']
+            class_name = entry['class_name']
+            if class_name not in LAYERS and class_name != 'InputLayer':
+                raise ValueError(f"Unsupported layer '{class_name}' ({name})")
+
+            if 'inbound_nodes' in entry:
+                nodes = entry['inbound_nodes']
+                if len(nodes) > 1:
+                    raise ValueError(f"Layer '{name}' is called more than once, which is not supported")
+                inbound = _inbound_layers(nodes[0]) if nodes else []
+                kwargs = _call_kwargs(nodes[0]) if nodes else {}
+            else:
+                # Sequential: each layer takes the output of the previous one
+                inbound = [previous] if previous is not None else []
+                kwargs = {}
+
+            self.layers.append((name, class_name, layer_config, inbound, kwargs,
+                                [np.asarray(w, dtype=np.float32) for w in weights.get(name, [])]))
+            previous = name
+
+        if 'output_layers' in config:
+            outputs = config['output_layers']
+            # [[name, node, index], ...] or a single [name, node, index]
+            self.output = outputs[0][0] if isinstance(outputs[0], (list, tuple)) else outputs[0]
+        else:
+            self.output = previous
+
+    @classmethod
+    def load(cls, path):
+        """Load a model written by export_keras_model"""
+        with np.load(path, allow_pickle=False) as archive:
+            architecture = json.loads(str(archive['__architecture__']))
+            weights = {}
+            for key in archive.files:
+                if key == '__architecture__':
+                    continue
+                layer, index = key.rsplit('/', 1)
+                weights.setdefault(layer, []).append((int(index), archive[key]))
+        weights = {layer: [w for _, w in sorted(items)] for layer, items in weights.items()}
+        return cls(architecture, weights)
+
+    @property
+    def output_width(self):
+        """Number of values the model predicts per sample"""
+        for name, class_name, config, _, _, weights in self.layers:
+            if name == self.output and class_name == 'Dense':
+                return config['units']
+        return None
+
+    def __call__(self, x):
+        """
+        Run a forward pass
+
+        Args:
+            x: Input batch, e.g. of shape (samples, window_size, features)
+
+        Returns:
+            Output of the model as a float32 array
+        """
+        x = np.asarray(x, dtype=np.float32)
+        outputs = {}
+        for name, class_name, config, inbound, kwargs, weights in self.layers:
+            if class_name == 'InputLayer':
+                outputs[name] = x
+                continue
+            args = [outputs[source] for source in inbound] if inbound else [x]
+            outputs[name] = LAYERS[class_name](args, config, weights, kwargs)
+        return outputs[self.output]
+
+    predict = __call__
+
+
+def export_keras_model(model, path):
+    """
+    Save a Keras model's architecture and weights for NumpyModel
+
+    Everything goes into one .npz file (no pickles), written atomically.
+
+    Args:
+        model: Keras model
+        path: Destination file
+    """
+    arrays = {'__architecture__': np.array(model.to_json())}
+    for layer in model.layers:
+        for i, weight in enumerate(layer.get_weights()):
+            arrays[f"{layer.name}/{i}"] = np.asarray(weight, dtype=np.float32)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export a saved Keras model for the NumPy runtime")
+    parser.add_argument('--model', default='saved_models/lstm_model', help='Saved Keras model')
+    parser.add_argument('--output', default=None, help='Output file (default: <model>.npz)')
+    args = parser.parse_args()
+
+    import tensorflow as tf
+
+    output = args.output or f"{args.model}.npz"
+    export_keras_model(tf.keras.models.load_model(args.model), output)
+    print(f"Exported {args.model} to {output}")
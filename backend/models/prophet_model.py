@@ -1,28 +1,132 @@
 
 import pandas as pd
-from prophet import Prophet
 import joblib
 import os
 from datetime import datetime
+import copy
 import numpy as np
+from scipy.signal import lfilter
+from scipy.stats import norm
+from .registry import data_fingerprint, fit_cache, load_fit_metadata, save_fit_metadata
 
 class ProphetModel:
-    def __init__(self):
+    MODEL_TYPE = 'prophet'
+    
+    # How predict computes Lower/Upper: Prophet's trajectory simulation with its
+    # 1000 samples, the simulation with fewer samples, or closed-form bounds
+    INTERVAL_MODES = ('sampled', 'reduced', 'analytic')
+    REDUCED_SAMPLES = 100
+    
+    def __init__(self, registry=None, seed=None, interval_mode='sampled', uncertainty_samples=None):
+        """
+        Args:
+            registry: ModelRegistry for per-symbol models; without one, a single
+                model in saved_models/ is used for every symbol
+            seed: Seed for the noise in the projected regressor paths, so the
+                same model and data give the same forecast (default: random)
+            interval_mode: How the confidence interval is computed, one of INTERVAL_MODES
+            uncertainty_samples: Trajectories simulated in 'reduced' mode
+                (default: REDUCED_SAMPLES)
+        """
+        if interval_mode not in self.INTERVAL_MODES:
+            raise ValueError(f"Unknown interval mode '{interval_mode}'. Choose from: {', '.join(self.INTERVAL_MODES)}")
+        
         self.model = None
         self.model_path = 'saved_models/prophet_model.pkl'
         self.scaler_data = None
+        self.fingerprint = None
+        self.registry = registry
+        self.seed = seed
+        self.interval_mode = interval_mode
+        self.uncertainty_samples = uncertainty_samples or self.REDUCED_SAMPLES
         self._load_or_create_model()
         
     def _load_or_create_model(self):
         try:
             self.model = joblib.load(self.model_path)
+            fit = load_fit_metadata(self.model_path)
+            self.fingerprint = fit.get('fingerprint')
+            self.scaler_data = fit.get('scaler_data')
             print("Loaded pretrained Prophet model")
         except (OSError, IOError):
             print("Will create new Prophet model when training")
             self.model = None
     
-    def train(self, data):
-        """Train the Prophet model with stock price data and advanced seasonality"""
+    def train(self, data, symbol=None):
+        """
+        Train the Prophet model with stock price data and advanced seasonality
+        
+        Args:
+            data: Historical stock data
+            symbol: Symbol the data belongs to; with a registry, the model is
+                published as that symbol's new version instead of replacing the
+                shared model
+        
+        A model already fitted on data with the same fingerprint is reused
+        instead of fitting again.
+        """
+        fingerprint = data_fingerprint(data)
+        per_symbol = symbol is not None and self.registry is not None
+        
+        if per_symbol and self.registry.reuse(self.MODEL_TYPE, symbol, fingerprint) is not None:
+            fit_cache.record(self.MODEL_TYPE, True, symbol, fingerprint)
+            bundle, _ = self.registry.load(self.MODEL_TYPE, symbol, self._read_bundle)
+            return bundle['model']
+        if not per_symbol and self.model is not None and self.fingerprint == fingerprint:
+            fit_cache.record(self.MODEL_TYPE, True, fingerprint=fingerprint)
+            return self.model
+        fit_cache.record(self.MODEL_TYPE, False, symbol, fingerprint)
+        
+        model, scaler_data = self._fit(data)
+        
+        if per_symbol:
+            bundle = {'model': model, 'scaler_data': scaler_data}
+            self.registry.publish(self.MODEL_TYPE, symbol,
+                                  lambda directory: joblib.dump(bundle, os.path.join(directory, 'bundle.pkl')),
+                                  fingerprint=fingerprint)
+            return model
+        
+        self.model = model
+        self.scaler_data = scaler_data
+        self.fingerprint = fingerprint
+        
+        # Save the model, with the data fingerprint and regressor values next to it
+        os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
+        joblib.dump(self.model, self.model_path)
+        save_fit_metadata(self.model_path, fingerprint=fingerprint, scaler_data=scaler_data)
+        
+        return self.model
+    
+    def train_many(self, frames, workers=None, resume=False, checkpoint_path=None):
+        """
+        Fit a model for each of many symbols across worker processes
+        
+        Each symbol's fit runs in a TrainingOrchestrator worker and is published
+        to this model's registry, so predict(data, symbol=...) picks it up.
+        
+        Args:
+            frames: Dictionary of symbol to preprocessed data, or an iterable of
+                (symbol, data) pairs
+            workers: Number of worker processes (default: one per core)
+            resume: Skip symbols the checkpoint records as done on the same data
+            checkpoint_path: JSON file recording finished symbols (default: none)
+            
+        Returns:
+            The orchestrator's summary dict (counts, seconds, symbols per minute, failures)
+        """
+        if self.registry is None:
+            raise ValueError("Training many symbols requires a model registry")
+        
+        from .training import TrainingOrchestrator
+        orchestrator = TrainingOrchestrator(model_types=(self.MODEL_TYPE,), workers=workers,
+                                            registry_root=self.registry.root, checkpoint_path=checkpoint_path)
+        return orchestrator.run(frames, resume=resume)
+    
+    def _fit(self, data):
+        """Fit a Prophet model, returning it with the last regressor values"""
+        # Imported here so loading this module does not import Prophet and its Stan backend
+        from prophet import Prophet
+        
         # Prepare data for Prophet (requires 'ds' for dates and 'y' for values)
         df = pd.DataFrame()
         df['ds'] = data.index
@@ -40,7 +144,7 @@ class ProphetModel:
             df['macd'] = data['MACD'].fillna(0).values
         
         # Initialize and train the model with advanced settings for higher accuracy
-        self.model = Prophet(
+        model = Prophet(
             daily_seasonality=True, 
             weekly_seasonality=True,
             yearly_seasonality=True,
@@ -78,82 +182,163 @@ class ProphetModel:
         
         # Combine all holidays
         all_holidays = pd.concat([indian_holidays, more_indian_holidays])
-        self.model.add_country_holidays(country_name='IN')
-        self.model.holidays = pd.concat([self.model.holidays, all_holidays])
+        model.add_country_holidays(country_name='IN')
+        model.holidays = pd.concat([model.holidays, all_holidays])
         
         # Add Fourier series for better seasonality modeling
-        self.model.add_seasonality(name='monthly', period=30.5, fourier_order=5)
-        self.model.add_seasonality(name='quarterly', period=91.25, fourier_order=10)
+        model.add_seasonality(name='monthly', period=30.5, fourier_order=5)
+        model.add_seasonality(name='quarterly', period=91.25, fourier_order=10)
         
         # Add extra regressors if we have them
         if 'volume' in df.columns:
-            self.model.add_regressor('volume', mode='multiplicative')
+            model.add_regressor('volume', mode='multiplicative')
         
         if 'rsi' in df.columns:
-            self.model.add_regressor('rsi', mode='additive')
+            model.add_regressor('rsi', mode='additive')
         
         if 'macd' in df.columns:
-            self.model.add_regressor('macd', mode='additive')
+            model.add_regressor('macd', mode='additive')
         
         # Fit the model with more iterations for convergence
-        self.model.fit(df)
-        
-        # Save the model
-        os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
-        joblib.dump(self.model, self.model_path)
+        model.fit(df)
         
         # Save the last values of regressors to use in future predictions
-        self.scaler_data = {
+        scaler_data = {
             'last_volume': df['volume'].iloc[-1] if 'volume' in df.columns else None,
             'last_rsi': df['rsi'].iloc[-1] if 'rsi' in df.columns else None,
             'last_macd': df['macd'].iloc[-1] if 'macd' in df.columns else None
         }
         
-        return self.model
+        return model, scaler_data
     
-    def predict(self, data, prediction_days=30):
-        """Generate predictions for the next prediction_days using the trained model"""
-        # Check if model exists or train it
-        if self.model is None:
-            self.train(data)
+    def _model_for(self, data, symbol):
+        """Model and regressor values to predict a symbol with, training one if there is none"""
+        if symbol is None or self.registry is None:
+            # Check if model exists or train it
+            if self.model is None:
+                self.train(data)
+            return self.model, self.scaler_data
         
-        # Create future dataframe with more detailed parameters
-        future = self.model.make_future_dataframe(periods=prediction_days, freq='D')
+        bundle, _ = self.registry.load(self.MODEL_TYPE, symbol, self._read_bundle)
+        if bundle is None:
+            print(f"No Prophet model for {symbol} yet, training one")
+            self.train(data, symbol)
+            bundle, _ = self.registry.load(self.MODEL_TYPE, symbol, self._read_bundle)
+        return bundle['model'], bundle['scaler_data']
+    
+    @staticmethod
+    def project_regressors(scaler_data, steps, rng):
+        """
+        Regressor paths for the forecast days, continuing from the last training bar
         
-        # Add regressors to future dataframe if they were used in training
-        if self.scaler_data:
-            if self.scaler_data['last_volume'] is not None:
-                # Project volume with some trend continuation rather than flat value
-                future['volume'] = self.scaler_data['last_volume']
-                # Add slight volume trend variability
-                future['volume'] = future['volume'] * (1 + np.arange(len(future)) * 0.0005)
+        Volume continues with a slight trend. RSI reverts towards 50 and MACD
+        decays with a cyclical component, both with Gaussian noise. Both are
+        AR(1) recurrences, run by one lfilter call each with the last value as
+        the initial state.
+        
+        Args:
+            scaler_data: Last regressor values saved at training
+            steps: Number of forecast days
+            rng: numpy Generator for the noise
             
-            if self.scaler_data['last_rsi'] is not None:
-                # More realistic RSI projection - mean reverting around 50
-                rsi_last = self.scaler_data['last_rsi']
-                rsi_values = np.array([rsi_last])
-                for i in range(1, len(future)):
-                    # Mean-reverting RSI
-                    next_rsi = rsi_values[-1] + (50 - rsi_values[-1]) * 0.05 + np.random.normal(0, 3)
-                    # Constrain RSI between 0 and 100
-                    next_rsi = max(0, min(100, next_rsi))
-                    rsi_values = np.append(rsi_values, next_rsi)
-                
-                future['rsi'] = rsi_values
+        Returns:
+            Dictionary of regressor name to an array of length steps
+        """
+        regressors = {}
+        step = np.arange(1, steps + 1)
+        
+        if scaler_data.get('last_volume') is not None:
+            # Project volume with some trend continuation rather than flat value
+            regressors['volume'] = scaler_data['last_volume'] * (1 + step * 0.0005)
+        
+        if scaler_data.get('last_rsi') is not None:
+            # rsi[t] = rsi[t-1] + (50 - rsi[t-1]) * 0.05 + noise = 0.95 * rsi[t-1] + 2.5 + noise
+            drive = 2.5 + rng.normal(0, 3, steps)
+            rsi, _ = lfilter([1.0], [1.0, -0.95], drive, zi=[0.95 * scaler_data['last_rsi']])
+            # Constrain RSI between 0 and 100; the bounds are about 5 standard deviations
+            # from 50, so clipping the finished path matches clipping every step
+            regressors['rsi'] = np.clip(rsi, 0, 100)
+        
+        if scaler_data.get('last_macd') is not None:
+            # macd[t] = 0.9 * macd[t-1] + 0.5 * sin(t / 20) + noise
+            drive = np.sin(step / 20) * 0.5 + rng.normal(0, 0.5, steps)
+            regressors['macd'], _ = lfilter([1.0], [1.0, -0.9], drive, zi=[0.9 * scaler_data['last_macd']])
+        
+        return regressors
+    
+    @staticmethod
+    def analytic_interval(model, future, yhat):
+        """
+        Closed-form bounds matching what Prophet's trajectory simulation estimates
+        
+        Prophet samples future trend changes as a Poisson process with rate S (the
+        number of changepoints per unit of scaled time) and Laplace(0, b) slope
+        changes, where b is the mean absolute fitted change, and adds observation
+        noise sigma_obs. A slope change at time s moves the trend at time t by
+        delta * (t - s), so the trend variance after the last training point
+        (t = 1) is S * 2b^2 * (t - 1)^3 / 3; the noise variance adds to it.
+        
+        Args:
+            model: Fitted Prophet model (MAP estimate)
+            future: Frame of the 'ds' to predict
+            yhat: Point forecast for those rows
             
-            if self.scaler_data['last_macd'] is not None:
-                # Mean-reverting MACD
-                macd_last = self.scaler_data['last_macd']
-                macd_values = np.array([macd_last])
-                for i in range(1, len(future)):
-                    # Mean-reverting MACD with cyclical component
-                    next_macd = macd_values[-1] * 0.9 + np.sin(i/20) * 0.5 + np.random.normal(0, 0.5)
-                    macd_values = np.append(macd_values, next_macd)
-                
-                future['macd'] = macd_values
+        Returns:
+            Tuple of (lower, upper) arrays
+        """
+        t = ((future['ds'] - model.start) / model.t_scale).to_numpy(dtype=float)
+        horizon = np.maximum(t - 1, 0)
+        
+        deltas = np.asarray(model.params['delta'], dtype=float)
+        rate = len(model.changepoints_t)
+        laplace_scale = np.mean(np.abs(deltas)) + 1e-8
+        trend_var = rate * 2 * laplace_scale ** 2 * horizon ** 3 / 3
+        noise_var = float(np.mean(model.params['sigma_obs'])) ** 2
+        
+        z = norm.ppf(0.5 + model.interval_width / 2)
+        spread = z * np.sqrt(trend_var + noise_var) * model.y_scale
+        return yhat - spread, yhat + spread
+    
+    def _sampling_model(self, model):
+        """The model with the trajectory count of the interval mode set"""
+        samples = {'reduced': self.uncertainty_samples, 'analytic': 0}.get(self.interval_mode)
+        if samples is None or samples == model.uncertainty_samples:
+            return model
+        # A shallow copy, so models shared between requests are not changed
+        model = copy.copy(model)
+        model.uncertainty_samples = samples
+        return model
+    
+    @staticmethod
+    def _read_bundle(directory, meta):
+        return joblib.load(os.path.join(directory, 'bundle.pkl'))
+    
+    def predict(self, data, prediction_days=30, symbol=None):
+        """
+        Generate predictions for the next prediction_days using the trained model
+        
+        Args:
+            data: Historical stock data
+            prediction_days: Number of days to predict
+            symbol: Symbol the data belongs to; with a registry, that symbol's
+                current model is used
+        """
+        model, scaler_data = self._model_for(data, symbol)
+        
+        # Only the forecast days are built and predicted, not the whole history
+        future = model.make_future_dataframe(periods=prediction_days, freq='D', include_history=False)
+        
+        # Add regressors to future dataframe if they were used in training
+        if scaler_data:
+            rng = np.random.default_rng(self.seed)
+            for name, values in self.project_regressors(scaler_data, len(future), rng).items():
+                future[name] = values
         
         # Make predictions with improved modeling
-        forecast = self.model.predict(future)
+        forecast = self._sampling_model(model).predict(future)
+        if self.interval_mode == 'analytic':
+            forecast['yhat_lower'], forecast['yhat_upper'] = self.analytic_interval(
+                model, future, forecast['yhat'].to_numpy())
         
         # Get only the future predictions
         last_date = data.index[-1]
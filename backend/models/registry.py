@@ -0,0 +1,302 @@
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+
+def data_fingerprint(data, **params):
+    """
+    Fingerprint of a training frame, to tell whether a saved fit used the same data
+
+    Covers the date range, number of rows, column set and the values of the last
+    bar, plus any keyword parameters that change the fit (e.g. window size).
+    Appending a bar or changing a column changes the fingerprint.
+
+    Returns:
+        Hex digest string
+    """
+    payload = {
+        'columns': sorted(str(column) for column in data.columns),
+        'rows': len(data),
+        'params': params,
+    }
+    if len(data):
+        payload['first'] = str(data.index[0])
+        payload['last'] = str(data.index[-1])
+        payload['last_bar'] = {str(column): repr(value) for column, value in data.iloc[-1].items()}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def load_fit_metadata(model_path):
+    """Fingerprint and other fit details saved next to a shared model, or {}"""
+    try:
+        with open(f"{model_path}.fit.json", 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_fit_metadata(model_path, **values):
+    """Save fit details next to a shared model (atomically)"""
+    path = f"{model_path}.fit.json"
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp_path, 'w') as f:
+        json.dump(values, f, default=float)
+    os.replace(tmp_path, path)
+
+
+class FitCacheStats:
+    """Thread-safe counters of fits skipped (hits) and run (misses), per model type"""
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, model_type, hit, symbol=None, fingerprint=None):
+        """Count and log one fit cache lookup"""
+        with self._lock:
+            counts = self._counts.setdefault(model_type, {'hits': 0, 'misses': 0})
+            counts['hits' if hit else 'misses'] += 1
+        target = f" for {symbol}" if symbol is not None else ''
+        outcome = 'hit, reusing the saved fit' if hit else 'miss, fitting'
+        print(f"Fit cache {outcome}: {model_type}{target} (data {(fingerprint or '')[:12]})")
+
+    def stats(self):
+        with self._lock:
+            return {model_type: dict(counts) for model_type, counts in self._counts.items()}
+
+
+# Shared by all models in the process, reported by the app's /health endpoint
+fit_cache = FitCacheStats()
+
+
+class ModelRegistry:
+    """
+    Versioned per-symbol model artifacts on disk, with a memory-bounded LRU of loaded models
+
+    Artifacts live in root/<model_type>/<symbol>/<version>/ next to a meta.json
+    recording the data fingerprint they were fitted on. A version directory is
+    written in full under a temporary name and renamed into place, and never
+    changes afterwards. root/<model_type>/<symbol>/CURRENT names the version in
+    use and is replaced atomically, so publishing a new version hot-swaps it:
+    requests holding the previous model finish with it, later calls load the
+    new one.
+
+    Loaded models are kept in an LRU bounded by count and by the size of their
+    artifacts on disk (a proxy for their memory), keyed by version so a swap
+    never serves a stale model.
+    """
+
+    CURRENT = 'CURRENT'
+    META = 'meta.json'
+
+    def __init__(self, root='saved_models/registry', max_models=64, max_bytes=1024 * 1024 * 1024):
+        """
+        Args:
+            root: Directory holding the artifacts
+            max_models: Maximum number of loaded models kept in memory
+            max_bytes: Budget for the artifact size of loaded models
+        """
+        self.root = root
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self._loaded = OrderedDict()  # (model_type, symbol, version) -> (model, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _safe_name(name):
+        """Directory name for a symbol or model type ('/' and other separators replaced)"""
+        return re.sub(r'[^A-Za-z0-9._^&=-]', '_', name)
+
+    def _symbol_dir(self, model_type, symbol):
+        return os.path.join(self.root, self._safe_name(model_type), self._safe_name(symbol))
+
+    def version_dir(self, model_type, symbol, version):
+        return os.path.join(self._symbol_dir(model_type, symbol), version)
+
+    def current_version(self, model_type, symbol):
+        """Version currently in use for a symbol, or None if nothing was published"""
+        try:
+            with open(os.path.join(self._symbol_dir(model_type, symbol), self.CURRENT), 'r') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def versions(self, model_type, symbol):
+        """Published versions of a symbol's model, oldest first"""
+        try:
+            names = os.listdir(self._symbol_dir(model_type, symbol))
+        except OSError:
+            return []
+        return sorted(name for name in names if name.startswith('v') and name[1:].isdigit())
+
+    def metadata(self, model_type, symbol, version=None):
+        """meta.json of a version (default: the current one), or None"""
+        version = version or self.current_version(model_type, symbol)
+        if version is None:
+            return None
+        try:
+            with open(os.path.join(self.version_dir(model_type, symbol, version), self.META), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def find(self, model_type, symbol, fingerprint):
+        """Newest version fitted on data with this fingerprint, or None"""
+        for version in reversed(self.versions(model_type, symbol)):
+            meta = self.metadata(model_type, symbol, version)
+            if meta is not None and meta.get('fingerprint') == fingerprint:
+                return version
+        return None
+
+    def reuse(self, model_type, symbol, fingerprint):
+        """
+        Make the version fitted on data with this fingerprint current, if there is one
+
+        Returns:
+            The version, or None when no version was fitted on such data
+        """
+        version = self.find(model_type, symbol, fingerprint)
+        if version is not None and version != self.current_version(model_type, symbol):
+            self.activate(model_type, symbol, version)
+        return version
+
+    def publish(self, model_type, symbol, write, fingerprint=None, metadata=None):
+        """
+        Store a new version of a symbol's model and make it current
+
+        Args:
+            model_type: Kind of model, e.g. 'prophet' or 'lstm'
+            symbol: Stock symbol the model was fitted on
+            write: Function called with an empty directory to write the artifacts into
+            fingerprint: Fingerprint of the training data
+            metadata: Extra JSON-serializable information to record
+
+        Returns:
+            The new version name
+        """
+        symbol_dir = self._symbol_dir(model_type, symbol)
+        os.makedirs(symbol_dir, exist_ok=True)
+        staging = os.path.join(symbol_dir, f".staging-{os.getpid()}-{threading.get_ident()}")
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        try:
+            write(staging)
+            meta = dict(metadata or {}, model_type=model_type, symbol=symbol,
+                        fingerprint=fingerprint, created=time.time())
+            with open(os.path.join(staging, self.META), 'w') as f:
+                json.dump(meta, f)
+
+            # Claim the next version number; a concurrent publisher makes the rename fail
+            while True:
+                existing = self.versions(model_type, symbol)
+                version = f"v{int(existing[-1][1:]) + 1 if existing else 1:06d}"
+                try:
+                    os.rename(staging, os.path.join(symbol_dir, version))
+                    break
+                except OSError:
+                    if not os.path.exists(os.path.join(symbol_dir, version)):
+                        raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        # A publisher that lost the race to a newer version must not roll CURRENT back
+        with self._publish_lock:
+            if (self.current_version(model_type, symbol) or '') < version:
+                self.activate(model_type, symbol, version)
+        return version
+
+    def activate(self, model_type, symbol, version):
+        """Point CURRENT at a published version, e.g. to roll back"""
+        if not os.path.isdir(self.version_dir(model_type, symbol, version)):
+            raise ValueError(f"No version {version} of the {model_type} model for {symbol}")
+        path = os.path.join(self._symbol_dir(model_type, symbol), self.CURRENT)
+        tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp_path, 'w') as f:
+            f.write(version)
+        os.replace(tmp_path, path)
+
+    def load(self, model_type, symbol, read, version=None):
+        """
+        Return a symbol's model, reading it from disk only if it is not loaded yet
+
+        Args:
+            model_type: Kind of model
+            symbol: Stock symbol
+            read: Function called with (version directory, metadata) that returns the model
+            version: Version to load (default: the current one)
+
+        Returns:
+            Tuple of (model, version), or (None, None) if nothing was published
+        """
+        version = version or self.current_version(model_type, symbol)
+        if version is None:
+            return None, None
+
+        key = (model_type, symbol, version)
+        with self._lock:
+            entry = self._loaded.get(key)
+            if entry is not None:
+                self._loaded.move_to_end(key)
+                self.hits += 1
+                return entry[0], version
+            self.misses += 1
+
+        # Read outside the lock; two threads racing on a miss both read, and one result is kept
+        directory = self.version_dir(model_type, symbol, version)
+        model = read(directory, self.metadata(model_type, symbol, version) or {})
+        nbytes = self._artifact_size(directory)
+
+        with self._lock:
+            if key in self._loaded:
+                return self._loaded[key][0], version
+            self._loaded[key] = (model, nbytes)
+            self._bytes += nbytes
+            while len(self._loaded) > 1 and (len(self._loaded) > self.max_models or self._bytes > self.max_bytes):
+                _, (_, evicted_bytes) = self._loaded.popitem(last=False)
+                self._bytes -= evicted_bytes
+                self.evictions += 1
+        return model, version
+
+    @staticmethod
+    def _artifact_size(directory):
+        total = 0
+        for parent, _, files in os.walk(directory):
+            for name in files:
+                total += os.path.getsize(os.path.join(parent, name))
+        return total
+
+    def prune(self, model_type, symbol, keep=2):
+        """Delete all but the newest `keep` versions, never the current one"""
+        current = self.current_version(model_type, symbol)
+        versions = self.versions(model_type, symbol)
+        for version in versions[:max(len(versions) - keep, 0)]:
+            if version != current:
+                shutil.rmtree(self.version_dir(model_type, symbol, version), ignore_errors=True)
+
+    def stats(self):
+        """Counters and current size of the loaded-model cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'loaded': len(self._loaded),
+                'bytes': self._bytes,
+                'max_models': self.max_models,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,246 @@
+
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+
+from .registry import data_fingerprint
+
+MODEL_TYPES = ('prophet', 'lstm')
+
+# Environment variables read by the native thread pools of TensorFlow and the BLAS libraries
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS',
+                   'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS')
+
+# Models of the current worker process, created on its first task
+_worker_models = {}
+_worker_options = {}
+
+
+@contextmanager
+def _thread_env(threads):
+    """
+    Set THREAD_ENV_VARS in this process's environment for the duration of the block
+
+    Spawned workers inherit the environment when they start. By then it must
+    already hold the caps: unpickling a worker's first call imports numpy and
+    scipy (through models/__init__), and BLAS reads these variables only when
+    it is loaded. Setting them in the pool initializer would be too late.
+    The previous values are restored afterwards.
+    """
+    previous = {name: os.environ.get(name) for name in THREAD_ENV_VARS}
+    os.environ.update({name: str(threads) for name in THREAD_ENV_VARS})
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _init_worker(threads, registry_root, lstm_options):
+    """Process pool initializer: remember the worker's options (thread caps come from _thread_env)"""
+    _worker_options.update(threads=threads, registry_root=registry_root, lstm_options=lstm_options or {})
+
+
+def _worker_model(model_type):
+    model = _worker_models.get(model_type)
+    if model is not None:
+        return model
+
+    from .registry import ModelRegistry
+    registry = ModelRegistry(_worker_options['registry_root'])
+    if model_type == 'prophet':
+        from .prophet_model import ProphetModel
+        model = ProphetModel(registry=registry)
+    else:
+        import tensorflow as tf
+        # Must run before TensorFlow creates its thread pools, i.e. before the first model
+        tf.config.threading.set_intra_op_parallelism_threads(_worker_options['threads'])
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+        from .lstm_model import LSTMModel
+        model = LSTMModel(registry=registry, **_worker_options['lstm_options'])
+    _worker_models[model_type] = model
+    return model
+
+
+def _train_task(model_type, symbol, data):
+    """Fit one symbol's model in a worker process, returning a result dict"""
+    from .registry import fit_cache
+
+    started = time.perf_counter()
+    try:
+        model = _worker_model(model_type)
+        cache_type = getattr(model, 'model_type', model_type)
+        hits = fit_cache.stats().get(cache_type, {}).get('hits', 0)
+        model.train(data, symbol=symbol)
+        cached = fit_cache.stats().get(cache_type, {}).get('hits', 0) > hits
+        status, error = ('cached' if cached else 'trained'), None
+    except Exception as e:
+        status, error = 'failed', str(e)
+    return {
+        'model_type': model_type,
+        'symbol': symbol,
+        'status': status,
+        'error': error,
+        'seconds': time.perf_counter() - started,
+        'pid': os.getpid(),
+    }
+
+
+class TrainingOrchestrator:
+    """
+    Trains per-symbol models for many symbols across a pool of worker processes
+
+    Each (model type, symbol) pair is one task, run in a ProcessPoolExecutor so
+    Prophet and LSTM fits use every core. Every worker caps the threads of
+    TensorFlow and the BLAS libraries (threads_per_worker), so workers x threads
+    does not oversubscribe the machine. Fitted models are published to the
+    ModelRegistry, and fits of unchanged data are skipped by the models' fit cache.
+
+    Progress is checkpointed to a JSON file after every task. A resumed run
+    skips tasks that completed for the same data fingerprint.
+    """
+
+    def __init__(self, model_types=MODEL_TYPES, workers=None, threads_per_worker=1,
+                 registry_root='saved_models/registry', checkpoint_path='saved_models/training_checkpoint.json',
+                 lstm_options=None, max_pending=None):
+        """
+        Args:
+            model_types: Models to fit per symbol, from 'prophet' and 'lstm'
+            workers: Number of worker processes (default: cores / threads_per_worker)
+            threads_per_worker: Native threads each worker may use
+            registry_root: Directory of the ModelRegistry the workers publish to
+            checkpoint_path: JSON file recording finished tasks (None disables checkpoints)
+            lstm_options: Keyword arguments for LSTMModel in the workers
+            max_pending: Tasks submitted ahead of the workers (default: 2 per worker),
+                which bounds how many histories are held in memory
+        """
+        unknown = [t for t in model_types if t not in MODEL_TYPES]
+        if unknown:
+            raise ValueError(f"Unknown model types {unknown}. Choose from: {', '.join(MODEL_TYPES)}")
+
+        self.model_types = tuple(model_types)
+        self.threads_per_worker = max(1, threads_per_worker)
+        self.workers = workers or max(1, (os.cpu_count() or 1) // self.threads_per_worker)
+        self.registry_root = registry_root
+        self.checkpoint_path = checkpoint_path
+        self.lstm_options = lstm_options or {}
+        self.max_pending = max_pending or 2 * self.workers
+        self._checkpoint = {}
+        self._checkpoint_lock = threading.Lock()
+
+    @staticmethod
+    def _task_key(model_type, symbol):
+        return f"{model_type}:{symbol}"
+
+    def _load_checkpoint(self):
+        if not self.checkpoint_path:
+            return {}
+        try:
+            with open(self.checkpoint_path, 'r') as f:
+                return json.load(f).get('tasks', {})
+        except (OSError, ValueError):
+            return {}
+
+    def _save_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        with self._checkpoint_lock:
+            os.makedirs(os.path.dirname(self.checkpoint_path) or '.', exist_ok=True)
+            tmp_path = f"{self.checkpoint_path}.tmp-{os.getpid()}"
+            with open(tmp_path, 'w') as f:
+                json.dump({'updated': time.time(), 'tasks': self._checkpoint}, f)
+            os.replace(tmp_path, self.checkpoint_path)
+
+    def _tasks(self, frames, resume):
+        """Yield (model_type, symbol, data, fingerprint) for the tasks still to run"""
+        for symbol, data in (frames.items() if hasattr(frames, 'items') else frames):
+            fingerprint = data_fingerprint(data)
+            for model_type in self.model_types:
+                done = self._checkpoint.get(self._task_key(model_type, symbol))
+                if resume and done and done['status'] != 'failed' and done['fingerprint'] == fingerprint:
+                    continue
+                yield model_type, symbol, data, fingerprint
+
+    def run(self, frames, resume=True):
+        """
+        Train every model type for every symbol
+
+        Args:
+            frames: Dictionary of symbol to preprocessed data, or an iterable of
+                (symbol, data) pairs; histories are read as tasks are submitted
+            resume: Skip tasks the checkpoint records as done on the same data
+
+        Returns:
+            Summary dict with counts per status, elapsed seconds, symbols per
+            minute and the failed tasks
+        """
+        self._checkpoint = self._load_checkpoint() if resume else {}
+        counts = {'trained': 0, 'cached': 0, 'failed': 0}
+        failures = []
+        symbols = set()
+        started = time.perf_counter()
+
+        context = multiprocessing.get_context('spawn')
+        # Workers are spawned as tasks are submitted, so the caps stay set until the pool is done
+        with _thread_env(self.threads_per_worker), \
+                ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=_init_worker,
+                                    initargs=(self.threads_per_worker, self.registry_root, self.lstm_options)) as pool:
+            pending = {}
+            tasks = self._tasks(frames, resume)
+            exhausted = False
+            while pending or not exhausted:
+                # Keep the pool busy without reading every history up front
+                while not exhausted and len(pending) < self.max_pending:
+                    task = next(tasks, None)
+                    if task is None:
+                        exhausted = True
+                        break
+                    model_type, symbol, data, fingerprint = task
+                    pending[pool.submit(_train_task, model_type, symbol, data)] = fingerprint
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    fingerprint = pending.pop(future)
+                    result = future.result()
+                    counts[result['status']] += 1
+                    symbols.add(result['symbol'])
+                    if result['status'] == 'failed':
+                        failures.append(result)
+                        print(f"Training {result['model_type']} for {result['symbol']} failed: {result['error']}")
+
+                    self._checkpoint[self._task_key(result['model_type'], result['symbol'])] = {
+                        'status': result['status'],
+                        'fingerprint': fingerprint,
+                        'seconds': round(result['seconds'], 3),
+                        'finished': time.time(),
+                    }
+                    self._save_checkpoint()
+
+                    finished = sum(counts.values())
+                    elapsed = time.perf_counter() - started
+                    print(f"[{finished}] {result['model_type']} {result['symbol']}: {result['status']} "
+                          f"in {result['seconds']:.1f}s ({len(symbols) / elapsed * 60:.1f} symbols/min)")
+
+        elapsed = time.perf_counter() - started
+        summary = {
+            **counts,
+            'symbols': len(symbols),
+            'seconds': elapsed,
+            'symbols_per_minute': len(symbols) / elapsed * 60 if elapsed > 0 else 0.0,
+            'workers': self.workers,
+            'threads_per_worker': self.threads_per_worker,
+            'failures': failures,
+        }
+        print(f"Training finished: {counts['trained']} trained, {counts['cached']} cached, "
+              f"{counts['failed']} failed, {len(symbols)} symbols in {elapsed:.1f}s "
+              f"({summary['symbols_per_minute']:.1f} symbols/min)")
+        return summary
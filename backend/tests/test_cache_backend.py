@@ -0,0 +1,55 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from data.cache_backend import NumpyCacheBackend
+
+
+def _history(rows, start=0.0):
+    index = pd.date_range('2020-01-01', periods=rows, freq='D', name='Date')
+    return pd.DataFrame({'Close': np.arange(rows) + start, 'Volume': np.arange(rows, dtype=np.int64)}, index=index)
+
+
+def test_concurrent_saves_of_one_symbol(tmp_path):
+    backend = NumpyCacheBackend(str(tmp_path))
+    histories = [_history(100 + i, start=i) for i in range(4)]
+    backend.save('AAPL', '5y', 'INR', histories[0])
+
+    errors = []
+    stop = threading.Event()
+
+    def save(history):
+        for _ in range(30):
+            try:
+                backend.save('AAPL', '5y', 'INR', history)
+            except Exception as e:
+                errors.append(e)
+
+    def load():
+        while not stop.is_set():
+            try:
+                loaded = backend.load('AAPL', '5y', 'INR')
+            except FileNotFoundError:
+                # The entry is missing only between the two renames of a swap
+                continue
+            except Exception as e:
+                errors.append(e)
+                continue
+            if not any(loaded.equals(history) for history in histories):
+                errors.append(AssertionError('loaded a mix of two saves'))
+
+    reader = threading.Thread(target=load)
+    reader.start()
+    writers = [threading.Thread(target=save, args=(history,)) for history in histories]
+    for thread in writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    stop.set()
+    reader.join()
+
+    assert errors == []
+    assert any(backend.load('AAPL', '5y', 'INR').equals(history) for history in histories)
+    # No temporary or set-aside directories are left behind
+    assert [path.name for path in tmp_path.iterdir()] == ['AAPL_5y_INR.npcache']
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from data.fetcher import StockDataFetcher
+from data.indicators import FETCHER_INDICATORS
+from data.providers import ReplayProvider
+
+
+class RecordingProvider(ReplayProvider):
+    """ReplayProvider that remembers the start date of every history request"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.starts = []
+
+    def history(self, symbol, period=None, start=None):
+        self.starts.append(start)
+        return super().history(symbol, period=period, start=start)
+
+
+def _write_replay_history(directory, symbol, bars=400, seed=0):
+    """Random-walk OHLCV bars in the CSV cache layout ReplayProvider reads"""
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range('2022-01-03', periods=bars, name='Date')
+    close = 1000 * np.exp(np.cumsum(rng.normal(0, 0.015, bars)))
+    frame = pd.DataFrame({
+        'Open': close * (1 + rng.normal(0, 0.003, bars)),
+        'High': close * 1.01,
+        'Low': close * 0.99,
+        'Close': close,
+        'Volume': rng.integers(1e5, 1e6, bars),
+    }, index=index)
+    frame.to_csv(directory / f"{symbol}_5y_INR.csv")
+    return index
+
+
+def test_incremental_refresh_matches_full_fetch(tmp_path):
+    symbol = 'TEST.NS'
+    source = tmp_path / 'replay'
+    source.mkdir()
+    index = _write_replay_history(source, symbol)
+
+    provider = RecordingProvider(str(source), start_date=index[300])
+    # Every cached history is stale at once, so each fetch refreshes it
+    fetcher = StockDataFetcher(cache_dir=str(tmp_path / 'cache'), provider=provider,
+                               cache_ttl=0, revalidate_interval=0, max_requests_per_second=1000)
+
+    initial = fetcher.fetch_stock_data(symbol, years=5)
+    assert initial.index[-1] == index[300]
+
+    # Several refreshes, so indicators continue from a saved streaming state
+    for days in (1, 5, 20):
+        provider.advance(days)
+        refreshed = fetcher.fetch_stock_data(symbol, years=5)
+        assert provider.starts[-1] is not None, "the refresh downloaded the full history"
+
+        full = fetcher.fetch_stock_data(symbol, years=5, use_cache=False)
+        assert provider.starts[-1] is None
+        assert refreshed.index[-1] == provider.clock
+        assert refreshed.index.equals(full.index)
+
+        raw_columns = [col for col in full.columns if col not in FETCHER_INDICATORS]
+        assert_frame_equal(refreshed[raw_columns], full[raw_columns], check_dtype=False)
+        assert_frame_equal(refreshed[FETCHER_INDICATORS], full[FETCHER_INDICATORS],
+                           check_dtype=False, rtol=1e-9, atol=1e-9)
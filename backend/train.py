@@ -0,0 +1,72 @@
+"""
+Train per-symbol Prophet and LSTM models for many symbols in parallel worker processes
+
+Histories are fetched (from the cache when fresh) and preprocessed in this
+process, then each (model, symbol) fit runs in a process pool. Progress is
+checkpointed, so an interrupted run picks up where it stopped.
+
+Run from the backend directory:
+    python train.py --symbols AAPL MSFT RELIANCE.NS
+    python train.py --popular 200 --models prophet --threads-per-worker 1
+    python train.py --all --models lstm --workers 4 --threads-per-worker 2
+"""
+import argparse
+
+from data.fetcher import StockDataFetcher
+from data.preprocessor import DataPreprocessor
+from models.training import MODEL_TYPES, TrainingOrchestrator
+
+
+def preprocessed_histories(fetcher, symbols, years):
+    """Yield (symbol, preprocessed data) as histories arrive, skipping failures"""
+    preprocessor = DataPreprocessor()
+    for fetched in fetcher.iter_fetch_stocks(symbols, years=years):
+        if fetched.error is not None:
+            print(f"Skipping {fetched.symbol}: {str(fetched.error)}")
+            continue
+        try:
+            yield fetched.symbol, preprocessor.preprocess(fetched.data)
+        except Exception as e:
+            print(f"Skipping {fetched.symbol}: {str(e)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    selection = parser.add_mutually_exclusive_group(required=True)
+    selection.add_argument('--symbols', nargs='+', help='Symbols to train')
+    selection.add_argument('--popular', type=int, help='Train the N most popular symbols')
+    selection.add_argument('--all', action='store_true', help='Train every available symbol')
+    parser.add_argument('--models', nargs='+', default=list(MODEL_TYPES), choices=MODEL_TYPES)
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: cores / threads)')
+    parser.add_argument('--threads-per-worker', type=int, default=1, help='TensorFlow/BLAS threads per worker')
+    parser.add_argument('--years', type=int, default=5, help='Years of history to train on')
+    parser.add_argument('--cache-dir', default='data/cache')
+    parser.add_argument('--currency', default='INR')
+    parser.add_argument('--registry', default='saved_models/registry', help='Model registry directory')
+    parser.add_argument('--checkpoint', default='saved_models/training_checkpoint.json')
+    parser.add_argument('--no-resume', action='store_true', help='Ignore the checkpoint and train every task')
+    args = parser.parse_args()
+
+    fetcher = StockDataFetcher(cache_dir=args.cache_dir, currency=args.currency)
+    if args.symbols:
+        symbols = args.symbols
+    elif args.popular:
+        symbols = fetcher.get_popular_symbols(limit=args.popular)
+    else:
+        symbols = fetcher.get_available_symbols()
+
+    orchestrator = TrainingOrchestrator(
+        model_types=args.models,
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+        registry_root=args.registry,
+        checkpoint_path=args.checkpoint,
+    )
+    print(f"Training {', '.join(args.models)} for {len(symbols)} symbols with "
+          f"{orchestrator.workers} workers x {orchestrator.threads_per_worker} threads")
+    summary = orchestrator.run(preprocessed_histories(fetcher, symbols, args.years), resume=not args.no_resume)
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())